@@ -0,0 +1,143 @@
+"""
+Fingerprinted static assets.
+
+`flask --app app build-assets` copies each file in ASSETS to
+static/dist/<name>.<hash>.<ext>, writes gzip (and brotli, if the `brotli`
+package is installed) variants next to it, and records the mapping in
+static/dist/assets.json. Templates link assets with static_url(), which
+takes the same filename url_for('static', ...) does and returns the
+fingerprinted URL when a manifest is present. Fingerprinted files never
+change, so they are served with a one year `immutable` Cache-Control.
+
+The service worker (templates/sw.js, still served at /static/sw.js) takes
+its cache name and precache list from the same manifest, so a deploy with
+changed assets rolls the worker's cache by itself.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for, render_template, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSETS = [
+    'css/style.css',
+    'js/script.js',
+    'js/ajax_nav.js',
+    'js/custom_scripts.js',
+]
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'assets.json'
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSED_SUFFIX = {'br': '.br', 'gzip': '.gz'}
+
+# Served by the browser as-is; worth caching offline but never renamed
+PRECACHE_EXTRA = ['/', '/static/manifest.json']
+
+
+def _fingerprinted_name(filename, digest):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{ext}"
+
+
+def build(static_folder, clean=False):
+    """
+    Writes static/dist and its manifest. Returns the manifest dict. Older
+    fingerprinted files are kept unless `clean`, so pages still open in a
+    browser during a deploy can finish loading their assets.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    if clean and os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    files = {}
+    for filename in ASSETS:
+        with open(os.path.join(static_folder, filename), 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        target_name = _fingerprinted_name(filename, digest)
+        target = os.path.join(dist, target_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        with open(target + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + '.br', 'wb') as f:
+                f.write(brotli.compress(data))
+        files[filename] = f"{DIST_DIR}/{target_name}"
+
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {'version': version, 'files': files}
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': 'dev', 'files': {}}
+
+
+def static_url(filename, **values):
+    """url_for('static', filename=...) that prefers the fingerprinted copy from the manifest."""
+    files = current_app.extensions['assets']['files']
+    if filename in files:
+        return url_for('static_dist', filename=files[filename].split('/', 1)[1], **values)
+    return url_for('static', filename=filename, **values)
+
+
+def precache_urls():
+    return PRECACHE_EXTRA + [static_url(filename) for filename in ASSETS]
+
+
+def serve_dist(filename):
+    """Serves a fingerprinted file, preferring a pre-compressed variant the client accepts."""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    if filename == MANIFEST_NAME or filename.endswith(('.gz', '.br')):
+        abort(404)
+
+    encoding = None
+    for candidate, suffix in COMPRESSED_SUFFIX.items(): # brotli first, it is smaller
+        if request.accept_encodings[candidate] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            encoding = candidate
+            break
+
+    if encoding:
+        response = send_from_directory(dist, filename + COMPRESSED_SUFFIX[encoding], max_age=ONE_YEAR)
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(dist, filename, max_age=ONE_YEAR)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+    return response
+
+
+def service_worker():
+    manifest = current_app.extensions['assets']
+    response = current_app.make_response(render_template(
+        'sw.js', cache_name=f"talvex-{manifest['version']}", precache=precache_urls()
+    ))
+    response.mimetype = 'application/javascript'
+    # The worker itself must always be revalidated or clients never see new versions
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def init_app(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    # More specific than the built-in /static/<path:filename>, so these win
+    app.add_url_rule('/static/dist/<path:filename>', 'static_dist', serve_dist)
+    app.add_url_rule('/static/sw.js', 'service_worker', service_worker)
+    app.jinja_env.globals['static_url'] = static_url
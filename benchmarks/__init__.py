@@ -0,0 +1,9 @@
+"""
+Route benchmarks against synthetic tailoring shops.
+
+    python -m benchmarks.run --customers 2000 --out bench.json
+    python -m benchmarks.run --compare bench.json   # exits 1 on a regression
+
+datagen.py builds the shop straight from models.py; run.py times the hot
+routes with Flask's test client and writes the results as JSON.
+"""
@@ -0,0 +1,203 @@
+"""
+Synthetic shop generator.
+
+build_shop() creates one User with its ShopProfile and categories, then
+customers, measurements and orders spread over the last `years` years with
+a realistic mix of work and payment statuses. Rows are written with bulk
+INSERTs (the per-object flush hooks would dominate at these sizes), so the
+derived data is rebuilt afterwards exactly as the maintenance commands do:
+daily rollups, the reminders queue and the shop's data version.
+"""
+import random
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import bindparam, insert, select, update
+
+from models import db, User, ShopProfile, Category, Customer, Measurement, Order, normalize_mobile
+import data_versions
+import reminder_queue
+import rollups
+
+FIRST_NAMES = {
+    'male': ['Ramesh', 'Suresh', 'Amit', 'Rahul', 'Vijay', 'Sanjay', 'Arjun', 'Kiran', 'Manoj', 'Nilesh'],
+    'female': ['Priya', 'Neha', 'Pooja', 'Anjali', 'Kavita', 'Sneha', 'Meera', 'Divya', 'Asha', 'Rekha'],
+}
+SURNAMES = ['Patel', 'Shah', 'Mehta', 'Desai', 'Joshi', 'Sharma', 'Verma', 'Iyer', 'Nair', 'Rao', 'Gupta', 'Trivedi']
+CITIES = [('Ahmedabad', 'Navrangpura'), ('Surat', 'Adajan'), ('Vadodara', 'Alkapuri'), ('Rajkot', 'Kalawad Road'),
+          ('Mumbai', 'Andheri'), ('Pune', 'Kothrud')]
+
+CATEGORIES = [
+    ('Shirt', 'male', ['Length', 'Chest', 'Shoulder', 'Sleeve', 'Collar', 'Cuff'], 650),
+    ('Pant', 'male', ['Length', 'Waist', 'Seat', 'Thigh', 'Knee', 'Bottom'], 750),
+    ('Kurta', 'male', ['Length', 'Chest', 'Shoulder', 'Sleeve'], 900),
+    ('Blouse', 'female', ['Length', 'Chest', 'Waist', 'Shoulder', 'Sleeve', 'Front Depth', 'Back Depth'], 800),
+    ('Kurti', 'female', ['Length', 'Chest', 'Waist', 'Hip', 'Shoulder'], 700),
+    ('Salwar', 'female', ['Length', 'Waist', 'Hip', 'Bottom'], 500),
+]
+
+# (work_status, weight) for orders older than their delivery date; newer ones are still in progress
+WORK_STATUSES = [('Delivered', 80), ('Ready to Deliver', 12), ('Working', 8)]
+OPEN_STATUSES = [('Working', 55), ('Processing', 25), ('Ready to Deliver', 20)]
+PAYMENT_MODES = ['Cash', 'UPI', 'Card']
+STAFF = ['Owner', 'Kishan', 'Ravi']
+
+CHUNK = 1000
+
+
+@dataclass
+class ShopSpec:
+    customers: int = 500
+    measurements_per_customer: int = 2
+    orders_per_customer: int = 4
+    years: int = 3
+    opening_balance_share: float = 0.02 # customers migrated with a "Previous Balance Due" order
+    seed: int = 42
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+def _insert_chunks(model, rows):
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[i:i + CHUNK])
+
+
+def _order_row(rng, user_id, customer_id, categories, created_at, today):
+    garments = rng.sample(categories, k=rng.choice([1, 1, 1, 2, 2, 3]))
+    items = [{'name': c.name, 'qty': rng.choice([1, 1, 2]), 'cost': price} for c, price in garments]
+    total = float(sum(item['qty'] * item['cost'] for item in items))
+    delivery_date = (created_at + timedelta(days=rng.randint(5, 21))).date()
+
+    if delivery_date < today - timedelta(days=14):
+        work_status = _weighted(rng, WORK_STATUSES)
+    else:
+        work_status = _weighted(rng, OPEN_STATUSES)
+
+    if work_status == 'Delivered' and rng.random() < 0.9:
+        advance = total
+    else:
+        advance = float(rng.choice([0, round(total * 0.3), round(total * 0.5), total]))
+    balance = round(total - advance, 2)
+    payment_status = 'Paid' if balance <= 0 else ('Partial' if advance > 0 else 'Pending')
+
+    return {
+        'user_id': user_id,
+        'customer_id': customer_id,
+        'items': items,
+        'start_date': created_at.date(),
+        'delivery_date': delivery_date,
+        'trial_date': (created_at + timedelta(days=rng.randint(3, 8))).date() if rng.random() < 0.3 else None,
+        'work_status': work_status,
+        'payment_status': payment_status,
+        'total_amt': total,
+        'advance': advance,
+        'balance': balance,
+        'payment_mode': rng.choice(PAYMENT_MODES),
+        'bill_created_by': rng.choice(STAFF),
+        'notes': None,
+        'created_at': created_at,
+    }
+
+
+def build_shop(spec, email='bench@example.com'):
+    """Creates the shop described by `spec` and commits. Returns a summary dict."""
+    rng = random.Random(spec.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    today = now.date()
+    span = timedelta(days=365 * spec.years)
+
+    user = User(username='Benchmark Shop', email=email, is_verified=True)
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(ShopProfile(user_id=user.id, shop_name='Benchmark Tailors', address='1 Market Road',
+                               mobile='9800000000', upi_id='bench@upi', bill_creators=STAFF))
+    categories = {'male': [], 'female': []}
+    for name, gender, fields, price in CATEGORIES:
+        category = Category(user_id=user.id, name=name, gender=gender, fields_json=fields, is_custom=False)
+        db.session.add(category)
+        categories[gender].append((category, price))
+    db.session.flush()
+
+    # Customers, with created / last visit filled in once their orders are known
+    customer_rows = []
+    for i in range(spec.customers):
+        gender = rng.choice(['male', 'female'])
+        city, area = rng.choice(CITIES)
+        mobile = f"+91 9{user.id % 100:02d}{i:07d}"
+        customer_rows.append({
+            'user_id': user.id,
+            'name': f"{rng.choice(FIRST_NAMES[gender])} {rng.choice(SURNAMES)}",
+            'mobile': mobile,
+            'mobile_digits': normalize_mobile(mobile),
+            'gender': gender,
+            'city': city,
+            'area': area,
+            'birthday': date(rng.randint(1960, 2004), rng.randint(1, 12), rng.randint(1, 28)) if rng.random() < 0.4 else None,
+            'created_date': now - span * rng.random(),
+            'last_visit': now,
+            'version': 1,
+        })
+    _insert_chunks(Customer, customer_rows)
+    customer_ids = db.session.execute(
+        select(Customer.id).where(Customer.user_id == user.id).order_by(Customer.id)).scalars().all()
+
+    order_rows, measurement_rows, visits = [], [], {}
+    for customer_id, customer in zip(customer_ids, customer_rows):
+        shop_categories = categories[customer['gender']]
+        first_seen = customer['created_date']
+        seen = [first_seen]
+        for _ in range(spec.orders_per_customer):
+            created_at = first_seen + (now - first_seen) * rng.random()
+            order_rows.append(_order_row(rng, user.id, customer_id, shop_categories, created_at, today))
+            seen.append(created_at)
+        if rng.random() < spec.opening_balance_share:
+            amount = float(rng.choice([500, 1200, 2500]))
+            order_rows.append({
+                'user_id': user.id, 'customer_id': customer_id,
+                'items': [{'name': reminder_queue.OPENING_BALANCE, 'qty': 1, 'cost': amount}],
+                'work_status': 'Delivered', 'payment_status': 'Pending', 'total_amt': amount, 'advance': 0.0,
+                'balance': amount, 'created_at': first_seen, 'start_date': None, 'delivery_date': None,
+                'trial_date': None, 'payment_mode': None, 'bill_created_by': 'System', 'notes': 'Opening balance',
+            })
+        for _ in range(spec.measurements_per_customer):
+            category, _ = rng.choice(shop_categories)
+            measurement_rows.append({
+                'user_id': user.id,
+                'customer_id': customer_id,
+                'category_id': category.id,
+                'date': first_seen + (now - first_seen) * rng.random(),
+                'measurements_json': {field: f"{rng.uniform(10, 44):.1f}" for field in category.fields_json},
+                'remarks': rng.choice([None, None, 'Loose fit', 'Slim fit']),
+                'is_active': True,
+            })
+        visits[customer_id] = max(seen)
+
+    _insert_chunks(Order, order_rows)
+    _insert_chunks(Measurement, measurement_rows)
+    customers = Customer.__table__
+    db.session.execute(
+        update(customers).where(customers.c.id == bindparam('cid')).values(last_visit=bindparam('visit')),
+        [{'cid': cid, 'visit': visit} for cid, visit in visits.items()])
+
+    # Derived tables, as `flask rebuild-rollups` / `flask build-reminders` would
+    rollups.rebuild(user.id)
+    reminder_queue.build(user.id)
+    data_versions.bump_user(user.id)
+    db.session.commit()
+
+    sample = rng.choice(customer_ids)
+    return {
+        'user_id': user.id,
+        'customers': len(customer_rows),
+        'orders': len(order_rows),
+        'measurements': len(measurement_rows),
+        'sample_customer_id': sample,
+        'sample_mobile': customer_rows[customer_ids.index(sample)]['mobile'],
+        'sample_order_id': db.session.execute(
+            select(Order.id).where(Order.customer_id == sample).order_by(Order.id.desc()).limit(1)).scalar(),
+        'spec': asdict(spec),
+    }
@@ -0,0 +1,258 @@
+"""
+Times the hot routes against a freshly generated shop and writes JSON.
+
+    python -m benchmarks.run [--customers N] [--orders-per-customer N] [--years N]
+                             [--iterations N] [--warmup N] [--out results.json]
+                             [--compare baseline.json] [--tolerance 0.25]
+
+By default the shop is built in a throwaway SQLite file. Pass --database-url
+to benchmark against another database (it is migrated to the latest revision
+and the benchmark shop is added next to whatever is there). Each route is
+requested `warmup` times untimed, then `iterations` times; the body is read
+inside the timer so streamed responses (CSV exports) are measured in full.
+"""
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n')[1])
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--orders-per-customer', type=int, default=4)
+    parser.add_argument('--measurements-per-customer', type=int, default=2)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', action='append', default=[], help='Run just these cases (repeatable)')
+    parser.add_argument('--database-url', help='Default: a temporary SQLite file')
+    parser.add_argument('--out', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Earlier results file; exit 1 if a median got slower')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed median slowdown (0.25 = 25%%)')
+    return parser.parse_args(argv)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _cases(shop):
+    """(name, method, path, form data, untimed setup per iteration)."""
+    today = date.today()
+    year_ago = (today - timedelta(days=365)).isoformat()
+    customer_id, order_id = shop['sample_customer_id'], shop['sample_order_id']
+
+    def discard_invoice(app):
+        import invoices
+        from models import Order, db
+        invoices.discard(app, db.session.get(Order, order_id))
+
+    cases = [
+        ('dashboard', 'GET', '/dashboard', None, None),
+        ('customers', 'GET', '/customers', None, None),
+        ('customers_page_search', 'GET', '/customers?q=Patel', None, None),
+        ('orders', 'GET', '/orders', None, None),
+        ('orders_status_filter', 'GET', '/orders?status=Working', None, None),
+        ('bills', 'GET', '/bills', None, None),
+        ('measurements', 'GET', '/measurements', None, None),
+        ('search_name', 'GET', '/search?q=Patel', None, None),
+        ('search_mobile', 'GET', f"/search?q={shop['sample_mobile'][-6:]}", None, None),
+        ('api_customer', 'GET', f'/api/customer/{customer_id}', None, None),
+        ('reminders', 'GET', '/reminders', None, None),
+        ('export_csv', 'GET', '/export_csv', None, None),
+    ]
+    for data_type in ('orders', 'customers', 'measurements', 'bills'):
+        form = {'start_date': year_ago, 'end_date': today.isoformat(), 'data_type': data_type}
+        cases.append((f'export_{data_type}', 'POST', '/settings/export_data', form, None))
+    cases += [
+        ('download_invoice_cold', 'GET', f'/invoice/{order_id}/download', None, discard_invoice),
+        ('download_invoice_cached', 'GET', f'/invoice/{order_id}/download', None, None),
+    ]
+    return cases
+
+
+def _time_case(app, client, queries, case, warmup, iterations):
+    name, method, path, form, setup = case
+    timings, counts = [], []
+    status = size = None
+    for i in range(warmup + iterations):
+        if setup:
+            with app.app_context():
+                setup(app)
+        queries[0] = 0
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=form, base_url='https://localhost')
+        body = response.get_data() # drains streamed bodies
+        elapsed = time.perf_counter() - started
+        response.close()
+        status, size = response.status_code, len(body)
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            counts.append(queries[0])
+    return {
+        'method': method,
+        'path': path,
+        'status': status,
+        'bytes': size,
+        'queries': max(counts),
+        'iterations': iterations,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(_percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def _snapshot(folder):
+    found = set()
+    for dirpath, _, filenames in os.walk(folder):
+        found.add(dirpath)
+        found.update(os.path.join(dirpath, f) for f in filenames)
+    return found
+
+
+def _remove_new_files(folder, before):
+    """Deletes the invoices (and folders) this run created, keeping anything that was already there."""
+    created = sorted(_snapshot(folder) - before, key=len, reverse=True) # files and subfolders before their parents
+    for path in created:
+        if os.path.isdir(path):
+            os.rmdir(path)
+        else:
+            os.remove(path)
+
+
+def compare(results, baseline, tolerance):
+    """Prints median changes against `baseline`; returns the names that regressed."""
+    regressed = []
+    print(f"\n{'case':<28}{'baseline':>12}{'now':>12}{'change':>10}")
+    for name, now in results['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"{name:<28}{'-':>12}{now['median_ms']:>11.2f}ms{'new':>10}")
+            continue
+        change = now['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        flag = ''
+        if change > tolerance:
+            regressed.append(name)
+            flag = '  SLOWER'
+        print(f"{name:<28}{before['median_ms']:>10.2f}ms{now['median_ms']:>10.2f}ms{change:>+10.0%}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    workdir = None
+    if not args.database_url:
+        workdir = tempfile.mkdtemp(prefix='talvex-bench-')
+        args.database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # config.py reads the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('REMINDER_SCHEDULER', '0')
+    os.environ.setdefault('OUTBOX_SENDER', '0')
+    sys.path.insert(0, ROOT)
+
+    from sqlalchemy import event
+    from app import create_app, limiter
+    from models import db
+    import flask_migrate
+    import search
+    import sqlalchemy
+    from benchmarks.datagen import ShopSpec, build_shop
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False # the export form is POSTed without a rendered token
+    limiter.enabled = False
+
+    spec = ShopSpec(customers=args.customers, measurements_per_customer=args.measurements_per_customer,
+                    orders_per_customer=args.orders_per_customer, years=args.years, seed=args.seed)
+    try:
+        with app.app_context():
+            # Same schema as production, including the search indexes the migrations create
+            flask_migrate.upgrade(directory=os.path.join(ROOT, 'migrations'))
+            search.detect_search_backend(app)
+            started = time.perf_counter()
+            shop = build_shop(spec, email=f"bench-{int(time.time())}@example.com")
+            shop['build_seconds'] = round(time.perf_counter() - started, 3)
+            engine = db.engine
+        print(f"Built shop: {shop['customers']} customers, {shop['orders']} orders, "
+              f"{shop['measurements']} measurements in {shop['build_seconds']}s")
+
+        bills_root = os.path.join(app.root_path, 'saved_bills')
+        existing_bills = _snapshot(bills_root)
+
+        queries = [0]
+        event.listen(engine, 'after_cursor_execute', lambda *a: queries.__setitem__(0, queries[0] + 1))
+
+        client = app.test_client()
+        with client.session_transaction(base_url='https://localhost') as session:
+            session['_user_id'] = str(shop['user_id'])
+            session['_fresh'] = True
+
+        results = {}
+        for case in _cases(shop):
+            if args.only and case[0] not in args.only:
+                continue
+            result = _time_case(app, client, queries, case, args.warmup, args.iterations)
+            results[case[0]] = result
+            print(f"{case[0]:<28}{result['median_ms']:>10.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                  f"{result['queries']:>4} queries  {result['status']}")
+        _remove_new_files(bills_root, existing_bills)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'flask': importlib.metadata.version('flask'),
+            'sqlalchemy': sqlalchemy.__version__,
+            'database': engine.dialect.name,
+            'db_profile': app.extensions.get('db_profile'),
+            'search_backend': app.extensions.get(search.EXTENSION_KEY),
+            'warmup': args.warmup,
+        },
+        'dataset': shop,
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(output, f, indent=2, default=str)
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(output, json.load(f), args.tolerance)
+        if regressed:
+            print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import click
+
+from models import db
+
+
+def register_commands(app):
+    """Maintenance commands, run with `flask --app app <command>`."""
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this shop (default: all shops).')
+    def rebuild_rollups_command(user_id):
+        """Backfill / repair the DailyRollup table from raw orders and customers."""
+        import rollups
+        count = rollups.rebuild(user_id)
+        db.session.commit()
+        click.echo(f"Rebuilt {count} daily rollup rows.")
+
+    @app.cli.command('build-reminders')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild this shop (default: all shops).')
+    def build_reminders_command(user_id):
+        """Regenerate the reminders queue for today (run daily from cron with REMINDER_SCHEDULER=0)."""
+        import reminder_queue
+        count = reminder_queue.build(user_id)
+        db.session.commit()
+        click.echo(f"Queued {count} reminders.")
+
+    @app.cli.command('db-profile')
+    def db_profile_command():
+        """Show the active database profile, its engine options and what the database reports."""
+        import db_profiles
+        click.echo(f"Profile: {app.config['DB_PROFILE']}")
+        for key, value in sorted(app.config['SQLALCHEMY_ENGINE_OPTIONS'].items()):
+            click.echo(f"  {key} = {value}")
+        for key, value in db_profiles.describe(db.engine):
+            click.echo(f"  [db] {key} = {value}")
+
+    @app.cli.command('translate-missing')
+    @click.option('--lang', 'langs', multiple=True, help='Language code to fill (repeatable, default: all).')
+    def translate_missing_command(langs):
+        """Offline batch job: translate catalog/template keys missing from translations/<lang>.json."""
+        import os
+        from i18n import fill_missing
+        added = fill_missing(
+            os.path.join(app.root_path, 'translations'),
+            os.path.join(app.root_path, 'templates'),
+            langs=list(langs) or None
+        )
+        for lang, count in added.items():
+            click.echo(f"{lang}: {count} keys added")
+        click.echo("Restart the app workers to load the updated catalog.")
+
+    @app.cli.command('check-indexes')
+    @click.option('--user-id', type=int, default=1, help='Shop to use in the sample queries.')
+    @click.option('--verbose', is_flag=True, help='Print every query plan.')
+    def check_indexes_command(user_id, verbose):
+        """EXPLAIN the hot route queries and verify each one uses its index."""
+        from index_check import check_indexes
+        failures = 0
+        for description, passed, plan in check_indexes(user_id):
+            click.echo(f"[{'OK' if passed else 'FAIL'}] {description}")
+            if verbose or not passed:
+                click.echo('    ' + plan.replace('\n', '\n    '))
+            failures += not passed
+        if failures:
+            raise SystemExit(1)
+
+    @app.cli.command('run-export-jobs')
+    @click.option('--loop', is_flag=True, help='Keep polling for new jobs instead of exiting.')
+    @click.option('--interval', type=int, default=5, help='Seconds between polls with --loop.')
+    def run_export_jobs_command(loop, interval):
+        """Process pending background exports (use with EXPORT_WORKERS=0 on the web process)."""
+        import time
+        import export_jobs
+        while True:
+            count = export_jobs.run_pending(app)
+            if count:
+                click.echo(f"Processed {count} export jobs.")
+            if not loop:
+                break
+            time.sleep(interval)
+
+    @app.cli.command('send-outbox')
+    @click.option('--loop', is_flag=True, help='Keep sending as mail is queued instead of exiting.')
+    @click.option('--interval', type=int, default=2, help='Seconds between polls with --loop.')
+    def send_outbox_command(loop, interval):
+        """Deliver queued emails (use with OUTBOX_SENDER=0 on the web process)."""
+        import time
+        import outbox
+        pool = outbox.SMTPPool(app) # one SMTP connection reused across batches
+        try:
+            while True:
+                count = outbox.drain(app, pool)
+                if count:
+                    click.echo(f"Processed {count} emails.")
+                if not loop:
+                    break
+                time.sleep(interval)
+                pool.close_if_idle()
+        finally:
+            pool.close()
+
+    @app.cli.command('bulk-invoices')
+    @click.option('--user-id', type=int, required=True, help='Shop whose bills are rendered.')
+    @click.option('--start', 'start_day', type=click.DateTime(['%Y-%m-%d']), required=True, help='First day (YYYY-MM-DD).')
+    @click.option('--end', 'end_day', type=click.DateTime(['%Y-%m-%d']), required=True, help='Last day, inclusive.')
+    @click.option('--lang', default='en', help='Invoice language (en, hi, gu).')
+    @click.option('--workers', type=int, default=None, help='PDF render processes (default: INVOICE_WORKERS).')
+    @click.option('--out', 'out_path', type=click.Path(dir_okay=False), required=True, help='ZIP file to write.')
+    def bulk_invoices_command(user_id, start_day, end_day, lang, workers, out_path):
+        """Render every bill in a date range and write them to one ZIP."""
+        from datetime import timedelta
+        import invoices
+        count = 0
+        with app.test_request_context(query_string={'lang': lang}):
+            entries = invoices.iter_bills(app, user_id, start_day, end_day + timedelta(days=1), workers=workers)
+
+            def counted():
+                nonlocal count
+                for entry in entries:
+                    count += 1
+                    yield entry
+
+            with open(out_path, 'wb') as f:
+                for chunk in invoices.iter_zip(counted()):
+                    f.write(chunk)
+        click.echo(f"Wrote {count} bills to {out_path}")
+
+    @app.cli.command('build-assets')
+    @click.option('--clean', is_flag=True, help='Remove previously built files first.')
+    def build_assets_command(clean):
+        """Write content-hashed copies of the static assets (plus .gz/.br) and their manifest."""
+        import assets
+        manifest = assets.build(app.static_folder, clean=clean)
+        for source, target in sorted(manifest['files'].items()):
+            click.echo(f"{source} -> {target}")
+        click.echo(f"Asset version {manifest['version']}. Restart the app workers to pick it up.")
@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
 
+import db_profiles
+
 load_dotenv()
 
 class Config:
@@ -20,12 +22,61 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # Email Config (Gmail)
-    MAIL_SERVER = 'smtp.gmail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Pool / connection settings: small-sqlite, pg-single or pg-pgbouncer (see db_profiles.py)
+    DB_PROFILE = db_profiles.profile_name(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_ENGINE_OPTIONS = db_profiles.engine_options(SQLALCHEMY_DATABASE_URI, DB_PROFILE)
+
+    # Seconds to reuse the current User / ShopProfile across requests (0 = per request only)
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 0))
+
+    # Rate limit and login lockout counters, shared by all workers (see counters.py):
+    # memory:// (single process), redis://host:6379 or sqlite:////path/to/counters.db
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+
+    # /metrics (Prometheus text format): served only with `Authorization: Bearer <METRICS_TOKEN>` (404 when unset).
+    # METRICS_ALLOW_LOCAL=1 also serves direct scrapes from 127.0.0.1 / ::1; leave it off behind a reverse proxy
+    # on the same host, whose requests arrive from 127.0.0.1 too.
+    # Statements slower than SLOW_QUERY_MS are logged with the view that ran them.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOW_LOCAL = os.environ.get('METRICS_ALLOW_LOCAL', '0') == '1'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+
+    # Background export workers in the web process (0 = leave jobs to `flask run-export-jobs`),
+    # and days a finished export (row and file) is kept
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_RETENTION_DAYS = int(os.environ.get('EXPORT_RETENTION_DAYS', 7))
+
+    # Uploads: per image cap, and a hard cap on the whole request body (Werkzeug answers 413)
+    IMAGE_UPLOAD_MAX_BYTES = int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 5 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+    # Processes converting invoices to PDF for bulk downloads, shared by every request of a web worker
+    INVOICE_WORKERS = int(os.environ.get('INVOICE_WORKERS', 2))
+
+    # Rebuild every shop's reminders queue daily from a thread in the web process (only for a
+    # single-process deployment; `flask build-reminders` from cron does the same). Without either,
+    # each shop's queue is rebuilt on its first /reminders or dashboard view of the day.
+    REMINDER_SCHEDULER = os.environ.get('REMINDER_SCHEDULER', '0') == '1'
+
+    # Email Config (Gmail by default; MAIL_SERVER=localhost MAIL_PORT=8025 MAIL_USE_TLS=0 for a local stand-in)
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') == '1'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME
+
+    # Outbox (outbox.py): sender thread in the web process (0 = `flask send-outbox --loop`), its poll
+    # interval, emails per batch, attempts before giving up, kept-open SMTP connection idle limit / socket timeout,
+    # days finished rows are kept (their bodies are cleared as soon as they finish)
+    OUTBOX_SENDER = os.environ.get('OUTBOX_SENDER', '1') == '1'
+    OUTBOX_POLL_SECONDS = int(os.environ.get('OUTBOX_POLL_SECONDS', 30))
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 20))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+    OUTBOX_SMTP_IDLE = int(os.environ.get('OUTBOX_SMTP_IDLE', 60))
+    OUTBOX_SMTP_TIMEOUT = int(os.environ.get('OUTBOX_SMTP_TIMEOUT', 10))
+    OUTBOX_RETENTION_DAYS = int(os.environ.get('OUTBOX_RETENTION_DAYS', 7))
     
     # Google OAuth
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
@@ -0,0 +1,144 @@
+"""
+Shared counters for rate limits and login lockouts.
+
+Flask-Limiter and LoginLockout both keep their fixed-window counters in the
+storage named by RATELIMIT_STORAGE_URI, so limits hold across every
+gunicorn worker instead of per process:
+
+    memory://                    one process only (development)
+    redis://localhost:6379       any Redis-compatible server (needs `redis`)
+    sqlite:////var/lib/talvex/counters.db
+                                 a small WAL-mode SQLite file shared by the
+                                 workers on one host (SQLiteStorage below)
+
+Failed logins are counted there too, so a wrong password no longer costs a
+commit on the User row.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+# Delete expired windows on roughly one increment in this many
+PURGE_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    """
+    limits storage backed by one SQLite table of fixed windows:
+    key -> (count, expires_at). An increment is a single upsert inside
+    BEGIN IMMEDIATE, so concurrent workers never lose an update.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # Same form as SQLAlchemy URLs: sqlite:///relative.db, sqlite:////absolute.db
+        self.path = uri[len('sqlite:///'):] or ':memory:'
+        self.timeout = float(options.get('timeout', 5))
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory and self.path != ':memory:':
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_counter ("
+            " key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL') # counters may lose the last writes on power loss, never on a crash
+            self._local.conn = conn
+        return conn
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "INSERT INTO rate_counter (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                " value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,"
+                " expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END",
+                (key, amount, now + expiry, now, now)
+            )
+            value = conn.execute("SELECT value FROM rate_counter WHERE key = ?", (key,)).fetchone()[0]
+            if random.randrange(PURGE_EVERY) == 0:
+                conn.execute("DELETE FROM rate_counter WHERE expires_at <= ?", (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM rate_counter WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_counter WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute("DELETE FROM rate_counter").rowcount
+
+    def clear(self, key):
+        self._connection().execute("DELETE FROM rate_counter WHERE key = ?", (key,))
+
+
+class LoginLockout:
+    """
+    `threshold` failed passwords within `lock_seconds` lock the account for
+    `lock_seconds`. Both counters live in the limiter's storage.
+    """
+
+    def __init__(self, storage, threshold=5, lock_seconds=4 * 3600):
+        self.storage = storage
+        self.threshold = threshold
+        self.lock_seconds = lock_seconds
+
+    @staticmethod
+    def _keys(user_id):
+        return f"login-failures/{user_id}", f"login-locked/{user_id}"
+
+    def locked_for(self, user_id):
+        """Seconds until the account unlocks (0 = not locked)."""
+        _, lock_key = self._keys(user_id)
+        if not self.storage.get(lock_key):
+            return 0
+        return max(0, int(self.storage.get_expiry(lock_key) - time.time()))
+
+    def record_failure(self, user_id):
+        """Counts a wrong password; returns True when this attempt locked the account."""
+        failures_key, lock_key = self._keys(user_id)
+        if self.storage.incr(failures_key, self.lock_seconds) < self.threshold:
+            return False
+        self.storage.incr(lock_key, self.lock_seconds)
+        self.storage.clear(failures_key)
+        return True
+
+    def reset(self, user_id):
+        self.storage.clear(self._keys(user_id)[0])
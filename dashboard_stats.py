@@ -0,0 +1,161 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlalchemy import func, case
+
+from models import db, Customer, Order, DailyRollup
+from date_ranges import day_start, add_months, day_range, month_range, year_range
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    """All headline numbers shown on the dashboard, computed in one pass."""
+    total_customers: int = 0
+    customers_this_week: int = 0
+    today_customers: int = 0
+    yesterday_customers: int = 0
+    monthly_customers: int = 0
+    yearly_customers: int = 0
+
+    pending_balance: float = 0
+    balance_added: float = 0
+    total_revenue: float = 0
+    monthly_pending: float = 0
+    monthly_revenue: float = 0
+    yearly_revenue: float = 0
+
+    pending_delivery: int = 0
+    delivery_today: int = 0
+
+    # Pie chart (work status -> count) and 6 month customer chart
+    status_counts: dict = field(default_factory=dict)
+    chart_labels: list = field(default_factory=list)
+    chart_values: list = field(default_factory=list)
+
+    @property
+    def today_vs_yesterday(self):
+        return self.today_customers - self.yesterday_customers
+
+    @property
+    def pie_labels(self):
+        return list(self.status_counts.keys())
+
+    @property
+    def pie_values(self):
+        return list(self.status_counts.values())
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, column):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def _pie_key(status):
+    # Legacy statuses are folded into the current three buckets
+    if status in ['Pending', 'Processing']:
+        return 'Working'
+    if status == 'Ready':
+        return 'Ready to Deliver'
+    return status
+
+
+def compute_dashboard_stats(user_id, today=None):
+    """
+    Builds DashboardStats for a shop with two conditional aggregation
+    queries (one over Customer, one over Order grouped by work status)
+    instead of one round-trip per figure. Monthly and yearly figures are
+    a range sum over this year's DailyRollup rows (at most 366).
+    """
+    today = today or date.today()
+    today_start, tomorrow_start = day_range(today)
+    yesterday_start = today_start - timedelta(days=1)
+    week_start = today_start - timedelta(days=7)
+    month_start, next_month_start = month_range(today.year, today.month)
+    year_start, next_year_start = year_range(today.year)
+
+    # Month buckets for the chart, oldest first, plus the exclusive upper bound
+    chart_months = [add_months(today, -back) for back in range(5, -1, -1)]
+    chart_bounds = [day_start(m) for m in chart_months] + [next_month_start]
+
+    # 1. Customers: one row
+    created = Customer.created_date
+    visit = Customer.last_visit
+    customer_cols = [
+        func.count(Customer.id),
+        _count_if(visit >= week_start),
+        _count_if((visit >= today_start) & (visit < tomorrow_start)),
+        _count_if((visit >= yesterday_start) & (visit < today_start)),
+    ]
+    customer_cols += [
+        _count_if((created >= chart_bounds[i]) & (created < chart_bounds[i + 1]))
+        for i in range(len(chart_months))
+    ]
+    customer_row = db.session.query(*customer_cols).filter(Customer.user_id == user_id).one()
+    total_customers, week_customers, today_customers, yesterday_customers = customer_row[:4]
+    chart_values = [int(v) for v in customer_row[4:]]
+
+    # 2. Orders: one row per work status
+    created_at = Order.created_at
+    order_rows = db.session.query(
+        Order.work_status,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.balance), 0),
+        func.coalesce(func.sum(Order.total_amt), 0),
+        _sum_if((created_at >= today_start) & (created_at < tomorrow_start), Order.total_amt),
+        _count_if(Order.delivery_date == today),
+    ).filter(Order.user_id == user_id).group_by(Order.work_status).all()
+
+    totals = dict(pending_balance=0, balance_added=0, total_revenue=0,
+                  pending_delivery=0, delivery_today=0)
+    status_counts = {'Working': 0, 'Ready to Deliver': 0, 'Delivered': 0}
+
+    for status, count, balance, revenue, added_today, due_today in order_rows:
+        totals['pending_balance'] += balance
+        totals['total_revenue'] += revenue
+        totals['balance_added'] += added_today
+
+        if status in ['Working', 'Ready to Deliver']:
+            totals['pending_delivery'] += count
+        if status is not None and status != 'Delivered':
+            totals['delivery_today'] += due_today
+
+        key = _pie_key(status)
+        if key in status_counts:
+            status_counts[key] += count
+        else:
+            status_counts.setdefault('Other', 0)
+            status_counts['Other'] += count
+
+    # 3. Month / year windows: one pass over this year's rollup rows
+    this_month = DailyRollup.day >= month_start.date()
+    (yearly_customers, yearly_revenue, monthly_customers,
+     monthly_revenue, monthly_pending) = db.session.query(
+        func.coalesce(func.sum(DailyRollup.new_customers), 0),
+        func.coalesce(func.sum(DailyRollup.revenue), 0),
+        _sum_if(this_month, DailyRollup.new_customers),
+        _sum_if(this_month, DailyRollup.revenue),
+        _sum_if(this_month, DailyRollup.balance),
+    ).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.day >= year_start.date(),
+        DailyRollup.day < next_year_start.date()
+    ).one()
+
+    return DashboardStats(
+        total_customers=total_customers,
+        customers_this_week=week_customers,
+        today_customers=today_customers,
+        yesterday_customers=yesterday_customers,
+        monthly_customers=monthly_customers,
+        yearly_customers=yearly_customers,
+        monthly_pending=monthly_pending,
+        monthly_revenue=monthly_revenue,
+        yearly_revenue=yearly_revenue,
+        status_counts=status_counts,
+        chart_labels=[m.strftime('%b') for m in chart_months],
+        chart_values=chart_values,
+        **totals
+    )
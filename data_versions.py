@@ -0,0 +1,156 @@
+"""
+Version counters used as HTTP cache validators.
+
+Customer.version is bumped whenever the customer row, or one of its orders
+or measurements, is inserted, updated or deleted through the ORM session,
+so /api/customer/<id> can answer If-None-Match from the customer row alone.
+
+User.data_version is bumped on any write to the shop's customers, orders,
+measurements, categories, reminders or shop profile. The list and
+dashboard pages (@conditional_page) derive a weak ETag from it and answer
+304 before running their queries.
+
+Writes are collected in session.info on each flush and both counters are
+bumped once, in before_commit. Bulk Query.delete() calls bypass the
+session: call bump_user() after them.
+"""
+import functools
+import hashlib
+import time
+from datetime import date
+
+from flask import g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from models import db, User, Customer, Order, Measurement, Category, Reminder, ShopProfile
+
+# Models whose rows belong to one shop through user_id
+USER_SCOPED = (Customer, Order, Measurement, Category, Reminder, ShopProfile)
+
+# Cached pages embed a CSRF token; never revalidate one older than this
+# (Flask-WTF tokens expire after WTF_CSRF_TIME_LIMIT, 3600s by default)
+PAGE_ETAG_WINDOW = 1800
+
+
+def _changed(session, obj):
+    return obj not in session.dirty or session.is_modified(obj)
+
+
+def _touched_ids(session):
+    """Returns (customer ids, user ids) written by the pending flush."""
+    customer_ids, user_ids = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, USER_SCOPED) or not _changed(session, obj):
+            continue
+        if obj.user_id is not None:
+            user_ids.add(obj.user_id)
+        if isinstance(obj, Customer) and obj not in session.new:
+            customer_ids.add(obj.id)
+        elif isinstance(obj, (Order, Measurement)) and obj.customer_id is not None:
+            customer_ids.add(obj.customer_id)
+    return customer_ids, user_ids
+
+
+# session.info key: ({customer ids}, {user ids}) written since the last commit
+PENDING = 'data_versions_pending'
+
+
+def _pending(session):
+    return session.info.setdefault(PENDING, (set(), set()))
+
+
+def _expire(session, model, ids, attribute):
+    # Loaded instances would otherwise keep reporting the old version
+    for obj in session.identity_map.values():
+        if isinstance(obj, model) and obj.id in ids:
+            session.expire(obj, [attribute])
+
+
+def _collect_versions(session, flush_context):
+    customer_ids, user_ids = _touched_ids(session)
+    pending_customers, pending_users = _pending(session)
+    pending_customers |= customer_ids
+    pending_users |= user_ids
+
+
+def _bump_versions(session):
+    """One UPDATE per table per transaction, however many flushes it had."""
+    session.flush() # commit() flushes after before_commit; collect those writes too
+    customer_ids, user_ids = session.info.pop(PENDING, (set(), set()))
+    if not customer_ids and not user_ids:
+        return
+    conn = session.connection()
+    if customer_ids:
+        conn.execute(update(Customer).where(Customer.id.in_(customer_ids)).values(version=Customer.version + 1))
+        _expire(session, Customer, customer_ids, 'version')
+    if user_ids:
+        conn.execute(update(User).where(User.id.in_(user_ids)).values(data_version=User.data_version + 1))
+        _expire(session, User, user_ids, 'data_version')
+
+
+def _discard_versions(session, transaction):
+    # Rolled back: nothing to bump. Savepoints keep their ids; an extra bump is harmless.
+    if transaction.parent is None:
+        session.info.pop(PENDING, None)
+
+
+def register():
+    for name, listener in (('after_flush', _collect_versions), ('before_commit', _bump_versions),
+                           ('after_transaction_end', _discard_versions)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
+
+
+def bump_user(user_id):
+    """For writes that bypass the session (bulk deletes). Bumped when the caller's transaction commits."""
+    _pending(db.session)[1].add(user_id)
+
+
+def customer_etag(customer):
+    return f"customer-{customer.id}-v{customer.version}"
+
+
+def user_version(user_id):
+    """Current data version, read once per request (a primary key lookup)."""
+    if 'data_version' not in g:
+        g.data_version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar()
+    return g.data_version
+
+
+def page_etag():
+    """Everything a list / dashboard page render depends on besides the data itself."""
+    parts = [
+        request.endpoint,
+        sorted(request.args.items(multi=True)),
+        current_user.id,
+        user_version(current_user.id),
+        request.headers.get('X-Partial', ''),
+        request.args.get('lang', session.get('lang', 'en')),
+        date.today().isoformat(), # due today / overdue / this month
+        int(time.time() // PAGE_ETAG_WINDOW),
+    ]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def conditional_page(view):
+    """GET views: weak ETag from page_etag(), 304 before the view runs any query."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pending flash messages are part of the page, so never reuse one then
+        if request.method != 'GET' or '_flashes' in session:
+            return view(*args, **kwargs)
+
+        etag = page_etag()
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('X-Partial')
+        return response
+    return wrapper
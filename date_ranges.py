@@ -0,0 +1,73 @@
+"""
+Half-open [start, end) datetime ranges for the day / month / year filters.
+
+Filtering with `column >= start AND column < end` keeps the predicate
+sargable, so the per-user timestamp indexes are used as range scans.
+Never wrap the column itself (func.date(), extract(), strftime()).
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_
+
+
+def day_start(d):
+    return datetime.combine(d, time.min)
+
+
+def add_months(d, months):
+    """First day of the month `months` away from d's month (negative goes back)."""
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def day_range(d):
+    start = day_start(d)
+    return start, start + timedelta(days=1)
+
+
+def month_range(year, month):
+    first = date(year, month, 1)
+    return day_start(first), day_start(add_months(first, 1))
+
+
+def year_range(year):
+    return day_start(date(year, 1, 1)), day_start(date(year + 1, 1, 1))
+
+
+def parse_day(value):
+    """'YYYY-MM-DD' -> date, or None if missing/invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def month_from_args(args, today=None):
+    """Reads ?month=&year= (defaulting to the current month) -> (month, year)."""
+    today = today or datetime.now()
+    try:
+        month = int(args.get('month', today.month))
+        year = int(args.get('year', today.year))
+        add_months(date(year, month, 1), 1) # month_range() needs the next month too (no year 10000)
+    except ValueError:
+        return today.month, today.year
+    return month, year
+
+
+def month_label(year, month):
+    """'March 2024', for the month navigation headers."""
+    return date(year, month, 1).strftime('%B %Y')
+
+
+def in_range(column, start, end):
+    return and_(column >= start, column < end)
+
+
+def on_day(column, d):
+    return in_range(column, *day_range(d))
+
+
+def in_month(column, year, month):
+    return in_range(column, *month_range(year, month))
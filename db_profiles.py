@@ -0,0 +1,120 @@
+"""
+Database profiles: engine / pool settings per kind of deployment.
+
+DB_PROFILE picks one (default: small-sqlite for sqlite:// URLs, pg-single
+otherwise):
+
+    small-sqlite   one host, SQLite file. WAL journal, synchronous=NORMAL,
+                   mmap and page cache sized by env, busy_timeout so
+                   concurrent writers wait instead of failing with
+                   "database is locked".
+    pg-single      app talks to Postgres directly. Pooled connections with
+                   pre-ping and recycle; statement_timeout set at connect.
+    pg-pgbouncer   PgBouncer in transaction mode does the pooling, so no
+                   app-side pool (NullPool). PgBouncer does not forward the
+                   `options` startup parameter, so statement_timeout is set
+                   with SET LOCAL at the start of every transaction.
+
+Every number comes from an environment variable (see _settings()).
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+PROFILES = ('small-sqlite', 'pg-single', 'pg-pgbouncer')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _settings():
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10), # seconds to wait for a free connection
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'statement_timeout_ms': _env_int('DB_STATEMENT_TIMEOUT_MS', 30000),
+        'sqlite_busy_timeout_ms': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'sqlite_cache_size_kb': _env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024),
+        'sqlite_mmap_size': _env_int('SQLITE_MMAP_SIZE', 128 * 1024 * 1024),
+        'sqlite_synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper(),
+    }
+
+
+def profile_name(uri):
+    name = os.environ.get('DB_PROFILE')
+    if name:
+        if name not in PROFILES:
+            raise ValueError(f"Unknown DB_PROFILE {name!r} (expected one of: {', '.join(PROFILES)})")
+        if name.startswith('pg-') and not uri.startswith('postgresql'):
+            raise ValueError(f"DB_PROFILE {name} needs a postgresql:// DATABASE_URL")
+        return name
+    return 'small-sqlite' if uri.startswith('sqlite') else 'pg-single'
+
+
+def engine_options(uri, name):
+    """SQLALCHEMY_ENGINE_OPTIONS for a profile."""
+    s = _settings()
+    if name == 'small-sqlite':
+        # The driver's own lock wait, matching PRAGMA busy_timeout below
+        return {'connect_args': {'timeout': s['sqlite_busy_timeout_ms'] / 1000}}
+    if name == 'pg-single':
+        return {
+            'pool_size': s['pool_size'],
+            'max_overflow': s['max_overflow'],
+            'pool_timeout': s['pool_timeout'],
+            'pool_recycle': s['pool_recycle'],
+            'pool_pre_ping': True,
+            'connect_args': {'options': f"-c statement_timeout={s['statement_timeout_ms']}"},
+        }
+    return {'poolclass': NullPool}
+
+
+def _sqlite_pragmas(settings):
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={settings['sqlite_synchronous']}",
+        f"PRAGMA busy_timeout={settings['sqlite_busy_timeout_ms']}",
+        f"PRAGMA cache_size=-{settings['sqlite_cache_size_kb']}", # negative = KiB
+        f"PRAGMA mmap_size={settings['sqlite_mmap_size']}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def init_engine(app, engine):
+    """Connect / begin hooks for the profile in app.config['DB_PROFILE']."""
+    name = app.config['DB_PROFILE']
+    settings = _settings()
+
+    if name == 'small-sqlite' and engine.url.database not in (None, '', ':memory:'):
+        pragmas = _sqlite_pragmas(settings)
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    elif name == 'pg-pgbouncer':
+        timeout = int(settings['statement_timeout_ms'])
+
+        @event.listens_for(engine, 'begin')
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout}")
+
+    app.extensions['db_profile'] = name
+
+
+def describe(engine):
+    """(setting, value) pairs as the database reports them, for `flask db-profile`."""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            names = ['journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store']
+            return [(n, conn.exec_driver_sql(f'PRAGMA {n}').scalar()) for n in names]
+        if engine.dialect.name == 'postgresql':
+            return [('statement_timeout', conn.exec_driver_sql('SHOW statement_timeout').scalar())]
+    return []
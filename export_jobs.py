@@ -0,0 +1,250 @@
+"""
+Background export jobs.
+
+Submitting an export stores an ExportJob row and hands its id to a small
+in-process thread pool (EXPORT_WORKERS), so the request returns at once.
+Jobs can also be drained by a separate process with
+`flask --app app run-export-jobs`. Output is gzip-compressed CSV under
+saved_exports/<user_id>/, served with Range support for resumable downloads.
+
+A running job holds a lease (lease_until) that its worker renews while
+writing. If the worker dies or is recycled, the lease runs out and the job
+is taken over by the next worker, up to MAX_ATTEMPTS runs, then marked
+Failed. Polling the job's status is enough to trigger the takeover. Each run
+writes its own file and only records it if the job is still on that run's
+attempt, so a worker that lost its lease cannot overwrite the one that took
+over. Finished jobs and their files are purged after EXPORT_RETENTION_DAYS.
+"""
+import gzip
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, or_, update
+
+from models import db, ExportJob
+import exports
+
+# A Running job whose lease has passed is taken to have lost its worker
+RUNNING_LEASE = timedelta(minutes=2)
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set() # job ids submitted to this process's pool and not finished yet
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('EXPORT_WORKERS', 2),
+                thread_name_prefix='export-job'
+            )
+    return _executor
+
+
+def export_dir(app, user_id):
+    return os.path.join(app.root_path, 'saved_exports', str(user_id))
+
+
+def create_job(app, user_id, data_type, start_date, end_date):
+    purge(app)
+    job = ExportJob(user_id=user_id, data_type=data_type, start_date=start_date, end_date=end_date)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def enqueue(app, job_id):
+    """Submits a job to the in-process pool, unless it is already waiting or running there."""
+    executor = _get_executor(app)
+    with _executor_lock:
+        if job_id in _in_flight:
+            return
+        _in_flight.add(job_id)
+    executor.submit(_run_in_context, app, job_id)
+
+
+def _run_in_context(app, job_id):
+    with app.app_context():
+        try:
+            run_job(app, job_id)
+        finally:
+            db.session.remove()
+            with _executor_lock:
+                _in_flight.discard(job_id)
+
+
+def _stale(now):
+    # lease_until is NULL on jobs left Running before leases existed
+    return and_(ExportJob.status == 'Running', or_(ExportJob.lease_until.is_(None), ExportJob.lease_until < now))
+
+
+def _claim(job_id):
+    """
+    Pending (or Running with an expired lease) -> Running. Returns the attempt
+    number this worker now holds, or None if another worker has the job.
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id,
+               or_(ExportJob.status == 'Pending', _stale(now)),
+               ExportJob.attempts < MAX_ATTEMPTS)
+        .values(status='Running', lease_until=now + RUNNING_LEASE, attempts=ExportJob.attempts + 1)
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return None
+    return db.session.get(ExportJob, job_id).attempts
+
+
+def _held(job_id, attempt):
+    """The job is still Running on `attempt` (no other worker has taken it over)."""
+    return and_(ExportJob.id == job_id, ExportJob.status == 'Running', ExportJob.attempts == attempt)
+
+
+def _renew_lease(job_id, attempt):
+    # Own connection: the session is in the middle of streaming the export's rows
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(ExportJob)
+            .where(_held(job_id, attempt))
+            .values(lease_until=datetime.utcnow() + RUNNING_LEASE)
+        )
+
+
+def _finish(job_id, attempt, **values):
+    """Records the outcome of `attempt`; False (nothing written) if the job was taken over meanwhile."""
+    result = db.session.execute(
+        update(ExportJob)
+        .where(_held(job_id, attempt))
+        .values(lease_until=None, finished_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def fail_abandoned():
+    """Marks stale jobs that used up their attempts as Failed. Returns how many."""
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(ExportJob)
+        .where(_stale(now), ExportJob.attempts >= MAX_ATTEMPTS)
+        .values(status='Failed', lease_until=None, error='The export stopped before finishing.', finished_at=now)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def recover(app, job):
+    """
+    Called when a job is polled: hands a job whose worker has gone (expired
+    lease, or Pending long enough to have been dropped with a restarted
+    process) back to the in-process pool, or fails it when out of attempts.
+    """
+    now = datetime.utcnow()
+    stale = job.status == 'Running' and (job.lease_until is None or job.lease_until < now)
+    dropped = job.status == 'Pending' and job.created_at is not None and job.created_at < now - RUNNING_LEASE
+    if stale and job.attempts >= MAX_ATTEMPTS:
+        fail_abandoned()
+        db.session.refresh(job)
+    elif (stale or dropped) and app.config.get('EXPORT_WORKERS', 2) > 0:
+        enqueue(app, job.id) # _claim() makes sure only one worker runs it
+
+
+def purge(app, now=None):
+    """Deletes Done / Failed jobs older than EXPORT_RETENTION_DAYS, and their files. Returns how many."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=app.config.get('EXPORT_RETENTION_DAYS', 7))
+    old = ExportJob.query.with_entities(ExportJob.id, ExportJob.file_path)\
+        .filter(ExportJob.status.in_(('Done', 'Failed')), ExportJob.created_at < cutoff).all()
+    if not old:
+        return 0
+    db.session.execute(delete(ExportJob).where(ExportJob.id.in_([job_id for job_id, _ in old])))
+    db.session.commit()
+    for _, path in old:
+        if path:
+            _remove(path)
+    return len(old)
+
+
+def run_job(app, job_id):
+    attempt = _claim(job_id)
+    if attempt is None:
+        return
+    job = db.session.get(ExportJob, job_id)
+
+    folder = export_dir(app, job.user_id)
+    os.makedirs(folder, exist_ok=True)
+    # Per attempt, so a worker that lost its lease never writes over the file of the one that took over
+    path = os.path.join(folder, f"{job.id}_{attempt}_{job.filename}")
+    tmp_path = path + '.part'
+
+    try:
+        header, row_fn = exports.CUSTOM_EXPORTS[job.data_type]
+        start = datetime.combine(job.start_date, datetime.min.time())
+        end_before = datetime.combine(job.end_date + timedelta(days=1), datetime.min.time())
+
+        counter = {'rows': 0}
+        renewed = time.monotonic()
+
+        def counted(rows):
+            nonlocal renewed
+            for row in rows:
+                counter['rows'] += 1
+                if counter['rows'] % 1000 == 0 and time.monotonic() - renewed > HEARTBEAT_SECONDS:
+                    _renew_lease(job_id, attempt)
+                    renewed = time.monotonic()
+                yield row
+
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+            for chunk in exports.iter_csv(header, counted(row_fn(job.user_id, start, end_before))):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        db.session.rollback()
+        _remove(tmp_path)
+        _finish(job_id, attempt, status='Failed', error=str(e))
+        return
+
+    if not _finish(job_id, attempt, status='Done', file_path=path,
+                   row_count=counter['rows'], size_bytes=os.path.getsize(path)):
+        _remove(path) # taken over by another worker; its file is the one kept
+
+
+def run_pending(app, limit=None):
+    """Runs Pending jobs, and takes over stale ones, in this process (CLI worker). Returns how many were processed."""
+    fail_abandoned()
+    purge(app)
+    query = ExportJob.query.filter(or_(ExportJob.status == 'Pending', _stale(datetime.utcnow())))\
+        .order_by(ExportJob.created_at)
+    if limit:
+        query = query.limit(limit)
+    job_ids = [job.id for job in query]
+    for job_id in job_ids:
+        run_job(app, job_id)
+    return len(job_ids)
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'data_type': job.data_type,
+        'rows': job.row_count,
+        'size_bytes': job.size_bytes,
+        'error': job.error,
+        'filename': job.filename,
+    }
@@ -0,0 +1,111 @@
+"""
+Streaming CSV exports.
+
+Rows are read with yield_per (a server-side cursor on Postgres) as plain
+column tuples joined to the customer, so memory stays flat no matter how
+many years of data a shop exports and no row triggers a lazy load.
+"""
+import csv
+import io
+
+from sqlalchemy import select
+
+from models import db, Customer, Order, Measurement, Category
+from date_ranges import in_range
+
+BATCH_SIZE = 1000
+
+
+def _stream(stmt):
+    return db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+
+
+def _items_names(items):
+    return ", ".join([item.get('name', '') for item in items]) if items else ""
+
+
+def _items_with_qty(items):
+    return ", ".join([f"{i.get('name', '')} (x{i.get('qty', 1)})" for i in (items or [])])
+
+
+def _order_select(user_id, start=None, end=None, newest_first=False):
+    stmt = select(
+        Order.id, Order.created_at, Customer.name, Customer.mobile, Order.items,
+        Order.total_amt, Order.advance, Order.balance, Order.work_status,
+        Order.payment_status, Order.payment_mode
+    ).join(Customer, Order.customer_id == Customer.id).where(Order.user_id == user_id)
+    if start is not None:
+        stmt = stmt.where(in_range(Order.created_at, start, end))
+    return stmt.order_by(Order.created_at.desc() if newest_first else Order.created_at.asc(), Order.id)
+
+
+def all_orders_rows(user_id):
+    """Rows for /export_csv (every order, newest first)."""
+    for (oid, created, name, mobile, items, total, advance, balance,
+         work_status, payment_status, mode) in _stream(_order_select(user_id, newest_first=True)):
+        yield [oid, created.strftime('%Y-%m-%d'), name, mobile, _items_names(items),
+               total, advance, balance, work_status, payment_status, mode]
+
+
+def orders_rows(user_id, start, end):
+    for (oid, created, name, mobile, items, total, advance, balance,
+         work_status, _, _) in _stream(_order_select(user_id, start, end)):
+        yield [oid, name, mobile, _items_with_qty(items), total, advance, balance,
+               work_status, created.strftime('%Y-%m-%d')]
+
+
+def bills_rows(user_id, start, end):
+    for (oid, created, name, mobile, _, total, advance, balance,
+         _, _, mode) in _stream(_order_select(user_id, start, end)):
+        yield [oid, created.strftime('%d-%m-%Y'), name, mobile, total, advance, balance, mode]
+
+
+def customers_rows(user_id, start, end):
+    stmt = select(
+        Customer.id, Customer.name, Customer.mobile, Customer.city,
+        Customer.order_count, Customer.total_pending, Customer.created_date
+    ).where(Customer.user_id == user_id, in_range(Customer.created_date, start, end))\
+        .order_by(Customer.created_date, Customer.id)
+
+    for cid, name, mobile, city, order_count, pending, created in _stream(stmt):
+        yield [cid, name, mobile, city, order_count, pending, created.strftime('%Y-%m-%d')]
+
+
+def measurements_rows(user_id, start, end):
+    stmt = select(
+        Measurement.id, Customer.name, Customer.mobile, Category.name,
+        Measurement.date, Measurement.measurements_json
+    ).join(Customer, Measurement.customer_id == Customer.id)\
+        .outerjoin(Category, Measurement.category_id == Category.id)\
+        .where(Measurement.user_id == user_id, in_range(Measurement.date, start, end))\
+        .order_by(Measurement.date, Measurement.id)
+
+    for mid, name, mobile, category, taken, data in _stream(stmt):
+        yield [mid, name, mobile, category, taken.strftime('%Y-%m-%d'), str(data)]
+
+
+ALL_ORDERS_HEADER = ['Order ID', 'Date', 'Customer Name', 'Mobile', 'Items', 'Total Amount', 'Advance', 'Balance', 'Status', 'Payment Status', 'Payment Mode']
+
+# data_type -> (header, rows(user_id, start, end)) for /settings/export_data
+CUSTOM_EXPORTS = {
+    'orders': (['Order ID', 'Customer Name', 'Mobile', 'Items', 'Total Amount', 'Advance', 'Balance', 'Status', 'Date'], orders_rows),
+    'customers': (['ID', 'Name', 'Mobile', 'City', 'Total Orders', 'Pending Balance', 'Joined Date'], customers_rows),
+    'measurements': (['ID', 'Customer', 'Mobile', 'Category', 'Date', 'Details'], measurements_rows),
+    'bills': (['Bill No', 'Date', 'Customer', 'Mobile', 'Total Amount', 'Received', 'Balance', 'Payment Mode'], bills_rows),
+}
+
+
+def iter_csv(header, rows, rows_per_chunk=500):
+    """Encodes header + rows as CSV text, yielding one chunk per `rows_per_chunk` rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % rows_per_chunk == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import re
+from types import MappingProxyType
+
+DEFAULT_LANG = 'en'
+
+# Matches t('Some key') / t("Some key") in templates
+TEMPLATE_KEY_RE = re.compile(r"""\bt\((?:'([^']+)'|"([^"]+)")\)""")
+
+
+def _lang_path(catalog_dir, lang):
+    return os.path.join(catalog_dir, f'{lang}.json')
+
+
+def read_catalog(catalog_dir):
+    """Reads every <lang>.json file in catalog_dir into {lang: {key: text}}."""
+    catalog = {}
+    if not os.path.isdir(catalog_dir):
+        return catalog
+    for filename in sorted(os.listdir(catalog_dir)):
+        lang, ext = os.path.splitext(filename)
+        if ext != '.json':
+            continue
+        with open(os.path.join(catalog_dir, filename), encoding='utf-8') as f:
+            catalog[lang] = json.load(f)
+    return catalog
+
+
+def write_language(catalog_dir, lang, entries):
+    os.makedirs(catalog_dir, exist_ok=True)
+    tmp_path = _lang_path(catalog_dir, lang) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=4)
+        f.write('\n')
+    os.replace(tmp_path, _lang_path(catalog_dir, lang))
+
+
+def compile_catalog(catalog):
+    """
+    Pre-merges each language over English so a lookup is a single dict hit.
+    Returns an immutable {lang: {key: text}} map.
+    """
+    base = dict(catalog.get(DEFAULT_LANG, {}))
+    compiled = {DEFAULT_LANG: MappingProxyType(base)}
+    for lang, entries in catalog.items():
+        if lang == DEFAULT_LANG:
+            continue
+        merged = dict(base)
+        merged.update(entries)
+        compiled[lang] = MappingProxyType(merged)
+    return MappingProxyType(compiled)
+
+
+class TranslationCatalog:
+    """Read-only translations loaded once at startup. Never touches the network."""
+
+    def __init__(self, compiled):
+        self._compiled = compiled
+        self._translators = {lang: self._make_translator(table) for lang, table in compiled.items()}
+        self._versions = {lang: self._table_version(table) for lang, table in compiled.items()}
+
+    @classmethod
+    def load(cls, catalog_dir):
+        return cls(compile_catalog(read_catalog(catalog_dir)))
+
+    @staticmethod
+    def _make_translator(table):
+        def t(key):
+            return table.get(key, key)
+        return t
+
+    @staticmethod
+    def _table_version(table):
+        payload = json.dumps(dict(table), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+    def version(self, lang):
+        """Hash of the texts translator(lang) returns; changes when the catalog is updated and reloaded."""
+        return self._versions.get(lang) or self._versions.get(DEFAULT_LANG, '')
+
+    def translator(self, lang):
+        """Returns t(key) for `lang`; unknown languages and keys fall back to English / the key."""
+        t = self._translators.get(lang) or self._translators.get(DEFAULT_LANG)
+        return t or (lambda key: key)
+
+
+def template_keys(template_dir):
+    """Collects every literal key passed to t() in the templates."""
+    keys = []
+    seen = set()
+    for root, _, files in os.walk(template_dir):
+        for filename in sorted(files):
+            if not filename.endswith('.html'):
+                continue
+            with open(os.path.join(root, filename), encoding='utf-8') as f:
+                for match in TEMPLATE_KEY_RE.finditer(f.read()):
+                    key = match.group(1) or match.group(2)
+                    if key not in seen:
+                        seen.add(key)
+                        keys.append(key)
+    return keys
+
+
+def fill_missing(catalog_dir, template_dir, langs=None, translate=None):
+    """
+    Offline batch job: finds keys used in templates or the English catalog that
+    a language lacks and stores a translation for each. `translate(text, lang)`
+    defaults to googletrans; failures are skipped so the job can be re-run.
+    Returns {lang: number_of_keys_added}.
+    """
+    catalog = read_catalog(catalog_dir)
+    english = catalog.setdefault(DEFAULT_LANG, {})
+
+    added_en = 0
+    for key in template_keys(template_dir):
+        if key not in english:
+            english[key] = key
+            added_en += 1
+    if added_en:
+        write_language(catalog_dir, DEFAULT_LANG, english)
+
+    if translate is None:
+        from googletrans import Translator
+        translator = Translator()
+
+        def translate(text, lang):
+            return translator.translate(text, dest=lang).text
+
+    added = {DEFAULT_LANG: added_en}
+    for lang in (langs or [l for l in catalog if l != DEFAULT_LANG]):
+        entries = catalog.setdefault(lang, {})
+        count = 0
+        for key, en_val in english.items():
+            if key in entries:
+                continue
+            try:
+                entries[key] = translate(en_val, lang)
+                count += 1
+            except Exception as e:
+                print(f"Translation Error for {key} ({lang}): {e}")
+        if count:
+            write_language(catalog_dir, lang, entries)
+        added[lang] = count
+    return added
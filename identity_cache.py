@@ -0,0 +1,80 @@
+import threading
+import time
+
+from flask import current_app, g
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User, ShopProfile
+
+# Cross-request cache: (kind, key) -> (expires_at, detached copy).
+# Process-local, so keep IDENTITY_CACHE_TTL short when running several workers.
+_shared = {}
+_lock = threading.Lock()
+_MISSING = object()
+
+
+def _request_store():
+    if '_identity_cache' not in g:
+        g._identity_cache = {}
+    return g._identity_cache
+
+
+def _ttl():
+    return current_app.config.get('IDENTITY_CACHE_TTL', 0)
+
+
+def _detached_copy(obj):
+    """Copies loaded column values into a detached instance that merge(load=False) can adopt."""
+    mapper = inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _get(kind, key, loader):
+    store = _request_store()
+    obj = store.get((kind, key), _MISSING)
+    if obj is not _MISSING:
+        return obj
+
+    obj = None
+    ttl = _ttl()
+    if ttl:
+        with _lock:
+            entry = _shared.get((kind, key))
+        if entry and entry[0] > time.monotonic():
+            # Attach the cached row to this session without a SELECT
+            obj = db.session.merge(entry[1], load=False)
+
+    if obj is None:
+        obj = loader()
+        if ttl and obj is not None:
+            with _lock:
+                _shared[(kind, key)] = (time.monotonic() + ttl, _detached_copy(obj))
+
+    store[(kind, key)] = obj
+    return obj
+
+
+def _invalidate(kind, key):
+    with _lock:
+        _shared.pop((kind, key), None)
+    _request_store().pop((kind, key), None)
+
+
+def get_user(user_id):
+    return _get('user', user_id, lambda: db.session.get(User, user_id))
+
+
+def get_shop_profile(user_id):
+    """Returns the user's ShopProfile (or None), loaded at most once per request."""
+    return _get('shop', user_id, lambda: ShopProfile.query.filter_by(user_id=user_id).first())
+
+
+def invalidate_user(user_id):
+    _invalidate('user', user_id)
+
+
+def invalidate_shop_profile(user_id):
+    _invalidate('shop', user_id)
@@ -0,0 +1,87 @@
+"""
+EXPLAIN based check that the hot route queries are served by the indexes
+added in migrations/versions/ (hot path and reminders queue indexes).
+
+Run with `flask --app app check-indexes`.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, select, func
+
+from models import db, Customer, Order, Measurement, ShopProfile, DailyRollup, Reminder
+
+
+def _cases(user_id):
+    """(description, acceptable index names, statement) mirroring the query shapes in routes.py."""
+    today = date.today()
+    month_start = datetime(today.year, today.month, 1)
+    month_end = month_start + timedelta(days=31)
+
+    return [
+        ('orders / bills list (month, keyset)', ['ix_order_user_created'],
+         select(Order.id).where(Order.user_id == user_id, Order.created_at >= month_start, Order.created_at < month_end)
+         .order_by(Order.created_at.desc(), Order.id.desc()).limit(51)),
+        ('reminders / dashboard: queued rows for the next week', ['ix_reminder_user_status_type_due'],
+         select(Reminder.id).where(Reminder.user_id == user_id, Reminder.status == 'Pending',
+                                   Reminder.type.in_(['delivery', 'trial', 'birthday']),
+                                   Reminder.due_date <= today + timedelta(days=7))),
+        ('reminders: resync one order', ['ix_reminder_order'],
+         select(Reminder.id).where(Reminder.order_id.in_([1, 2]), Reminder.status == 'Pending')),
+        ('reminder build: due and overdue deliveries', ['ix_order_user_delivery_status'],
+         select(Order.id).where(Order.user_id == user_id, Order.delivery_date <= today, Order.work_status != 'Delivered')
+         .order_by(Order.delivery_date.asc())),
+        ('reminder build: pending payments', ['ix_order_user_pending'],
+         select(Order.id).where(Order.user_id == user_id, Order.balance > 0).order_by(Order.balance.desc()).limit(10)),
+        ('customers list: order counts per customer', ['ix_order_customer_user'],
+         select(Order.customer_id, func.count(Order.id)).where(Order.customer_id.in_([1, 2, 3]), Order.user_id == user_id)
+         .group_by(Order.customer_id)),
+        ('customers list (month, keyset)', ['ix_customer_user_last_visit'],
+         select(Customer.id).where(Customer.user_id == user_id, Customer.last_visit >= month_start, Customer.last_visit < month_end)
+         .order_by(Customer.last_visit.desc(), Customer.id.desc()).limit(51)),
+        ('measurement save: duplicate check', ['ix_measurement_customer_category'],
+         select(Measurement.id).where(Measurement.customer_id == 1, Measurement.category_id == 1,
+                                      Measurement.is_active == True, Measurement.user_id == user_id)
+         .order_by(Measurement.date.desc()).limit(1)),
+        ('measurements list (month, keyset)', ['ix_measurement_user_date'],
+         select(Measurement.id).where(Measurement.user_id == user_id, Measurement.date >= month_start, Measurement.date < month_end)
+         .order_by(Measurement.date.desc(), Measurement.id.desc()).limit(51)),
+        ('shop profile lookup', ['ix_shop_profile_user_id'],
+         select(ShopProfile.id).where(ShopProfile.user_id == user_id).limit(1)),
+        ('dashboard: yearly rollup range', ['uq_daily_rollup_user_day', 'sqlite_autoindex_daily_rollup'],
+         select(func.sum(DailyRollup.revenue)).where(DailyRollup.user_id == user_id, DailyRollup.day >= date(today.year, 1, 1))),
+    ]
+
+
+def _explain_prefix(dialect_name):
+    return 'EXPLAIN QUERY PLAN' if dialect_name == 'sqlite' else 'EXPLAIN'
+
+
+def explain(conn, stmt):
+    """Returns the database's plan for `stmt` as one string."""
+    prefix = _explain_prefix(conn.dialect.name)
+
+    def add_prefix(conn, cursor, statement, parameters, context, executemany):
+        return f'{prefix} {statement}', parameters
+
+    # Prefix at the cursor level so bind parameters are processed exactly as in the app
+    event.listen(conn, 'before_cursor_execute', add_prefix, retval=True)
+    try:
+        rows = conn.execute(stmt).fetchall()
+    finally:
+        event.remove(conn, 'before_cursor_execute', add_prefix)
+    return '\n'.join(' '.join(str(col) for col in row) for row in rows)
+
+
+def check_indexes(user_id=1):
+    """Returns [(description, passed, plan)] for every hot query shape."""
+    results = []
+    with db.engine.connect() as conn:
+        with conn.begin():
+            if conn.dialect.name == 'postgresql':
+                # Small/dev tables make a seq scan cheapest; we only want to know the index is usable
+                conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for description, index_names, stmt in _cases(user_id):
+                plan = explain(conn, stmt)
+                passed = any(name in plan for name in index_names)
+                results.append((description, passed, plan))
+    return results
@@ -0,0 +1,280 @@
+"""
+Server-side invoice rendering with a content-addressed disk cache.
+
+Each rendered bill is stored under saved_bills/<user>/<year>/<month>/ with a
+key derived from everything invoice.html prints (order, customer, shop
+profile, language) plus the template source and the loaded translations
+for that language, so `flask translate-missing` and a restart re-render
+the bills it affects. An unchanged bill therefore
+maps to the same file and the same ETag, and is served from disk without
+rendering. bills_update() / orders_update_details() call discard() so the
+superseded copies do not pile up.
+
+PDFs are produced with WeasyPrint when it is installed; otherwise the
+rendered HTML is cached and served instead (the old behaviour).
+
+iter_bills() does the same for a whole date range: one ShopProfile load, one
+compiled template, and the HTML -> PDF step spread over a process pool. The
+pool is created once per process and shared by all bulk requests, so
+concurrent downloads queue for INVOICE_WORKERS processes instead of each
+starting its own. Its processes are spawned, not forked, because the web
+process already runs the outbox / export / reminder threads.
+"""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, render_template
+from sqlalchemy.orm import joinedload
+
+from models import Order, ShopProfile
+from date_ranges import in_range
+
+TEMPLATE_NAME = 'invoice.html'
+
+try:
+    from weasyprint import HTML
+except (ImportError, OSError): # OSError: installed but pango/cairo libraries missing
+    HTML = None
+
+
+def pdf_available():
+    return HTML is not None
+
+
+def template_version(app=None):
+    """Hash of the invoice template source, computed once per process."""
+    app = app or current_app
+    version = app.extensions.get('invoice_template_version')
+    if version is None:
+        source, _, _ = app.jinja_env.loader.get_source(app.jinja_env, TEMPLATE_NAME)
+        version = hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+        app.extensions['invoice_template_version'] = version
+    return version
+
+
+def invoice_fingerprint(order, shop, lang):
+    """The values invoice.html renders, in a stable form."""
+    customer = order.customer
+    return {
+        'order': [order.id, order.created_at.isoformat(), order.items, order.total_amt, order.advance,
+                  order.balance, order.bill_created_by,
+                  order.work_status in ('Ready to Deliver', 'Delivered')],
+        'customer': [customer.name, customer.mobile, customer.city],
+        'shop': [shop.shop_name, shop.address, shop.mobile, shop.gst_no, shop.logo, shop.upi_id, shop.terms],
+        'lang': lang,
+    }
+
+
+def invoice_key(order, shop, lang, app=None):
+    catalog_version = (app or current_app).extensions['i18n'].version(lang)
+    payload = json.dumps([template_version(app), catalog_version, invoice_fingerprint(order, shop, lang)],
+                         sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def bill_folder(app, order):
+    return os.path.join(app.root_path, 'saved_bills', str(order.user_id),
+                        order.created_at.strftime('%Y'), order.created_at.strftime('%B'))
+
+
+def bill_basename(order):
+    """Human readable name used for the download (Customer_Date_ID)."""
+    date_str = order.created_at.strftime('%d-%m-%Y')
+    sanitized_name = order.customer.name.replace(' ', '_').replace('/', '-')
+    return f"Bill_{sanitized_name}_{date_str}_{order.id}"
+
+
+def extension():
+    return 'pdf' if pdf_available() else 'html'
+
+
+def cached_path(app, order, key):
+    return os.path.join(bill_folder(app, order), f"{bill_basename(order)}.{key[:16]}.{extension()}")
+
+
+def _static_fetcher(static_folder):
+    """Resolves /static/... from disk and refuses remote URLs, so rendering never leaves the box."""
+    from weasyprint import default_url_fetcher
+    static_prefix = 'file:///static/'
+
+    def fetch(url):
+        if url.startswith(static_prefix):
+            path = os.path.join(static_folder, url[len(static_prefix):])
+            return default_url_fetcher('file://' + os.path.abspath(path))
+        if url.startswith('file://') or url.startswith('data:'):
+            return default_url_fetcher(url)
+        raise ValueError(f'Remote resource not fetched: {url}')
+    return fetch
+
+
+def _html_to_pdf(html_content, static_folder):
+    return HTML(string=html_content, base_url='file:///', url_fetcher=_static_fetcher(static_folder)).write_pdf()
+
+
+def render_to_bytes(app, html_content):
+    if not pdf_available():
+        return html_content.encode('utf-8')
+    return _html_to_pdf(html_content, app.static_folder)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def get_or_render(app, order, shop, lang):
+    """Returns (path, key), rendering only when no copy exists for the current key."""
+    key = invoice_key(order, shop, lang, app)
+    path = cached_path(app, order, key)
+    if not os.path.exists(path):
+        html_content = render_template(TEMPLATE_NAME, order=order, shop=shop, download_mode=True)
+        _write_atomic(path, render_to_bytes(app, html_content))
+    return path, key
+
+
+def discard(app, order):
+    """Removes every cached rendering of `order` (called after bill edits)."""
+    pattern = os.path.join(bill_folder(app, order), f"Bill_*_{order.id}.*.*")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+BATCH_SIZE = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _new_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _shared_pool(app):
+    """The process-wide PDF pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _new_pool(app.config.get('INVOICE_WORKERS') or 1)
+        return _pool
+
+
+def _drop_shared_pool(pool):
+    """Forgets a broken shared pool (a render process died) so the next request starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def iter_bills(app, user_id, start, end_before, workers=None):
+    """
+    Yields (download name, cached path) for every order of `user_id` created in
+    [start, end_before). Must run inside a request context (the template reads
+    t(), current_lang and url_for), e.g. the bulk route or app.test_request_context().
+    Bills already in the cache are not rendered again. `workers` gives this call
+    a pool of its own (the CLI); otherwise the shared pool is used.
+    """
+    from identity_cache import get_shop_profile
+
+    shop = get_shop_profile(user_id) or ShopProfile(user_id=user_id)
+    template = app.jinja_env.get_template(TEMPLATE_NAME)
+    context = {}
+    app.update_template_context(context)
+    lang = context.get('current_lang', 'en')
+
+    orders = Order.query.options(joinedload(Order.customer))\
+        .filter(Order.user_id == user_id, in_range(Order.created_at, start, end_before))\
+        .order_by(Order.created_at, Order.id).yield_per(BATCH_SIZE)
+
+    own_pool = None
+    try:
+        batch = []
+        for order in orders:
+            batch.append(order)
+            if len(batch) == BATCH_SIZE:
+                own_pool = yield from _render_batch(app, batch, shop, template, context, lang, own_pool, workers)
+                batch = []
+        if batch:
+            own_pool = yield from _render_batch(app, batch, shop, template, context, lang, own_pool, workers)
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+
+def _render_batch(app, batch, shop, template, context, lang, own_pool, workers):
+    entries, missing = [], []
+    for order in batch:
+        path = cached_path(app, order, invoice_key(order, shop, lang, app))
+        entries.append((f"{bill_basename(order)}.{extension()}", path))
+        if not os.path.exists(path):
+            missing.append((path, template.render(context, order=order, shop=shop, download_mode=True)))
+
+    if missing and pdf_available():
+        if workers and own_pool is None:
+            own_pool = _new_pool(workers)
+        pool = own_pool or _shared_pool(app)
+        try:
+            rendered = list(pool.map(_html_to_pdf, [html for _, html in missing],
+                                     [app.static_folder] * len(missing)))
+        except BrokenProcessPool:
+            if pool is not own_pool:
+                _drop_shared_pool(pool)
+            raise
+        for (path, _), data in zip(missing, rendered):
+            _write_atomic(path, data)
+    else:
+        for path, html_content in missing:
+            _write_atomic(path, html_content.encode('utf-8'))
+
+    yield from entries
+    return own_pool
+
+
+class _ZipSink:
+    """Write-only file object: ZipFile appends to it, iter_zip() drains it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip(entries):
+    """Streams a ZIP of (name, path) entries without building it in memory or on disk."""
+    sink = _ZipSink()
+    # PDFs are already compressed; HTML bills shrink a lot
+    compression = zipfile.ZIP_STORED if pdf_available() else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, 'w', compression=compression) as zf:
+        for name, path in entries:
+            zf.write(path, arcname=name)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,191 @@
+"""
+Saving measurements together with their orders.
+
+One garment comes from the measurement form, several from the JSON batch
+endpoint (/api/customer/<id>/measurements). Both go through save_garments():
+input is validated first, then the user's categories are fetched once, the
+duplicate check is one query for the whole batch, and everything is
+committed in a single transaction.
+"""
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from flask import g
+
+from models import db, Category, Measurement, Order
+from date_ranges import parse_day
+import rollups
+
+MAX_BATCH = 20
+
+
+class MeasurementInputError(ValueError):
+    """Invalid garment data; str(e) is safe to show to the user."""
+
+
+@dataclass(frozen=True)
+class Garment:
+    category_id: int
+    measurements: dict
+    remarks: Optional[str]
+    start_date: Optional[object]
+    delivery_date: Optional[object]
+    work_status: str
+    notes: Optional[str]
+    total: float
+    advance: float
+    payment_mode: Optional[str]
+    created_by: str
+
+    @property
+    def has_data(self):
+        return any(str(v).strip() for v in self.measurements.values() if v is not None)
+
+    @property
+    def balance(self):
+        return round(self.total - self.advance, 2)
+
+    @property
+    def payment_status(self):
+        if self.total > 0:
+            if self.balance <= 0:
+                return 'Paid'
+            if self.advance > 0:
+                return 'Partial'
+        return 'Pending'
+
+
+def user_categories(user_id):
+    """{id: Category} for the user's categories, loaded once per request."""
+    cache = g.setdefault('_user_categories', {})
+    if user_id not in cache:
+        cache[user_id] = {c.id: c for c in Category.query.filter_by(user_id=user_id)}
+    return cache[user_id]
+
+
+def _amount(data, key, label):
+    value = data.get(key)
+    if value in (None, ''):
+        return 0.0
+    try:
+        amount = round(float(value), 2)
+    except (TypeError, ValueError):
+        raise MeasurementInputError(f'{label} must be a number.')
+    if amount < 0:
+        raise MeasurementInputError(f'{label} cannot be negative.')
+    return amount
+
+
+def _day(data, key, label):
+    value = data.get(key)
+    if not value:
+        return None
+    day = parse_day(value)
+    if day is None:
+        raise MeasurementInputError(f'{label} must be a date (YYYY-MM-DD).')
+    return day
+
+
+def parse_garment(data, user_id):
+    """Validates one garment (form fields or a JSON object with the same keys)."""
+    try:
+        category_id = int(data.get('category_id'))
+    except (TypeError, ValueError):
+        raise MeasurementInputError('Please choose a category.')
+    if category_id not in user_categories(user_id):
+        raise MeasurementInputError('Unknown category.')
+
+    measurements = data.get('measurements_json')
+    if isinstance(measurements, str):
+        try:
+            measurements = json.loads(measurements)
+        except ValueError:
+            raise MeasurementInputError('Measurements could not be read.')
+    if not isinstance(measurements, dict):
+        raise MeasurementInputError('Measurements could not be read.')
+
+    return Garment(
+        category_id=category_id,
+        measurements=measurements,
+        remarks=data.get('remarks') or None,
+        start_date=_day(data, 'start_date', 'Start date'),
+        delivery_date=_day(data, 'delivery_date', 'Delivery date'),
+        work_status=data.get('order_status') or 'Processing',
+        notes=data.get('order_notes') or None,
+        total=_amount(data, 'total_amt', 'Total amount'),
+        advance=_amount(data, 'advance', 'Advance'),
+        payment_mode=data.get('payment_mode') or None,
+        created_by=data.get('created_by') or 'System',
+    )
+
+
+def _latest_measurements(customer_id, user_id, category_ids):
+    """{category_id: newest active Measurement} for the duplicate check, in one query."""
+    latest = {}
+    rows = Measurement.query.filter(
+        Measurement.customer_id == customer_id,
+        Measurement.user_id == user_id,
+        Measurement.is_active == True,
+        Measurement.category_id.in_(category_ids)
+    ).order_by(Measurement.date.desc())
+    for m in rows:
+        latest.setdefault(m.category_id, m)
+    return latest
+
+
+def _is_duplicate(last, garment):
+    return last is not None and last.measurements_json == garment.measurements and \
+        not (garment.remarks and last.remarks != garment.remarks)
+
+
+def save_garments(customer, user_id, garments):
+    """
+    Saves each garment's measurement (skipping empty ones and exact repeats of
+    the last measurement for that category) and always creates its order.
+    Returns [(Measurement or None, Order)]. Commits once; rolls back on error.
+    """
+    categories = user_categories(user_id)
+    latest = _latest_measurements(customer.id, user_id, {gm.category_id for gm in garments})
+
+    saved = []
+    try:
+        for garment in garments:
+            measurement = None
+            if garment.has_data and not _is_duplicate(latest.get(garment.category_id), garment):
+                measurement = Measurement(
+                    customer_id=customer.id,
+                    category_id=garment.category_id,
+                    measurements_json=garment.measurements,
+                    remarks=garment.remarks,
+                    user_id=user_id
+                )
+                db.session.add(measurement)
+                latest[garment.category_id] = measurement
+
+            order = Order(
+                customer_id=customer.id,
+                user_id=user_id,
+                items=[{"name": categories[garment.category_id].name, "qty": 1}],
+                work_status=garment.work_status,
+                payment_status=garment.payment_status,
+                start_date=garment.start_date,
+                delivery_date=garment.delivery_date,
+                notes=garment.notes,
+                total_amt=garment.total,
+                advance=garment.advance,
+                balance=garment.balance,
+                payment_mode=garment.payment_mode,
+                bill_created_by=garment.created_by
+            )
+            db.session.add(order)
+            saved.append((measurement, order))
+
+        db.session.flush()
+        for _, order in saved:
+            rollups.record_order(order)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return saved
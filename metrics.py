@@ -0,0 +1,236 @@
+"""
+Per-request instrumentation, exposed in Prometheus text format on /metrics.
+
+For every request (labelled by endpoint) we record wall time, the number of
+SQL statements, total and slowest SQL time, template render time and the
+response size, as histograms. Connection pool state is read at scrape time
+and pool connects / checkouts are counted. Statements slower than
+SLOW_QUERY_MS are logged with their normalized SQL and the view that ran
+them.
+
+Metrics live in the worker process: with several gunicorn workers, each
+one's /metrics shows its own share (scrape them individually or run one
+worker per port). /metrics answers requests carrying
+`Authorization: Bearer <METRICS_TOKEN>`, and direct local requests only when
+METRICS_ALLOW_LOCAL is set: a reverse proxy on the same host (nginx's plain
+proxy_pass adds no X-Forwarded-For) would otherwise make it public.
+"""
+import bisect
+import hmac
+import re
+import threading
+import time
+
+from flask import Response, abort, current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+UNTIMED_ENDPOINTS = ('metrics', 'static', 'static_dist')
+
+# Set from SLOW_QUERY_MS / app.logger by init_app()
+_slow_query_seconds = 0.2
+_slow_log = None
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label, rendered in Prometheus text format."""
+
+    def __init__(self, name, documentation, buckets, label='endpoint'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series = {} # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_value, series in items:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self):
+        with self._lock:
+            self.value += 1
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+REQUEST_SECONDS = Histogram('talvex_request_duration_seconds', 'Wall time per request.', DURATION_BUCKETS)
+REQUEST_QUERIES = Histogram('talvex_request_queries', 'SQL statements executed per request.', COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('talvex_request_sql_seconds', 'Total SQL time per request.', DURATION_BUCKETS)
+REQUEST_SQL_MAX_SECONDS = Histogram('talvex_request_sql_max_seconds', 'Slowest SQL statement per request.', DURATION_BUCKETS)
+RENDER_SECONDS = Histogram('talvex_template_render_seconds', 'Template render time per request.', DURATION_BUCKETS)
+RESPONSE_BYTES = Histogram('talvex_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_SQL_SECONDS, REQUEST_SQL_MAX_SECONDS, RENDER_SECONDS, RESPONSE_BYTES)
+
+POOL_CONNECTS = Counter('talvex_db_pool_connects_total', 'New DBAPI connections opened by the pool.')
+POOL_CHECKOUTS = Counter('talvex_db_pool_checkouts_total', 'Connections checked out of the pool.')
+SLOW_QUERIES = Counter('talvex_db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_IN_LIST = re.compile(r'IN \((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)', re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(statement):
+    """One line, literals and IN lists collapsed, so equal query shapes log the same."""
+    statement = ' '.join(statement.split())
+    statement = _IN_LIST.sub('IN (...)', statement)
+    return _LITERALS.sub('?', statement)[:1000]
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    if '_metrics' not in g:
+        g._metrics = {'queries': 0, 'sql': 0.0, 'sql_max': 0.0, 'render': 0.0, 'render_started': []}
+    return g._metrics
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    stats = _request_stats()
+    if stats is not None:
+        stats['queries'] += 1
+        stats['sql'] += elapsed
+        stats['sql_max'] = max(stats['sql_max'], elapsed)
+
+    if elapsed >= _slow_query_seconds:
+        SLOW_QUERIES.inc()
+        view = request.endpoint if has_request_context() else 'background'
+        _slow_log.warning("Slow query (%.0f ms) in %s: %s", elapsed * 1000, view, normalize_sql(statement))
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None:
+        stats['render_started'].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stats = _request_stats()
+    if stats is not None and stats['render_started']:
+        started = stats['render_started'].pop()
+        if not stats['render_started']: # nested render_template() calls are inside the outer one
+            stats['render'] += time.perf_counter() - started
+
+
+def _start_timer():
+    g._metrics_request_started = time.perf_counter()
+    _request_stats()
+
+
+def _record(response):
+    started = g.pop('_metrics_request_started', None)
+    endpoint = request.endpoint or 'unmatched'
+    if started is None or endpoint in UNTIMED_ENDPOINTS:
+        return response
+    stats = _request_stats()
+    REQUEST_SECONDS.observe(endpoint, time.perf_counter() - started)
+    REQUEST_QUERIES.observe(endpoint, stats['queries'])
+    REQUEST_SQL_SECONDS.observe(endpoint, stats['sql'])
+    REQUEST_SQL_MAX_SECONDS.observe(endpoint, stats['sql_max'])
+    if stats['render']:
+        RENDER_SECONDS.observe(endpoint, stats['render'])
+    # Streamed bodies (send_file, ZIPs, CSV) are only measured when they declare a length
+    size = response.content_length if response.is_streamed or response.direct_passthrough \
+        else response.calculate_content_length()
+    if size is not None:
+        RESPONSE_BYTES.observe(endpoint, size)
+    return response
+
+
+def _pool_lines(engine):
+    pool = engine.pool
+    lines = []
+    for name, method, documentation in (
+        ('talvex_db_pool_size', 'size', 'Configured pool size.'),
+        ('talvex_db_pool_checked_out', 'checkedout', 'Connections currently checked out.'),
+        ('talvex_db_pool_checked_in', 'checkedin', 'Idle connections in the pool.'),
+        ('talvex_db_pool_overflow', 'overflow', 'Connections open beyond the pool size.'),
+    ):
+        if hasattr(pool, method): # NullPool / StaticPool keep no such state
+            lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {getattr(pool, method)()}"]
+    return lines
+
+
+def render_metrics(engine):
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    for counter in (POOL_CONNECTS, POOL_CHECKOUTS, SLOW_QUERIES):
+        lines += counter.render()
+    lines += _pool_lines(engine)
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    # A proxied request also arrives from 127.0.0.1, so local scrapes skip the token only when opted in
+    local = current_app.config.get('METRICS_ALLOW_LOCAL') and request.remote_addr in LOCAL_ADDRESSES \
+        and 'X-Forwarded-For' not in request.headers
+    authorized = local or (
+        token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'))
+    if not authorized:
+        abort(404)
+    from models import db
+    return Response(render_metrics(db.engine), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, engine):
+    global _slow_query_seconds, _slow_log
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+    _slow_log = app.logger
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'connect', lambda dbapi_connection, record: POOL_CONNECTS.inc())
+    event.listen(engine, 'checkout', lambda dbapi_connection, record, proxy: POOL_CHECKOUTS.inc())
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    app.before_request(_start_timer)
+    app.after_request(_record)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
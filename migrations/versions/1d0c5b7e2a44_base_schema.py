@@ -0,0 +1,140 @@
+"""Base schema: the tables as they were before migrations were introduced
+
+Revision ID: 1d0c5b7e2a44
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d0c5b7e2a44'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have these tables
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('username', sa.String(100)),
+        sa.Column('email', sa.String(120)),
+        sa.Column('password_hash', sa.String(256)),
+        sa.Column('otp_code', sa.String(6)),
+        sa.Column('otp_expiry', sa.DateTime()),
+        sa.Column('is_verified', sa.Boolean()),
+        sa.Column('failed_attempts', sa.Integer()),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('is_admin', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime()),
+        if_not_exists=True,
+    )
+    op.create_index('ix_user_email', 'user', ['email'], unique=True, if_not_exists=True)
+
+    op.create_table(
+        'shop_profile',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('shop_name', sa.String(100)),
+        sa.Column('address', sa.Text()),
+        sa.Column('mobile', sa.String(20)),
+        sa.Column('gst_no', sa.String(20)),
+        sa.Column('terms', sa.Text()),
+        sa.Column('upi_id', sa.String(50)),
+        sa.Column('logo', sa.String(200)),
+        sa.Column('bill_creators', sa.JSON()),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'category',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('name', sa.String(50), nullable=False),
+        sa.Column('gender', sa.String(10), nullable=False),
+        sa.Column('is_custom', sa.Boolean()),
+        sa.Column('fields_json', sa.JSON()),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'customer',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('mobile', sa.String(20), nullable=False, unique=True),
+        sa.Column('alt_mobile', sa.String(20)),
+        sa.Column('email', sa.String(120)),
+        sa.Column('address', sa.Text()),
+        sa.Column('city', sa.String(100)),
+        sa.Column('area', sa.String(100)),
+        sa.Column('whatsapp', sa.Boolean()),
+        sa.Column('gender', sa.String(10)),
+        sa.Column('photo', sa.String(200)),
+        sa.Column('notes', sa.Text()),
+        sa.Column('style_pref', sa.String(200)),
+        sa.Column('birthday', sa.Date()),
+        sa.Column('created_date', sa.DateTime()),
+        sa.Column('last_visit', sa.DateTime()),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'measurement',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customer.id'), nullable=False),
+        sa.Column('category_id', sa.Integer(), sa.ForeignKey('category.id'), nullable=False),
+        sa.Column('date', sa.DateTime()),
+        sa.Column('measurements_json', sa.JSON(), nullable=False),
+        sa.Column('remarks', sa.Text()),
+        sa.Column('is_active', sa.Boolean()),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'order',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customer.id'), nullable=False),
+        sa.Column('items', sa.JSON(), nullable=False),
+        sa.Column('start_date', sa.Date()),
+        sa.Column('delivery_date', sa.Date()),
+        sa.Column('work_status', sa.String(20)),
+        sa.Column('payment_status', sa.String(20)),
+        sa.Column('total_amt', sa.Float()),
+        sa.Column('advance', sa.Float()),
+        sa.Column('balance', sa.Float()),
+        sa.Column('payment_mode', sa.String(50)),
+        sa.Column('bill_created_by', sa.String(100)),
+        sa.Column('trial_date', sa.Date()),
+        sa.Column('notes', sa.Text()),
+        sa.Column('created_at', sa.DateTime()),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'reminder',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=True),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customer.id'), nullable=True),
+        sa.Column('order_id', sa.Integer(), sa.ForeignKey('order.id'), nullable=True),
+        sa.Column('type', sa.String(50)),
+        sa.Column('due_date', sa.Date()),
+        sa.Column('due_time', sa.Time()),
+        sa.Column('message', sa.String(255)),
+        sa.Column('status', sa.String(20)),
+        sa.Column('created_at', sa.DateTime()),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    for table in ('reminder', 'order', 'measurement', 'customer', 'category', 'shop_profile'):
+        op.drop_table(table, if_exists=True)
+    op.drop_index('ix_user_email', table_name='user', if_exists=True)
+    op.drop_table('user', if_exists=True)
@@ -0,0 +1,46 @@
+"""Composite indexes for the per-user hot query shapes in routes.py
+
+Revision ID: 3f2a9c1d7b10
+Revises: 1d0c5b7e2a44
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b10'
+down_revision = '1d0c5b7e2a44'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns, partial WHERE clause)
+INDEXES = [
+    ('ix_order_user_created', 'order', ['user_id', 'created_at', 'id'], None),
+    ('ix_order_user_delivery_status', 'order', ['user_id', 'delivery_date', 'work_status'], None),
+    ('ix_order_customer_user', 'order', ['customer_id', 'user_id'], None),
+    ('ix_order_user_pending', 'order', ['user_id', 'balance'], 'balance > 0'),
+    ('ix_customer_user_last_visit', 'customer', ['user_id', 'last_visit', 'id'], None),
+    ('ix_customer_user_created', 'customer', ['user_id', 'created_date'], None),
+    ('ix_measurement_customer_category', 'measurement', ['customer_id', 'category_id', 'is_active', 'date'], None),
+    ('ix_measurement_user_date', 'measurement', ['user_id', 'date', 'id'], None),
+    ('ix_shop_profile_user_id', 'shop_profile', ['user_id'], None),
+    ('ix_category_user_gender', 'category', ['user_id', 'gender'], None),
+]
+
+
+def upgrade():
+    for name, table, columns, where in INDEXES:
+        kwargs = {}
+        if where:
+            kwargs['postgresql_where'] = sa.text(where)
+            kwargs['sqlite_where'] = sa.text(where)
+        # Tables may already have them if they were created by db.create_all()
+        op.create_index(name, table, columns, unique=False, if_not_exists=True, **kwargs)
+
+
+def downgrade():
+    for name, table, columns, where in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,101 @@
+"""Customer search (mobile_digits, FTS5 / pg_trgm) and cache version columns
+
+Revision ID: 5b8e1f0c3d27
+Revises: 8c41d2e6a9f3
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1f0c3d27'
+down_revision = '8c41d2e6a9f3'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS customer_fts
+       USING fts5(name, content='customer', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS customer_fts_ai AFTER INSERT ON customer BEGIN
+         INSERT INTO customer_fts(rowid, name) VALUES (new.id, new.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS customer_fts_ad AFTER DELETE ON customer BEGIN
+         INSERT INTO customer_fts(customer_fts, rowid, name) VALUES ('delete', old.id, old.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS customer_fts_au AFTER UPDATE OF name ON customer BEGIN
+         INSERT INTO customer_fts(customer_fts, rowid, name) VALUES ('delete', old.id, old.name);
+         INSERT INTO customer_fts(rowid, name) VALUES (new.id, new.name);
+       END""",
+    "INSERT INTO customer_fts(customer_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_customer_name_trgm ON customer USING gin (name gin_trgm_ops)",
+]
+
+
+def _normalize_mobile(value):
+    # Same rule as models.normalize_mobile at the time of this revision
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:] if len(digits) > 10 else digits
+
+
+def _columns(table):
+    return [c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)]
+
+
+def upgrade():
+    # Cache validators (data_versions.py)
+    if 'version' not in _columns('customer'):
+        op.add_column('customer', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    if 'data_version' not in _columns('user'):
+        op.add_column('user', sa.Column('data_version', sa.Integer(), nullable=False, server_default='1'))
+
+    # Digits-only mobile for indexed prefix search
+    if 'mobile_digits' not in _columns('customer'):
+        op.add_column('customer', sa.Column('mobile_digits', sa.String(20)))
+    op.create_index('ix_customer_mobile_digits', 'customer', ['mobile_digits'], if_not_exists=True)
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, mobile FROM customer WHERE mobile_digits IS NULL")).fetchall()
+    if rows:
+        conn.execute(
+            sa.text("UPDATE customer SET mobile_digits = :digits WHERE id = :id"),
+            [{'id': row[0], 'digits': _normalize_mobile(row[1])} for row in rows]
+        )
+
+    # Name search index; search.py falls back to ILIKE when it is missing
+    statements = {'sqlite': SQLITE_FTS, 'postgresql': POSTGRES_TRGM}.get(conn.dialect.name, [])
+    if conn.dialect.name == 'sqlite' and conn.execute(
+            sa.text("SELECT 1 FROM sqlite_master WHERE name = 'customer_fts'")).first():
+        statements = []
+    try:
+        with conn.begin_nested():
+            for stmt in statements:
+                conn.execute(sa.text(stmt))
+    except sa.exc.DBAPIError as e:
+        # e.g. no CREATE EXTENSION privilege or SQLite built without FTS5
+        print(f"Search index setup failed, search will use ILIKE: {e}")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'sqlite':
+        for trigger in ('customer_fts_ai', 'customer_fts_ad', 'customer_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS customer_fts")
+    elif conn.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_customer_name_trgm")
+
+    op.drop_index('ix_customer_mobile_digits', table_name='customer', if_exists=True)
+    with op.batch_alter_table('customer') as batch:
+        batch.drop_column('mobile_digits')
+        batch.drop_column('version')
+    with op.batch_alter_table('user') as batch:
+        batch.drop_column('data_version')
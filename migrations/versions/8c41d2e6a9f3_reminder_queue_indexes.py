@@ -0,0 +1,33 @@
+"""Indexes for the precomputed reminders queue (reminder_queue.py)
+
+Revision ID: 8c41d2e6a9f3
+Revises: 3f2a9c1d7b10
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e6a9f3'
+down_revision = '3f2a9c1d7b10'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_reminder_user_status_type_due', 'reminder', ['user_id', 'status', 'type', 'due_date']),
+    ('ix_reminder_order', 'reminder', ['order_id']),
+    ('ix_reminder_customer', 'reminder', ['customer_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,74 @@
+"""Daily rollups, background export jobs and the email outbox
+
+Revision ID: 9e4a7c2b6f15
+Revises: 5b8e1f0c3d27
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a7c2b6f15'
+down_revision = '5b8e1f0c3d27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'daily_rollup',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('advance', sa.Float(), nullable=False),
+        sa.Column('balance', sa.Float(), nullable=False),
+        sa.Column('new_customers', sa.Integer(), nullable=False),
+        sa.Column('orders_created', sa.Integer(), nullable=False),
+        sa.UniqueConstraint('user_id', 'day', name='uq_daily_rollup_user_day'),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'export_job',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('data_type', sa.String(20), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(20)),
+        sa.Column('file_path', sa.String(300)),
+        sa.Column('row_count', sa.Integer()),
+        sa.Column('size_bytes', sa.Integer()),
+        sa.Column('error', sa.Text()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('finished_at', sa.DateTime()),
+        if_not_exists=True,
+    )
+    op.create_index('ix_export_job_user_id', 'export_job', ['user_id'], if_not_exists=True)
+
+    op.create_table(
+        'outbox_email',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('recipient', sa.String(120), nullable=False),
+        sa.Column('subject', sa.String(200), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('sent_at', sa.DateTime()),
+        if_not_exists=True,
+    )
+    op.create_index('ix_outbox_email_status_next', 'outbox_email', ['status', 'next_attempt_at'], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_outbox_email_status_next', table_name='outbox_email', if_exists=True)
+    op.drop_table('outbox_email', if_exists=True)
+    op.drop_index('ix_export_job_user_id', table_name='export_job', if_exists=True)
+    op.drop_table('export_job', if_exists=True)
+    op.drop_table('daily_rollup', if_exists=True)
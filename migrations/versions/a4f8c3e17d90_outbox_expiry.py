@@ -0,0 +1,29 @@
+"""Expiry on outbox emails, and no plaintext bodies on finished rows
+
+Revision ID: a4f8c3e17d90
+Revises: e2b9d4a6c815
+Create Date: 2026-10-17 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f8c3e17d90'
+down_revision = 'e2b9d4a6c815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('outbox_email')]
+    if 'expires_at' not in columns:
+        op.add_column('outbox_email', sa.Column('expires_at', sa.DateTime()))
+    # OTP codes of mail already sent (or given up on) are not kept around
+    op.execute("UPDATE outbox_email SET body = '' WHERE status IN ('Sent', 'Failed')")
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_email') as batch:
+        batch.drop_column('expires_at')
@@ -0,0 +1,27 @@
+"""Day each shop's reminders queue was last rebuilt, for the first-view-of-the-day refresh
+
+Revision ID: b6d2e8f41a37
+Revises: a4f8c3e17d90
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2e8f41a37'
+down_revision = 'a4f8c3e17d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('user')]
+    if 'reminders_built_on' not in columns:
+        op.add_column('user', sa.Column('reminders_built_on', sa.Date()))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch:
+        batch.drop_column('reminders_built_on')
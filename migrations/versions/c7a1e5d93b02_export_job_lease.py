@@ -0,0 +1,30 @@
+"""Lease and attempt count on export jobs, so stale Running jobs are taken over
+
+Revision ID: c7a1e5d93b02
+Revises: 9e4a7c2b6f15
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a1e5d93b02'
+down_revision = '9e4a7c2b6f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('export_job')]
+    if 'attempts' not in columns:
+        op.add_column('export_job', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    if 'lease_until' not in columns:
+        op.add_column('export_job', sa.Column('lease_until', sa.DateTime()))
+
+
+def downgrade():
+    with op.batch_alter_table('export_job') as batch:
+        batch.drop_column('lease_until')
+        batch.drop_column('attempts')
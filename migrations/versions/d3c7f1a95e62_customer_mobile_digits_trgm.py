@@ -0,0 +1,31 @@
+"""pg_trgm index on customer.mobile_digits for substring mobile search
+
+Revision ID: d3c7f1a95e62
+Revises: b6d2e8f41a37
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3c7f1a95e62'
+down_revision = 'b6d2e8f41a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return # SQLite: the per-shop scan of mobile_digits is cheap enough
+    if not conn.execute(sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first():
+        print("pg_trgm is not installed: mobile search will scan mobile_digits.")
+        return
+    op.execute("CREATE INDEX IF NOT EXISTS ix_customer_mobile_digits_trgm ON customer USING gin (mobile_digits gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_customer_mobile_digits_trgm")
@@ -0,0 +1,34 @@
+"""One reminder row per target: unique index so concurrent builds cannot duplicate the queue
+
+Revision ID: e2b9d4a6c815
+Revises: c7a1e5d93b02
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b9d4a6c815'
+down_revision = 'c7a1e5d93b02'
+branch_labels = None
+depends_on = None
+
+
+KEY = "coalesce(user_id, 0), type, coalesce(order_id, 0), coalesce(customer_id, 0), due_date"
+
+
+def upgrade():
+    # Drop the duplicates earlier overlapping builds left behind: a Pending copy of a handled
+    # (Sent / Dismissed) reminder goes, then every copy but the oldest
+    op.execute(f"DELETE FROM reminder WHERE status = 'Pending' AND ({KEY}) IN "
+               f"(SELECT {KEY} FROM reminder WHERE status != 'Pending')")
+    op.execute(f"DELETE FROM reminder WHERE id NOT IN (SELECT min(id) FROM reminder GROUP BY {KEY})")
+    op.create_index('uq_reminder_target', 'reminder',
+                    ['user_id', 'type', sa.text('coalesce(order_id, 0)'), sa.text('coalesce(customer_id, 0)'), 'due_date'],
+                    unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('uq_reminder_target', table_name='reminder', if_exists=True)
@@ -3,11 +3,19 @@ from datetime import datetime
 from flask_mail import Mail
 
 from flask_login import UserMixin
+from sqlalchemy import select, func
+from sqlalchemy.orm import validates, column_property
+import re
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 mail = Mail()
 
+def normalize_mobile(value):
+    """Digits only (national 10 digit number, no +91 / 0 prefix), used for indexed mobile lookups."""
+    digits = re.sub(r'\D', '', value or '')
+    return digits[-10:] if len(digits) > 10 else digits
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100))
@@ -20,13 +28,18 @@ class User(UserMixin, db.Model):
     is_verified = db.Column(db.Boolean, default=False)
     
     # Security / Locking
-    failed_attempts = db.Column(db.Integer, default=0)
-    locked_until = db.Column(db.DateTime, nullable=True)
+    failed_attempts = db.Column(db.Integer, default=0) # unused: failures are counted in counters.LoginLockout
+    locked_until = db.Column(db.DateTime, nullable=True) # only honoured for locks set before LoginLockout
     
     # Role
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Bumped on any write to this shop's data; page ETags (see data_versions.py)
+    data_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Day the reminders queue was last rebuilt (see reminder_queue.refresh)
+    reminders_built_on = db.Column(db.Date)
+
     # Relationships
     shop_profile = db.relationship('ShopProfile', backref='user', uselist=False)
     customers = db.relationship('Customer', backref='user', lazy=True)
@@ -45,7 +58,7 @@ class User(UserMixin, db.Model):
 
 class ShopProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # Make nullable for migration, then enforce later
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True) # Make nullable for migration, then enforce later
     shop_name = db.Column(db.String(100))
     address = db.Column(db.Text)
     mobile = db.Column(db.String(20))
@@ -56,6 +69,8 @@ class ShopProfile(db.Model):
     bill_creators = db.Column(db.JSON, default=list) # List of staff/creator names
 
 class Category(db.Model):
+    __table_args__ = (db.Index('ix_category_user_gender', 'user_id', 'gender'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # If None, it's a System/Global Category
     name = db.Column(db.String(50), nullable=False)
@@ -64,10 +79,16 @@ class Category(db.Model):
     fields_json = db.Column(db.JSON, default=list) # List of measurement labels
 
 class Customer(db.Model):
+    __table_args__ = (
+        db.Index('ix_customer_user_last_visit', 'user_id', 'last_visit', 'id'), # customers list keyset
+        db.Index('ix_customer_user_created', 'user_id', 'created_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     name = db.Column(db.String(100), nullable=False)
     mobile = db.Column(db.String(20), unique=True, nullable=False)
+    mobile_digits = db.Column(db.String(20), index=True) # normalize_mobile(mobile), for search
     alt_mobile = db.Column(db.String(20))
     email = db.Column(db.String(120))
     address = db.Column(db.Text)
@@ -81,15 +102,22 @@ class Customer(db.Model):
     birthday = db.Column(db.Date)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     last_visit = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1') # see data_versions.py
 
     orders = db.relationship('Order', backref='customer', lazy=True)
     measurements = db.relationship('Measurement', backref='customer', lazy=True)
 
-    @property
-    def total_pending(self):
-        return sum(o.balance for o in self.orders)
+    @validates('mobile')
+    def _sync_mobile_digits(self, key, value):
+        self.mobile_digits = normalize_mobile(value)
+        return value
 
 class Measurement(db.Model):
+    __table_args__ = (
+        db.Index('ix_measurement_customer_category', 'customer_id', 'category_id', 'is_active', 'date'), # duplicate check
+        db.Index('ix_measurement_user_date', 'user_id', 'date', 'id'), # measurements list keyset
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -102,6 +130,14 @@ class Measurement(db.Model):
     category = db.relationship('Category', backref='measurements', lazy=True)
 
 class Order(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at', 'id'), # orders / bills keyset, month filters
+        db.Index('ix_order_user_delivery_status', 'user_id', 'delivery_date', 'work_status'), # reminders, due today
+        db.Index('ix_order_customer_user', 'customer_id', 'user_id'), # per customer counts / balances
+        db.Index('ix_order_user_pending', 'user_id', 'balance',
+                 postgresql_where=db.text('balance > 0'), sqlite_where=db.text('balance > 0')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -123,17 +159,92 @@ class Order(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+# Per-customer order stats as correlated subqueries (served by ix_order_customer_user).
+# Deferred: add .options(db.undefer(Customer.order_count), ...) to load them with the customer row.
+Customer.order_count = column_property(
+    select(func.count(Order.id))
+    .where(Order.customer_id == Customer.id, Order.user_id == Customer.user_id)
+    .correlate_except(Order).scalar_subquery(),
+    deferred=True
+)
+Customer.total_pending = column_property(
+    select(func.coalesce(func.sum(Order.balance), 0))
+    .where(Order.customer_id == Customer.id, Order.user_id == Customer.user_id)
+    .correlate_except(Order).scalar_subquery(),
+    deferred=True
+)
+
 class Reminder(db.Model):
+    """Work queue rows generated by reminder_queue.py."""
+    __table_args__ = (
+        db.Index('ix_reminder_user_status_type_due', 'user_id', 'status', 'type', 'due_date'), # /reminders, dashboard
+        db.Index('ix_reminder_order', 'order_id'), # per order resync
+        db.Index('ix_reminder_customer', 'customer_id'),
+        # One row per reminder, whatever its status; birthday rows have no order_id, so NULLs are folded to 0
+        db.Index('uq_reminder_target', 'user_id', 'type', db.text('coalesce(order_id, 0)'),
+                 db.text('coalesce(customer_id, 0)'), 'due_date', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)
-    type = db.Column(db.String(50)) # 'measurement', 'delivery', 'payment'
+    type = db.Column(db.String(50)) # 'delivery', 'trial', 'payment', 'birthday'
     due_date = db.Column(db.Date)
     due_time = db.Column(db.Time)
     message = db.Column(db.String(255))
     status = db.Column(db.String(20), default='Pending') # Pending, Sent, Dismissed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    customer_rel = db.relationship('Customer', backref='reminders')
-    order_rel = db.relationship('Order', backref='reminders')
+    customer_rel = db.relationship('Customer', backref=db.backref('reminders', cascade='all, delete-orphan'))
+    order_rel = db.relationship('Order', backref=db.backref('reminders', cascade='all, delete-orphan'))
+
+class DailyRollup(db.Model):
+    """Per shop, per day running totals so dashboard ranges never scan Order/Customer."""
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_daily_rollup_user_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    revenue = db.Column(db.Float, default=0.0, nullable=False) # Sum of Order.total_amt created that day
+    advance = db.Column(db.Float, default=0.0, nullable=False)
+    balance = db.Column(db.Float, default=0.0, nullable=False) # Net balance delta
+    new_customers = db.Column(db.Integer, default=0, nullable=False)
+    orders_created = db.Column(db.Integer, default=0, nullable=False)
+
+class OutboxEmail(db.Model):
+    """An email waiting for the background sender (see outbox.py)."""
+    __table_args__ = (db.Index('ix_outbox_email_status_next', 'status', 'next_attempt_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='Pending', nullable=False) # Pending, Sending, Sent, Failed, Expired
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False) # also the Sending lease
+    expires_at = db.Column(db.DateTime) # OTP mail: not worth sending once the code has expired
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+class ExportJob(db.Model):
+    """A CSV export built in the background and downloaded later (see export_jobs.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    data_type = db.Column(db.String(20), nullable=False) # orders, customers, measurements, bills
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False) # inclusive
+    status = db.Column(db.String(20), default='Pending') # Pending, Running, Done, Failed
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    lease_until = db.Column(db.DateTime) # a Running job's worker renews this; past it, the job is taken over
+    file_path = db.Column(db.String(300))
+    row_count = db.Column(db.Integer, default=0)
+    size_bytes = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def filename(self):
+        return f"{self.data_type.capitalize()}_{self.start_date.strftime('%d-%m-%Y')}_to_{self.end_date.strftime('%d-%m-%Y')}.csv.gz"
@@ -0,0 +1,250 @@
+"""
+Outbound mail queue.
+
+Requests never talk to SMTP. enqueue() adds an OutboxEmail row to the
+caller's transaction (so an OTP and the email carrying it are committed
+together), and after the commit wake() nudges a background sender thread.
+The sender claims due rows in batches, sends them over one SMTP connection
+that is kept open between batches (closed after OUTBOX_SMTP_IDLE seconds
+without mail), and reschedules failures with exponential backoff until
+OUTBOX_MAX_ATTEMPTS. Permanent rejections (5xx) fail at once.
+
+Bodies carry OTP codes, so a row does not keep its body once it is finished:
+it is cleared on Sent / Failed, a row past its expires_at (the code it
+carries has expired) becomes Expired without being sent, and finished rows
+are deleted after OUTBOX_RETENTION_DAYS.
+
+Set OUTBOX_SENDER=0 to keep the sender out of the web process and run
+`flask --app app send-outbox --loop` instead. Point MAIL_SERVER / MAIL_PORT
+at a local stand-in (e.g. `python -m aiosmtpd -n -l localhost:8025`) to
+try it without the network.
+"""
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Connection, Message
+from sqlalchemy import delete, update
+
+from models import db, OutboxEmail
+
+# A claimed row is retried by another sender if this one has not finished it by then
+SENDING_LEASE = timedelta(minutes=5)
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+_sender_started = False
+_sender_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+FINISHED = ('Sent', 'Failed', 'Expired')
+
+
+def enqueue(recipient, subject, body, expires_at=None):
+    """
+    Adds an email to the current transaction; call wake() after committing.
+    Mail still unsent at `expires_at` is dropped instead of delivered late.
+    """
+    email = OutboxEmail(recipient=recipient, subject=subject, body=body, expires_at=expires_at)
+    db.session.add(email)
+    return email
+
+
+def wake():
+    """Tells the in-process sender there is new mail (starting it on first use)."""
+    app = current_app._get_current_object()
+    if not app.config.get('OUTBOX_SENDER'):
+        return
+    _start_sender(app)
+    _wakeup.set()
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+class _TimeoutConnection(Connection):
+    """Flask-Mail connection whose socket operations give up after `timeout` seconds."""
+
+    def __init__(self, mail_state, timeout):
+        super().__init__(mail_state)
+        self.timeout = timeout
+
+    def configure_host(self):
+        state = self.mail
+        if state.use_ssl:
+            host = smtplib.SMTP_SSL(state.server, state.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(state.server, state.port, timeout=self.timeout)
+        if state.use_tls:
+            host.starttls()
+        if state.username and state.password:
+            host.login(state.username, state.password)
+        return host
+
+
+class SMTPPool:
+    """One reusable SMTP connection for a sender thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.connection = None
+        self.last_used = 0.0
+
+    def get(self):
+        idle = time.monotonic() - self.last_used
+        if self.connection is not None and idle > self.app.config.get('OUTBOX_SMTP_IDLE', 60):
+            self.close()
+        if self.connection is None:
+            self.connection = _TimeoutConnection(self.app.extensions['mail'],
+                                                 self.app.config.get('OUTBOX_SMTP_TIMEOUT', 10))
+            self.connection.__enter__()
+        return self.connection
+
+    def send(self, message):
+        reused = self.connection is not None
+        try:
+            self.get().send(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            if not reused:
+                raise
+            # The server dropped the kept-open connection; one attempt on a fresh one
+            self.close()
+            self.get().send(message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.app.config.get('OUTBOX_SMTP_IDLE', 60):
+            self.close()
+
+
+def _claim(email_id, now):
+    """Due row -> Sending (leased until now + SENDING_LEASE); False if another sender has it."""
+    result = db.session.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id == email_id,
+               OutboxEmail.status.in_(('Pending', 'Sending')),
+               OutboxEmail.next_attempt_at <= now)
+        .values(status='Sending', next_attempt_at=now + SENDING_LEASE)
+    )
+    return result.rowcount == 1
+
+
+def _is_permanent(error):
+    """5xx replies will not change on a retry (bad address, rejected sender)."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return False
+
+
+def send_batch(app, pool, batch_size=None):
+    """Sends up to batch_size due emails. Returns how many rows were processed."""
+    batch_size = batch_size or app.config.get('OUTBOX_BATCH_SIZE', 20)
+    now = datetime.utcnow()
+    due_ids = [row.id for row in OutboxEmail.query.with_entities(OutboxEmail.id).filter(
+        OutboxEmail.status.in_(('Pending', 'Sending')),
+        OutboxEmail.next_attempt_at <= now
+    ).order_by(OutboxEmail.next_attempt_at, OutboxEmail.id).limit(batch_size)]
+    claimed = [email_id for email_id in due_ids if _claim(email_id, now)]
+    db.session.commit()
+    if not claimed:
+        return 0
+
+    sender = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME')
+    max_attempts = app.config.get('OUTBOX_MAX_ATTEMPTS', 5)
+    for email in OutboxEmail.query.filter(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id).all():
+        if email.expires_at is not None and email.expires_at <= datetime.utcnow():
+            email.status = 'Expired'
+            email.body = ''
+            db.session.commit()
+            continue
+        email.attempts += 1
+        try:
+            pool.send(Message(email.subject, recipients=[email.recipient], body=email.body, sender=sender))
+            email.status = 'Sent'
+            email.sent_at = datetime.utcnow()
+            email.last_error = None
+            email.body = ''
+        except Exception as e:
+            pool.close()
+            email.last_error = str(e)[:1000]
+            if _is_permanent(e) or email.attempts >= max_attempts:
+                email.status = 'Failed'
+                email.body = ''
+                print(f"Mail Error (giving up on {email.recipient}): {e}")
+            else:
+                email.status = 'Pending'
+                email.next_attempt_at = datetime.utcnow() + backoff(email.attempts)
+        db.session.commit() # per email, so a crash never resends what already went out
+    return len(claimed)
+
+
+def purge(app, now=None):
+    """Deletes finished rows older than OUTBOX_RETENTION_DAYS. Returns how many went."""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=app.config.get('OUTBOX_RETENTION_DAYS', 7))
+    result = db.session.execute(
+        delete(OutboxEmail).where(OutboxEmail.status.in_(FINISHED), OutboxEmail.created_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def drain(app, pool):
+    """Sends batches until nothing is due, then purges old rows. Returns the number of rows processed."""
+    total = 0
+    while True:
+        count = send_batch(app, pool)
+        total += count
+        if not count:
+            purge(app)
+            return total
+
+
+def _next_due_in(default):
+    next_at = db.session.query(db.func.min(OutboxEmail.next_attempt_at))\
+        .filter(OutboxEmail.status.in_(('Pending', 'Sending'))).scalar()
+    if next_at is None:
+        return default
+    return max(0.0, min(default, (next_at - datetime.utcnow()).total_seconds()))
+
+
+def _sender_loop(app):
+    pool = SMTPPool(app)
+    poll = app.config.get('OUTBOX_POLL_SECONDS', 30)
+    while True:
+        wait = poll
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                drain(app, pool)
+                wait = _next_due_in(poll)
+            except Exception as e:
+                db.session.rollback()
+                pool.close()
+                print(f"Outbox Error: {e}")
+            finally:
+                db.session.remove()
+        _wakeup.wait(wait)
+        pool.close_if_idle()
+
+
+def _start_sender(app):
+    global _sender_started
+    with _sender_lock:
+        if _sender_started:
+            return
+        _sender_started = True
+    threading.Thread(target=_sender_loop, args=(app,), name='outbox-sender', daemon=True).start()
@@ -0,0 +1,135 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values, position):
+    """Opaque cursor for a row's sort key plus its 0-based position in the list."""
+    payload = [[v.isoformat() if isinstance(v, (date, datetime)) else v for v in values], position]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Returns (values, position), or (None, 0) for a missing or malformed cursor."""
+    if not token:
+        return None, 0
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values, position = json.loads(raw)
+        if len(values) != len(columns):
+            return None, 0
+        parsed = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if value is not None and python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif value is not None and python_type is date:
+                value = date.fromisoformat(value)
+            parsed.append(value)
+        return parsed, int(position)
+    except (ValueError, TypeError, NotImplementedError):
+        return None, 0
+
+
+class KeysetPage:
+    """One page of a keyset paginated list plus the links to its neighbours."""
+
+    def __init__(self, items, per_page, offset, has_prev, has_next, prev_cursor, next_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.offset = offset # rows before this page, for SR numbering
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+        self.total = total # Only computed on request (COUNT(*) is the expensive part)
+        self.prev_url = None
+        self.next_url = None
+
+    @property
+    def first_index(self):
+        return self.offset + 1 if self.items else 0
+
+    @property
+    def last_index(self):
+        return self.offset + len(self.items)
+
+    def with_links(self, endpoint, **values):
+        """Builds prev/next URLs that keep the current query string (filters, month, ...)."""
+        args = {k: v for k, v in request.args.items() if k not in ('cursor', 'dir', 'page')}
+        args.update(values)
+        if self.has_prev:
+            self.prev_url = url_for(endpoint, cursor=self.prev_cursor, dir='prev', **args)
+        if self.has_next:
+            self.next_url = url_for(endpoint, cursor=self.next_cursor, dir='next', **args)
+        return self
+
+
+def _seek(query, columns, key, forward, limit):
+    """
+    Up to `limit` rows after `key` going down the list (forward), or before it
+    going up (nearest first). The list is every row with a non-NULL leading
+    column, by `columns` descending, then the rows where it is NULL, by the
+    remaining columns descending. Spelling the NULL rows out keeps the order
+    the same on every database and each part a single indexed range scan.
+    """
+    lead, rest = columns[0], columns[1:]
+    if forward:
+        past = lambda cols, values: tuple_(*cols) < tuple_(*values)
+        direction = lambda c: c.desc()
+    else:
+        past = lambda cols, values: tuple_(*cols) > tuple_(*values)
+        direction = lambda c: c.asc()
+
+    valued = query.filter(lead.isnot(None))
+    nulls = query.filter(lead.is_(None))
+    if key is not None and key[0] is None:
+        nulls = nulls.filter(past(rest, key[1:]))
+        valued = None if forward else valued
+    elif key is not None:
+        valued = valued.filter(past(columns, key))
+        nulls = nulls if forward else None
+
+    parts = [(valued, columns), (nulls, rest)]
+    if not forward:
+        parts.reverse()
+    rows = []
+    for part, order in parts:
+        if part is not None and len(rows) < limit:
+            rows += part.order_by(None).order_by(*[direction(c) for c in order]).limit(limit - len(rows)).all()
+    return rows
+
+
+def keyset_paginate(query, columns, cursor=None, direction='next', per_page=50, with_total=False):
+    """
+    Seek pagination over `query` ordered by `columns` descending (last column
+    must be unique, e.g. the primary key; only the first may be NULL, those
+    rows come last). Each page is an indexed range scan of per_page + 1 rows,
+    so deep pages cost the same as page 1.
+    """
+    key, position = decode_cursor(cursor, columns)
+    if key is not None and None in key[1:]:
+        key, position = None, 0
+    total = query.order_by(None).count() if with_total else None
+    key_of = lambda row: [getattr(row, c.key) for c in columns]
+
+    if key is not None and direction == 'prev':
+        rows = _seek(query, columns, key, False, per_page + 1)
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        offset = max(position - len(items), 0)
+        has_next = True
+    else:
+        offset = position + 1 if key is not None else 0
+        rows = _seek(query, columns, key, True, per_page + 1)
+        items = rows[:per_page]
+        has_next = len(rows) > per_page
+        has_prev = offset > 0
+
+    prev_cursor = encode_cursor(key_of(items[0]), offset) if items else None
+    next_cursor = encode_cursor(key_of(items[-1]), offset + len(items) - 1) if items else None
+    return KeysetPage(items, per_page, offset, has_prev, has_next, prev_cursor, next_cursor, total)
@@ -0,0 +1,292 @@
+"""
+Precomputed reminders: the work queue behind /reminders and the dashboard.
+
+build() materializes one Reminder row per thing a shop has to act on:
+
+    delivery  undelivered order with a delivery date, however far ahead
+              (overdue is a delivery whose due_date has passed, so rows do not
+              need rewriting when the day rolls over)
+    trial     trial fitting today or later
+    payment   order with a balance left to collect
+    birthday  customer birthday between today and HORIZON_DAYS ahead
+
+dated() picks the rows due in the window a page shows, so order rows never
+depend on when the queue was built. Birthdays do (next year's row only
+appears after the day has passed), so the queue of a shop is rebuilt at least
+once a day: by refresh() on the first page read of the day, by cron with
+`flask --app app build-reminders`, or by a background thread in the web
+process when REMINDER_SCHEDULER=1. User.reminders_built_on records the last
+build. Overlapping runs are harmless: the uq_reminder_target index allows one
+row per reminder and inserts skip rows that already exist.
+Between runs an after_flush hook keeps the rows of every order / customer
+written through the ORM session in step, so a delivered or paid order leaves
+the queue at once. The pages then read a handful of indexed rows instead of
+re-deriving the lists from Order on every view.
+
+Only 'Pending' rows belong to the queue; a row moved to another status
+(Sent, Dismissed) is left alone and not generated again.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, event, inspect, insert as generic_insert, select, update
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from models import db, Customer, Order, Reminder, User
+
+HORIZON_DAYS = 7
+OPENING_BALANCE = "Previous Balance Due"
+ORDER_TYPES = ('delivery', 'trial', 'payment')
+DATED_TYPES = ('delivery', 'trial', 'birthday')
+
+# Order columns the generated rows depend on; edits to anything else skip the resync
+ORDER_FIELDS = ('work_status', 'delivery_date', 'trial_date', 'balance', 'items', 'customer_id')
+
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def _is_opening_balance(order):
+    return bool(order.items) and order.items[0].get('name') == OPENING_BALANCE
+
+
+def order_rows(order, today):
+    """Reminder rows (as dicts) for one order."""
+    rows = []
+    base = {'user_id': order.user_id, 'customer_id': order.customer_id, 'order_id': order.id, 'status': 'Pending'}
+
+    if order.work_status != 'Delivered' and not _is_opening_balance(order):
+        if order.delivery_date:
+            rows.append(dict(base, type='delivery', due_date=order.delivery_date,
+                             message=f"Delivery - Order {order.id}"))
+        if order.trial_date and order.trial_date >= today:
+            rows.append(dict(base, type='trial', due_date=order.trial_date,
+                             message=f"Trial - Order {order.id}"))
+
+    if (order.balance or 0) > 0:
+        created = order.created_at or datetime.utcnow()
+        rows.append(dict(base, type='payment', due_date=order.delivery_date or created.date(),
+                         message=f"Balance {order.balance} - Order {order.id}"))
+    return rows
+
+
+def next_birthday(birthday, today):
+    for year in (today.year, today.year + 1):
+        try:
+            day = birthday.replace(year=year)
+        except ValueError: # 29 Feb outside a leap year
+            day = date(year, 2, 28)
+        if day >= today:
+            return day
+
+
+def customer_rows(customer, today):
+    if not customer.birthday:
+        return []
+    day = next_birthday(customer.birthday, today)
+    if day > today + timedelta(days=HORIZON_DAYS):
+        return []
+    return [{'user_id': customer.user_id, 'customer_id': customer.id, 'order_id': None, 'status': 'Pending',
+             'type': 'birthday', 'due_date': day, 'message': f"Birthday - {customer.name}"}]
+
+
+def _row_key(row):
+    return (row['type'], row['customer_id'], row['order_id'], row['due_date'])
+
+
+def _insert_pending(conn, rows, scope):
+    """Inserts `rows`, skipping any the shop already moved out of Pending. `scope` limits that lookup."""
+    if not rows:
+        return 0
+    handled = select(Reminder.type, Reminder.customer_id, Reminder.order_id, Reminder.due_date)\
+        .where(Reminder.status != 'Pending', *scope)
+    skip = set(conn.execute(handled).all())
+    rows = [r for r in rows if _row_key(r) not in skip]
+    if not rows:
+        return 0
+    result = conn.execute(_insert_ignoring_duplicates(conn), rows)
+    return result.rowcount if result.rowcount >= 0 else len(rows)
+
+
+def _insert_ignoring_duplicates(conn):
+    """INSERT that skips rows another run (a second worker, cron) already queued."""
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return generic_insert(Reminder)
+    return insert(Reminder).on_conflict_do_nothing()
+
+
+def build(user_id=None, today=None):
+    """
+    Replaces the Pending queue of one shop (or every shop when user_id is None)
+    with rows computed for `today`. Returns the number of rows written. Caller commits.
+    """
+    today = today or date.today()
+    conn = db.session.connection()
+
+    scope = [Reminder.user_id == user_id] if user_id is not None else []
+    conn.execute(delete(Reminder).where(Reminder.status == 'Pending', *scope))
+    users = [User.id == user_id] if user_id is not None else []
+    conn.execute(update(User).where(*users).values(reminders_built_on=today))
+
+    orders = Order.query.filter(
+        db.or_(
+            db.and_(Order.work_status != 'Delivered',
+                    db.or_(Order.delivery_date.isnot(None), Order.trial_date >= today)),
+            Order.balance > 0
+        )
+    )
+    customers = Customer.query.filter(Customer.birthday.isnot(None))
+    if user_id is not None:
+        orders = orders.filter(Order.user_id == user_id)
+        customers = customers.filter(Customer.user_id == user_id)
+
+    rows = []
+    for order in orders.yield_per(500):
+        rows.extend(order_rows(order, today))
+    for customer in customers.yield_per(500):
+        rows.extend(customer_rows(customer, today))
+    return _insert_pending(conn, rows, scope)
+
+
+def _order_changed(session, order):
+    if order in session.new:
+        return True
+    state = inspect(order)
+    return any(state.attrs[name].history.has_changes() for name in ORDER_FIELDS)
+
+
+def _birthday_changed(session, customer):
+    if customer in session.new:
+        return customer.birthday is not None
+    state = inspect(customer)
+    return state.attrs.birthday.history.has_changes() or state.attrs.name.history.has_changes()
+
+
+def _sync(session, flush_context):
+    """after_flush: regenerate the Pending rows of orders / customers written in this flush."""
+    orders = [o for o in list(session.new) + list(session.dirty)
+              if isinstance(o, Order) and o not in session.deleted and _order_changed(session, o)]
+    customers = [c for c in list(session.new) + list(session.dirty)
+                 if isinstance(c, Customer) and c not in session.deleted and _birthday_changed(session, c)]
+    if not orders and not customers:
+        return
+
+    today = date.today()
+    conn = session.connection()
+    rows = []
+    if orders:
+        order_ids = [o.id for o in orders]
+        conn.execute(delete(Reminder).where(Reminder.status == 'Pending', Reminder.order_id.in_(order_ids),
+                                            Reminder.type.in_(ORDER_TYPES)))
+        for order in orders:
+            rows.extend(order_rows(order, today))
+        _insert_pending(conn, rows, [Reminder.order_id.in_(order_ids)])
+    if customers:
+        customer_ids = [c.id for c in customers]
+        conn.execute(delete(Reminder).where(Reminder.status == 'Pending', Reminder.customer_id.in_(customer_ids),
+                                            Reminder.type == 'birthday'))
+        rows = [row for c in customers for row in customer_rows(c, today)]
+        _insert_pending(conn, rows, [Reminder.customer_id.in_(customer_ids), Reminder.type == 'birthday'])
+
+
+def refresh(user_id, today=None):
+    """
+    Rebuilds the queue of one shop if it was last built before `today` (the first
+    page read of the day when neither cron nor the scheduler got there first).
+    Commits when it rebuilds.
+    """
+    today = today or date.today()
+    claimed = db.session.execute(
+        update(User)
+        .where(User.id == user_id,
+               db.or_(User.reminders_built_on.is_(None), User.reminders_built_on < today))
+        .values(reminders_built_on=today)
+    )
+    if claimed.rowcount == 1:
+        build(user_id, today)
+        db.session.commit()
+
+
+def dated(user_id, until, types=DATED_TYPES, after=None, limit=None, today=None):
+    """
+    Pending rows of `types` due on or before `until` (and after `after`), soonest
+    first, at most `limit`. Overdue deliveries are included; a trial or birthday
+    whose day has passed is not.
+    """
+    today = today or date.today()
+    query = Reminder.query.filter(
+        Reminder.user_id == user_id,
+        Reminder.status == 'Pending',
+        Reminder.type.in_(types),
+        Reminder.due_date <= until,
+        db.or_(Reminder.type == 'delivery', Reminder.due_date >= today)
+    )
+    if after is not None:
+        query = query.filter(Reminder.due_date > after)
+    query = query.options(
+        joinedload(Reminder.order_rel).joinedload(Order.customer),
+        joinedload(Reminder.customer_rel)
+    ).order_by(Reminder.due_date, Reminder.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def payments(user_id, limit=10):
+    """Pending payment rows, largest balance first."""
+    return Reminder.query.join(Reminder.order_rel).filter(
+        Reminder.user_id == user_id,
+        Reminder.status == 'Pending',
+        Reminder.type == 'payment'
+    ).options(
+        contains_eager(Reminder.order_rel).joinedload(Order.customer)
+    ).order_by(Order.balance.desc(), Reminder.id).limit(limit).all()
+
+
+def _seconds_until_tomorrow():
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+
+def _scheduler_loop(app):
+    while True:
+        with app.app_context():
+            try:
+                count = build()
+                db.session.commit()
+                print(f"Reminder queue rebuilt: {count} rows.")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Reminder Build Error: {e}")
+            finally:
+                db.session.remove()
+        time.sleep(_seconds_until_tomorrow() + 60)
+
+
+def start_scheduler(app):
+    """Rebuilds every shop's queue now and then shortly after each midnight (once per process)."""
+    global _scheduler_started
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, args=(app,), name='reminder-scheduler', daemon=True).start()
+
+
+def init_app(app):
+    if not event.contains(Session, 'after_flush', _sync):
+        event.listen(Session, 'after_flush', _sync)
+
+    if app.config.get('REMINDER_SCHEDULER'):
+        # Started by the first request rather than here, so CLI commands never spawn it
+        @app.before_request
+        def _start_reminder_scheduler():
+            if not _scheduler_started:
+                start_scheduler(app)
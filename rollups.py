@@ -0,0 +1,162 @@
+from datetime import date, datetime
+
+from sqlalchemy import func, update
+
+from models import db, Customer, Order, DailyRollup
+
+ROLLUP_FIELDS = ('revenue', 'advance', 'balance', 'new_customers', 'orders_created')
+
+
+def _as_day(value):
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        # func.date() comes back as text on SQLite
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _insert_for_dialect():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def bump(user_id, day, **deltas):
+    """
+    Atomically adds `deltas` to the (user_id, day) rollup row inside the
+    current session transaction, creating the row if it does not exist.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if user_id is None or not deltas:
+        return
+    day = _as_day(day)
+
+    insert = _insert_for_dialect()
+    if insert is not None:
+        values = {field: 0 for field in ROLLUP_FIELDS}
+        values.update(deltas)
+        stmt = insert(DailyRollup).values(user_id=user_id, day=day, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'day'],
+            set_={k: getattr(DailyRollup, k) + stmt.excluded[k] for k in deltas}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Generic fallback: UPDATE first, INSERT if no row matched
+    result = db.session.execute(
+        update(DailyRollup)
+        .where(DailyRollup.user_id == user_id, DailyRollup.day == day)
+        .values({k: getattr(DailyRollup, k) + v for k, v in deltas.items()})
+    )
+    if result.rowcount == 0:
+        db.session.add(DailyRollup(user_id=user_id, day=day, **{f: deltas.get(f, 0) for f in ROLLUP_FIELDS}))
+
+
+def _order_values(order):
+    return {
+        'revenue': order.total_amt or 0,
+        'advance': order.advance or 0,
+        'balance': order.balance or 0,
+    }
+
+
+def snapshot_order(order):
+    """Captures an order's rollup contribution (and the day it counts on) before it is edited."""
+    return dict(_order_values(order), day=_as_day(order.created_at or datetime.utcnow()))
+
+
+def record_order(order, sign=1):
+    """Adds (sign=1) or removes (sign=-1) an order from its day's rollup."""
+    values = {k: sign * v for k, v in _order_values(order).items()}
+    bump(order.user_id, order.created_at or datetime.utcnow(), orders_created=sign, **values)
+
+
+def record_order_change(order, before):
+    """Applies the difference between `before` (see snapshot_order) and the order's current values."""
+    after = _order_values(order)
+    day = _as_day(order.created_at or datetime.utcnow())
+    if day != before['day']:
+        # Moved to another day: out of the old day's row, into the new one
+        bump(order.user_id, before['day'], orders_created=-1, **{k: -before[k] for k in after})
+        bump(order.user_id, day, orders_created=1, **after)
+        return
+    bump(order.user_id, day, **{k: after[k] - before[k] for k in after})
+
+
+def record_customer(customer, sign=1):
+    bump(customer.user_id, customer.created_date or datetime.utcnow(), new_customers=sign)
+
+
+def remove_customer(customer):
+    """Takes a customer and all of their orders out of the rollups (before a bulk delete)."""
+    rows = db.session.query(
+        func.date(Order.created_at),
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amt), 0),
+        func.coalesce(func.sum(Order.advance), 0),
+        func.coalesce(func.sum(Order.balance), 0),
+    ).filter(Order.customer_id == customer.id).group_by(func.date(Order.created_at)).all()
+
+    for day, count, revenue, advance, balance in rows:
+        bump(customer.user_id, day, orders_created=-count, revenue=-revenue, advance=-advance, balance=-balance)
+    record_customer(customer, sign=-1)
+
+
+def clear_user(user_id):
+    DailyRollup.query.filter_by(user_id=user_id).delete()
+
+
+def rebuild(user_id=None):
+    """
+    Recomputes rollups from the raw Order and Customer rows (backfill or repair).
+    Rebuilds every shop when user_id is None. Caller commits.
+    """
+    query = DailyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    query.delete()
+
+    buckets = {}
+
+    def bucket(uid, day):
+        key = (uid, _as_day(day))
+        if key not in buckets:
+            buckets[key] = {f: 0 for f in ROLLUP_FIELDS}
+        return buckets[key]
+
+    order_day = func.date(Order.created_at)
+    order_rows = db.session.query(
+        Order.user_id, order_day,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amt), 0),
+        func.coalesce(func.sum(Order.advance), 0),
+        func.coalesce(func.sum(Order.balance), 0),
+    ).filter(Order.user_id.isnot(None), Order.created_at.isnot(None))
+    if user_id is not None:
+        order_rows = order_rows.filter(Order.user_id == user_id)
+    for uid, day, count, revenue, advance, balance in order_rows.group_by(Order.user_id, order_day):
+        b = bucket(uid, day)
+        b.update(orders_created=count, revenue=revenue, advance=advance, balance=balance)
+
+    customer_day = func.date(Customer.created_date)
+    customer_rows = db.session.query(
+        Customer.user_id, customer_day, func.count(Customer.id)
+    ).filter(Customer.user_id.isnot(None), Customer.created_date.isnot(None))
+    if user_id is not None:
+        customer_rows = customer_rows.filter(Customer.user_id == user_id)
+    for uid, day, count in customer_rows.group_by(Customer.user_id, customer_day):
+        bucket(uid, day)['new_customers'] = count
+
+    db.session.bulk_save_objects([
+        DailyRollup(user_id=uid, day=day, **values) for (uid, day), values in buckets.items()
+    ])
+    return len(buckets)
@@ -1,16 +1,28 @@
 from flask import render_template, request, redirect, url_for, flash, jsonify, make_response
-from models import db, Customer, Category, Measurement, Order, ShopProfile, mail, Reminder
+from models import db, Customer, Category, Measurement, Order, ShopProfile, Reminder
 from werkzeug.utils import secure_filename
 import os
 import random
 import string
 from datetime import datetime, timedelta
-from flask_mail import Message
 import hmac
 import hashlib
 from flask_login import login_user, logout_user, login_required, current_user
 from models import User
 from app import limiter
+from dashboard_stats import compute_dashboard_stats
+import rollups
+import invoices
+import uploads
+import reminder_queue
+import outbox
+from search import customer_match, search_customers, search_orders
+from pagination import keyset_paginate
+from date_ranges import month_from_args, month_range, month_label, parse_day, in_range, on_day
+from identity_cache import get_shop_profile, invalidate_shop_profile, invalidate_user
+import data_versions
+from data_versions import conditional_page
+from measurement_service import MAX_BATCH, MeasurementInputError, parse_garment, save_garments, user_categories
 
 # OTP Helper
 def send_otp_email(user):
@@ -18,7 +30,15 @@ def send_otp_email(user):
     user.otp_code = otp
     # OTP Valid for 10 minutes
     user.otp_expiry = datetime.utcnow() + timedelta(minutes=10)
+    # Queued in the same commit as the OTP; the outbox sender delivers it (no SMTP on this request)
+    outbox.enqueue(
+        user.email,
+        'Your Taivex verification code',
+        f"Your verification code is {otp}.\n\nIt expires in 10 minutes. If you did not request it, you can ignore this email.",
+        expires_at=user.otp_expiry
+    )
     db.session.commit()
+    outbox.wake()
     
     # FOR LOCAL TESTING: Print OTP to Console + Flash to Screen
     print(f"\n{'='*20}\n OTP GENERATED: {otp} \n{'='*20}\n")
@@ -28,11 +48,6 @@ def send_otp_email(user):
              flash(f'DEV MODE: Your OTP is {otp}', 'info')
     except:
         pass 
-    
-    try:
-        mail.send(msg)
-    except Exception as e:
-        print(f"Mail Error (OTP not sent via email): {e}")
 
 
 def register_routes(app):
@@ -42,8 +57,8 @@ def register_routes(app):
     def inject_defaults():
         try:
             if current_user.is_authenticated:
-                 # Access via relationship or query
-                 shop = ShopProfile.query.filter_by(user_id=current_user.id).first()
+                 # Cached per request (and briefly across requests, see IDENTITY_CACHE_TTL)
+                 shop = get_shop_profile(current_user.id)
                  return dict(active_page='', shop=shop)
             return dict(active_page='', shop=None)
         except Exception as e:
@@ -108,25 +123,21 @@ def register_routes(app):
             
             user = User.query.filter_by(email=email).first()
             
-            # Check Lockout
-            if user and user.locked_until:
-                if user.locked_until > datetime.utcnow():
-                    # Still locked
-                    wait_seconds = (user.locked_until - datetime.utcnow()).seconds
-                    hours = wait_seconds // 3600
-                    mins = (wait_seconds % 3600) // 60
-                    flash(f'Account locked due to too many failed attempts. Try again in {hours}h {mins}m.', 'danger')
-                    return redirect(url_for('login'))
-                else:
-                    # Lock expired
-                    user.locked_until = None
-                    user.failed_attempts = 0
-                    db.session.commit()
+            # Check Lockout (counters are shared by all workers, see counters.py)
+            lockout = app.extensions['login_lockout']
+            wait_seconds = lockout.locked_for(user.id) if user else 0
+            if user and user.locked_until and user.locked_until > datetime.utcnow():
+                # Lock recorded on the User row before the shared counters existed
+                wait_seconds = max(wait_seconds, int((user.locked_until - datetime.utcnow()).total_seconds()))
+            if wait_seconds:
+                hours = wait_seconds // 3600
+                mins = (wait_seconds % 3600) // 60
+                flash(f'Account locked due to too many failed attempts. Try again in {hours}h {mins}m.', 'danger')
+                return redirect(url_for('login'))
 
             if user and user.check_password(password):
                 # Success
-                user.failed_attempts = 0
-                db.session.commit()
+                lockout.reset(user.id)
                 
                 # Generate OTP for 2FA
                 send_otp_email(user)
@@ -138,16 +149,10 @@ def register_routes(app):
                 return redirect(url_for('verify_otp'))
             else:
                 # Failure
-                if user:
-                    user.failed_attempts = (user.failed_attempts or 0) + 1
-                    if user.failed_attempts >= 5:
-                        user.locked_until = datetime.utcnow() + timedelta(hours=4)
-                        flash('Too many failed attempts. Account locked for 4 hours.', 'danger')
-                    else:
-                        flash('Invalid email or password.', 'error')
-                    db.session.commit()
+                if user and lockout.record_failure(user.id):
+                    flash('Too many failed attempts. Account locked for 4 hours.', 'danger')
                 else:
-                     flash('Invalid email or password.', 'error')
+                    flash('Invalid email or password.', 'error')
                 
         return render_template('login.html')
 
@@ -171,6 +176,7 @@ def register_routes(app):
                 user.otp_expiry = None
                 user.is_verified = True
                 db.session.commit()
+                invalidate_user(user.id)
                 
                 # Login proper
                 login_user(user, remember=session.get('remember_me', False))
@@ -236,6 +242,7 @@ def register_routes(app):
                     user.set_password(password)
                     user.otp_code = None
                     db.session.commit()
+                    invalidate_user(user.id)
                     session.pop('reset_user_id', None)
                     flash('Password reset successfully. Please login.', 'success')
                     return redirect(url_for('login'))
@@ -255,16 +262,22 @@ def register_routes(app):
     @login_required
     def settings():
         staff_members = []
-        shop = ShopProfile.query.filter_by(user_id=current_user.id).first()
+        shop = get_shop_profile(current_user.id)
         if not shop:
              shop = ShopProfile(user_id=current_user.id) # Create generic if missing
              db.session.add(shop)
              db.session.commit()
+             invalidate_shop_profile(current_user.id)
               
         # Categories are now handled in custom_categories, but if needed here:
         # categories = Category.query.all() 
         
-        return render_template('settings.html', active_page='settings', staff_members=staff_members, shop=shop)
+        from models import ExportJob
+        export_jobs = ExportJob.query.filter_by(user_id=current_user.id)\
+            .order_by(ExportJob.created_at.desc()).limit(5).all()
+
+        return render_template('settings.html', active_page='settings', staff_members=staff_members, shop=shop,
+                               export_jobs=export_jobs)
 
 
     @app.route('/settings/update_profile', methods=['POST'])
@@ -293,24 +306,21 @@ def register_routes(app):
         
         # 1. Check for New Upload
         if file and file.filename:
-            filename = secure_filename(file.filename)
-            # Ensure static/uploads exists
-            upload_folder = os.path.join(app.root_path, 'static', 'uploads')
-            if not os.path.exists(upload_folder):
-                os.makedirs(upload_folder)
-                
-            # Save file
-            filepath = os.path.join(upload_folder, filename)
-            file.save(filepath)
-            
-            # Store relative path for template
-            shop.logo = f'uploads/{filename}'
+            # Stored once per content hash under static/uploads/logos, relative path for templates
+            try:
+                shop.logo = uploads.save_image(file, 'logos')
+            except uploads.UploadError as e:
+                # Nothing is saved, so the form is not reported as both failed and updated
+                db.session.rollback()
+                flash(str(e), 'error')
+                return redirect(url_for('settings'))
             
         # 2. Check for Deletion (Only if no new file uploaded)
         elif request.form.get('delete_logo'):
              shop.logo = None
              
         db.session.commit()
+        invalidate_shop_profile(current_user.id)
         flash('Shop profile updated!', 'success')
         return redirect(url_for('settings'))
 
@@ -429,6 +439,7 @@ def register_routes(app):
 
     @app.route('/dashboard')
     @login_required
+    @conditional_page
     def dashboard():
         from datetime import date, timedelta
         from sqlalchemy import func
@@ -436,166 +447,68 @@ def register_routes(app):
         from sqlalchemy import text
         
         today = date.today()
-        yesterday = today - timedelta(days=1)
-        week_start = today - timedelta(days=7)
-        
-        # 1. Customer Stats
-        total_customers = Customer.query.filter_by(user_id=current_user.id).count()
-        new_customers_week = Customer.query.filter(Customer.user_id==current_user.id, Customer.last_visit >= week_start).count()
-        customers_today = Customer.query.filter(Customer.user_id==current_user.id, func.date(Customer.last_visit) == today).count()
-        customers_yesterday = Customer.query.filter(Customer.user_id==current_user.id, func.date(Customer.last_visit) == yesterday).count()
-        
-        diff_today = customers_today - customers_yesterday
-        
-        # 2. Financials
-        # Total Pending Balance
-        total_pending = db.session.query(func.sum(Order.balance)).filter(Order.user_id==current_user.id).scalar() or 0
-        
-        # Balance added today
-        added_today = db.session.query(func.sum(Order.total_amt)).filter(Order.user_id==current_user.id, func.date(Order.created_at) == today).scalar() or 0
-        
-        # Total Revenue
-        total_revenue = db.session.query(func.sum(Order.total_amt)).filter(Order.user_id==current_user.id).scalar() or 0
-
-        # --- NEW: Monthly Metrics ---
-        # Monthly Customers
-        monthly_customers = Customer.query.filter(
-            Customer.user_id == current_user.id,
-            func.extract('month', Customer.created_date) == today.month,
-            func.extract('year', Customer.created_date) == today.year
-        ).count()
-
-        # Monthly Pending Balance
-        monthly_pending = db.session.query(func.sum(Order.balance)).filter(
-            Order.user_id == current_user.id,
-            func.extract('month', Order.created_at) == today.month,
-            func.extract('year', Order.created_at) == today.year
-        ).scalar() or 0
-
-        # Monthly Revenue
-        monthly_revenue = db.session.query(func.sum(Order.total_amt)).filter(
-            Order.user_id == current_user.id,
-            func.extract('month', Order.created_at) == today.month,
-            func.extract('year', Order.created_at) == today.year
-        ).scalar() or 0
-        
-        # --- NEW: Yearly Metrics ---
-        # Yearly Customers
-        yearly_customers = Customer.query.filter(
-            Customer.user_id == current_user.id,
-            func.extract('year', Customer.created_date) == today.year
-        ).count()
-
-        # Yearly Revenue
-        yearly_revenue = db.session.query(func.sum(Order.total_amt)).filter(
-            Order.user_id == current_user.id,
-            func.extract('year', Order.created_at) == today.year
-        ).scalar() or 0
-        # -----------------------------
-        
-        # 3. Order Stats
-        pending_delivery = Order.query.filter_by(user_id=current_user.id).filter(Order.work_status.in_(['Working', 'Ready to Deliver'])).count()
-        delivery_today = Order.query.filter_by(user_id=current_user.id).filter(Order.delivery_date == today).filter(Order.work_status != 'Delivered').count()
-        
-        stats = {
-            "total_customers": total_customers,
-            "customers_this_week": new_customers_week,
-            "today_customers": customers_today,
-            "today_vs_yesterday": diff_today,
-            "pending_balance": total_pending,
-            "balance_added": added_today, 
-            "pending_delivery": pending_delivery,
-            "delivery_today": delivery_today,
-            "total_revenue": total_revenue,
-            "monthly_customers": monthly_customers,
-            "monthly_pending": monthly_pending,
-            "monthly_revenue": monthly_revenue,
-            "yearly_customers": yearly_customers,
-            "yearly_revenue": yearly_revenue
-        }
+        
+        # 1. Headline stats, pie chart and 6 month chart in two aggregate queries
+        stats = compute_dashboard_stats(current_user.id, today)
         
         # Recent Activity (Last 5 Orders)
         recent_activity = Order.query.filter_by(user_id=current_user.id).options(joinedload(Order.customer)).order_by(Order.created_at.desc()).limit(5).all()
         
         # Today's Orders
-        todays_orders_all = Order.query.filter_by(user_id=current_user.id).options(joinedload(Order.customer)).filter(func.date(Order.created_at) == today).order_by(Order.created_at.desc()).all()
+        todays_orders_all = Order.query.filter_by(user_id=current_user.id).options(joinedload(Order.customer)).filter(on_day(Order.created_at, today)).order_by(Order.created_at.desc()).all()
         # Filter out opening balances
         todays_orders = [o for o in todays_orders_all if not (o.items and o.items[0].get('name') == "Previous Balance Due")]
         
-        # Urgent Reminders
-        urgent_reminders = []
-        due_orders = Order.query.filter_by(user_id=current_user.id).options(joinedload(Order.customer)).filter(Order.delivery_date <= today, Order.work_status != 'Delivered').order_by(Order.delivery_date.asc()).limit(50).all()
-        
-        for o in due_orders:
-            if o.items and o.items[0].get('name') == "Previous Balance Due":
-                continue
-            days_diff = (o.delivery_date - today).days
-            date_str = "Today" if days_diff == 0 else f"Overdue ({o.delivery_date.strftime('%d-%b')})"
-            urgent_reminders.append({
-                'title': o.customer.name, 
-                'desc': f"Delivery {date_str} - Order {o.id}",
-                'type': 'delivery',
-                'link': url_for('orders'),
-                'icon': 'fa-shirt',
-                'color': 'var(--danger-color)'
-            })
-            
-        # Graph Data: Monthly Customers (Last 6 Months)
-        graph_data = db.session.query(
-            func.strftime('%m-%Y', Customer.created_date).label('month'),
-            func.count(Customer.id)
-        ).filter(Customer.user_id == current_user.id).group_by('month').order_by(func.min(Customer.created_date)).limit(6).all()
-        
-        chart_labels = []
-        chart_values = []
-        for month_str, count in graph_data:
-            try:
-                m_obj = datetime.strptime(month_str, '%m-%Y')
-                chart_labels.append(m_obj.strftime('%b'))
-            except:
-                chart_labels.append(month_str)
-            chart_values.append(count)
-
-        # Pie Chart Data: Order Status Distribution
-        status_counts = db.session.query(
-            Order.work_status, func.count(Order.id)
-        ).filter(Order.user_id == current_user.id).group_by(Order.work_status).all()
-        
-        pie_data = {'Working': 0, 'Ready to Deliver': 0, 'Delivered': 0}
-        for status, count in status_counts:
-            if status in ['Pending', 'Processing']: key = 'Working'
-            elif status == 'Ready': key = 'Ready to Deliver'
-            else: key = status
-            
-            if key in pie_data:
-                pie_data[key] += count
-            else:
-                pie_data.setdefault('Other', 0)
-                pie_data['Other'] += count
-                
-        pie_labels = list(pie_data.keys())
-        pie_values = list(pie_data.values())
-        
-        # Upcoming Deliveries
+        # Urgent Reminders and Upcoming Deliveries, from the precomputed queue
+        reminder_queue.refresh(current_user.id, today)
         next_week = today + timedelta(days=7)
-        upcoming_deliveries_all = Order.query.filter_by(user_id=current_user.id).options(joinedload(Order.customer)).filter(
-            Order.delivery_date > today,
-            Order.delivery_date <= next_week,
-            Order.work_status != 'Delivered'
-        ).order_by(Order.delivery_date.asc()).limit(20).all() 
-        
-        upcoming_deliveries = [o for o in upcoming_deliveries_all if not (o.items and o.items[0].get('name') == "Previous Balance Due")][:5]
+        overdue = reminder_queue.dated(current_user.id, today, types=('delivery',), limit=50, today=today)
+        due_today = reminder_queue.dated(current_user.id, today, types=('trial', 'birthday'), today=today)
+        upcoming_deliveries = [r.order_rel for r in reminder_queue.dated(
+            current_user.id, next_week, types=('delivery',), after=today, limit=5, today=today)]
+
+        urgent_reminders = []
+        for rem in overdue + due_today:
+            if rem.type == 'delivery':
+                date_str = "Today" if rem.due_date == today else f"Overdue ({rem.due_date.strftime('%d-%b')})"
+                urgent_reminders.append({
+                    'title': rem.customer_rel.name,
+                    'desc': f"Delivery {date_str} - Order {rem.order_id}",
+                    'type': 'delivery',
+                    'link': url_for('orders'),
+                    'icon': 'fa-shirt',
+                    'color': 'var(--danger-color)'
+                })
+            elif rem.type == 'trial':
+                urgent_reminders.append({
+                    'title': rem.customer_rel.name,
+                    'desc': f"Trial Today - Order {rem.order_id}",
+                    'type': 'trial',
+                    'link': url_for('orders'),
+                    'icon': 'fa-ruler',
+                    'color': 'var(--warning-color)'
+                })
+            elif rem.type == 'birthday':
+                urgent_reminders.append({
+                    'title': rem.customer_rel.name,
+                    'desc': "Birthday Today",
+                    'type': 'birthday',
+                    'link': url_for('customers'),
+                    'icon': 'fa-cake-candles',
+                    'color': 'var(--primary-color)'
+                })
 
         # Top Customers
         top_customers = db.session.query(
             Customer, func.sum(Order.total_amt).label('total_spend')
         ).join(Order).filter(Customer.user_id == current_user.id).group_by(Customer.id).order_by(text('total_spend DESC')).limit(5).all()
         
-        return render_template('dashboard.html', stats=stats, todays_orders=todays_orders, urgent_reminders=urgent_reminders, upcoming_deliveries=upcoming_deliveries, top_customers=top_customers, active_page='dashboard', chart_labels=chart_labels, chart_values=chart_values, pie_labels=pie_labels, pie_values=pie_values)
+        return render_template('dashboard.html', stats=stats, todays_orders=todays_orders, urgent_reminders=urgent_reminders, upcoming_deliveries=upcoming_deliveries, top_customers=top_customers, active_page='dashboard', chart_labels=stats.chart_labels, chart_values=stats.chart_values, pie_labels=stats.pie_labels, pie_values=stats.pie_values)
 
     @app.route('/customers', methods=['GET', 'POST'])
     @app.route('/customers', methods=['GET', 'POST'])
     @login_required
+    @conditional_page
     def customers():
         if request.method == 'POST':
             # Quick Add / Edit Customer Logic
@@ -617,22 +530,14 @@ def register_routes(app):
                         cust.notes = request.form.get('notes')
                         
                         # Handle Photo Upload (Update)
-                        if 'photo' in request.files:
-                            file = request.files['photo']
-                            if file and file.filename != '':
-                                from werkzeug.utils import secure_filename
-                                import os
-                                
-                                filename = secure_filename(file.filename)
-                                import uuid
-                                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                                
-                                upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'customers')
-                                if not os.path.exists(upload_folder):
-                                    os.makedirs(upload_folder)
-                                    
-                                file.save(os.path.join(upload_folder, unique_filename))
-                                cust.photo = f"uploads/customers/{unique_filename}"
+                        file = request.files.get('photo')
+                        if file and file.filename != '':
+                            try:
+                                cust.photo = uploads.save_image(file, 'customers')
+                            except uploads.UploadError as e:
+                                db.session.rollback()
+                                flash(str(e), 'error')
+                                return redirect(url_for('customers'))
                                 
                         try:
                             db.session.commit()
@@ -657,26 +562,17 @@ def register_routes(app):
                     )
 
                     # Handle Photo Upload
-                    if 'photo' in request.files:
-                        file = request.files['photo']
-                        if file and file.filename != '':
-                            from werkzeug.utils import secure_filename
-                            import os
-                            
-                            filename = secure_filename(file.filename)
-                            # Use a unique name to prevent collisions
-                            import uuid
-                            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                            
-                            upload_folder = os.path.join(app.root_path, 'static', 'uploads', 'customers')
-                            if not os.path.exists(upload_folder):
-                                os.makedirs(upload_folder)
-                                
-                            file.save(os.path.join(upload_folder, unique_filename))
-                            new_cust.photo = f"uploads/customers/{unique_filename}"
+                    file = request.files.get('photo')
+                    if file and file.filename != '':
+                        try:
+                            new_cust.photo = uploads.save_image(file, 'customers')
+                        except uploads.UploadError as e:
+                            flash(str(e), 'error')
+                            return redirect(url_for('customers'))
 
                     db.session.add(new_cust)
                     try:
+                        rollups.record_customer(new_cust)
                         db.session.commit()
                         # Removed auto-redirect to measurements
                         flash('Customer added successfully!', 'success')
@@ -700,52 +596,34 @@ def register_routes(app):
         date_filter = request.args.get('date') # Specific date filter
 
         # Month Filter (Logic: Month Range)
-        try:
-            current_month = int(request.args.get('month', datetime.now().month))
-            current_year = int(request.args.get('year', datetime.now().year))
-        except ValueError:
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-
-        import calendar
-        _, last_day = calendar.monthrange(current_year, current_month)
-        start_date = datetime(current_year, current_month, 1)
-        end_date = datetime(current_year, current_month, last_day, 23, 59, 59)
-
-        # 2. Keyset Params
-        cursor_visit_str = request.args.get('cursor_visit')
-        cursor_id = request.args.get('cursor_id', type=int)
+        current_month, current_year = month_from_args(request.args)
+        start_date, end_date = month_range(current_year, current_month) # half-open [start, end)
+
+        # 2. Keyset Params (opaque cursor over (last_visit, id))
+        cursor = request.args.get('cursor')
         direction = request.args.get('dir', 'next') # next or prev
         limit = 50
-
-        # Parse Cursor Visit
-        cursor_visit = None
-        if cursor_visit_str and cursor_visit_str != 'None':
-             try:
-                 cursor_visit = datetime.fromisoformat(cursor_visit_str)
-             except:
-                 cursor_visit = None
         
         # 3. Build Query (Select only necessary fields)
         # Filter by User FIRST
         query = Customer.query.filter_by(user_id=current_user.id).options(
-            db.load_only(Customer.id, Customer.name, Customer.mobile, Customer.gender, Customer.last_visit, Customer.photo)
+            db.load_only(Customer.id, Customer.name, Customer.mobile, Customer.gender, Customer.last_visit, Customer.photo),
+            db.undefer(Customer.order_count), db.undefer(Customer.total_pending)
         )
 
         # Apply Filters
         if search_query:
-            search = f"%{search_query}%"
-            query = query.filter((Customer.name.ilike(search)) | (Customer.mobile.ilike(search)))
+            query = query.filter(customer_match(search_query))
         
         if gender_filter:
             query = query.filter(Customer.gender == gender_filter)
         
-        if date_filter:
-            from sqlalchemy import func
-            query = query.filter(func.date(Customer.last_visit) == date_filter)
+        filter_day = parse_day(date_filter)
+        if filter_day:
+            query = query.filter(on_day(Customer.last_visit, filter_day))
         else:
             # Default Month filter (only if no specific date selected)
-            query = query.filter(Customer.last_visit >= start_date, Customer.last_visit <= end_date)
+            query = query.filter(in_range(Customer.last_visit, start_date, end_date))
 
         # Optimized Status Filter (EXISTS instead of list of IDs)
         if status_filter:
@@ -756,37 +634,11 @@ def register_routes(app):
                 # Customers with no pending orders
                 query = query.filter(~Customer.orders.any((Order.balance > 0) & (Order.user_id == current_user.id)))
 
-        # 4. Standard Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = 50
-        
-        query = query.order_by(Customer.last_visit.desc(), Customer.id.desc())
-        
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # 4. Keyset Pagination (no OFFSET / COUNT, deep pages cost the same as page 1)
+        pagination = keyset_paginate(query, [Customer.last_visit, Customer.id], cursor, direction, per_page=limit,
+                                     with_total=bool(request.args.get('count'))).with_links('customers')
         customers_list = pagination.items
 
-        # 5. Optimize N+1 (Fetch Stats for these 50)
-        if customers_list:
-            cust_ids = [c.id for c in customers_list]
-            
-            # Count Orders (filtered by user_id)
-            from sqlalchemy import func
-            order_counts = db.session.query(Order.customer_id, func.count(Order.id))\
-                .filter(Order.customer_id.in_(cust_ids), Order.user_id==current_user.id)\
-                .group_by(Order.customer_id).all()
-            count_map = {r[0]: r[1] for r in order_counts}
-            
-            # Sum Balance (filtered by user_id)
-            balance_sums = db.session.query(Order.customer_id, func.sum(Order.balance))\
-                .filter(Order.customer_id.in_(cust_ids), Order.user_id==current_user.id)\
-                .group_by(Order.customer_id).all()
-            balance_map = {r[0]: (r[1] or 0) for r in balance_sums}
-            
-            # Attach to objects
-            for c in customers_list:
-                c.order_count_opt = count_map.get(c.id, 0)
-                c.total_pending_opt = balance_map.get(c.id, 0)
-
         # Navigation Links Logic for Month
         prev_m = current_month - 1
         prev_y = current_year
@@ -802,7 +654,7 @@ def register_routes(app):
             next_y += 1
             
         month_nav = {
-            'current': f"{calendar.month_name[current_month]} {current_year}",
+            'current': month_label(current_year, current_month),
             'prev_url': url_for('customers', month=prev_m, year=prev_y, status=status_filter, gender=gender_filter, q=search_query),
             'next_url': url_for('customers', month=next_m, year=next_y, status=status_filter, gender=gender_filter, q=search_query)
         }
@@ -824,11 +676,27 @@ def register_routes(app):
     @app.route('/api/customer/<int:id>')
     @login_required
     def api_customer_details(id):
-        customer = Customer.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+        from sqlalchemy.orm import selectinload
+        from data_versions import customer_etag
+
+        # Order count and pending balance come back in the same row as the customer
+        customer = Customer.query.filter_by(id=id, user_id=current_user.id)\
+            .options(db.undefer(Customer.order_count), db.undefer(Customer.total_pending)).first_or_404()
+
+        # Any write to the customer, its orders or measurements bumps customer.version
+        etag = customer_etag(customer)
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+
+        # Measurements plus their categories in two queries, however long the history
+        measurements = Measurement.query.filter_by(customer_id=customer.id)\
+            .options(selectinload(Measurement.category)).order_by(Measurement.id).all()
         
         # Serialize Measurements
         measurements_data = []
-        for m in customer.measurements:
+        for m in measurements:
             measurements_data.append({
                 "id": m.id,
                 "category": m.category.name if m.category else "Unknown",
@@ -837,7 +705,7 @@ def register_routes(app):
                 "data": m.measurements_json 
             })
             
-        return jsonify({
+        response = jsonify({
             "id": customer.id,
             "name": customer.name,
             "mobile": customer.mobile,
@@ -845,9 +713,13 @@ def register_routes(app):
             "city": "Ahmedabad", 
             "total_pending": customer.total_pending,
             "measurements": measurements_data,
-            "orders_count": len(customer.orders),
-            "photo": customer.photo
+            "orders_count": customer.order_count,
+            "photo": customer.photo,
+            "photo_thumb": uploads.thumb_url(customer.photo)
         })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     @app.route('/customer/<int:id>/measurement', methods=['GET', 'POST'])
     @login_required
@@ -858,7 +730,7 @@ def register_routes(app):
         # Filter: gender match AND (user_id is None OR user_id is mine)
         # Custom Categories Only: User requested to remove "pre-existing" (System) categories.
         # So we ONLY fetch categories belonging to the current user.
-        categories = Category.query.filter(Category.gender == customer.gender.lower()).filter(Category.user_id == current_user.id).all()
+        categories = [c for c in user_categories(current_user.id).values() if c.gender == customer.gender.lower()]
         
         # Handle Reuse Measurement
         reuse_id = request.args.get('reuse_id')
@@ -869,142 +741,73 @@ def register_routes(app):
                  reuse_measurement = None
 
         if request.method == 'POST':
-            # Save Measurement
-            cat_id = request.form.get('category_id')
-            measurements_data = request.form.get('measurements_json') 
-            remarks = request.form.get('remarks')
-            
-            if cat_id and measurements_data:
-                import json
-                try:
-                    m_json = json.loads(measurements_data)
-                    
-                    # 1. Validation: Check if empty (all values empty)
-                    has_data = any(str(v).strip() for v in m_json.values() if v is not None)
-                    
-                    if has_data:
-                        # 2. Check for Duplicates (Equality with last active measurement)
-                        last_meas = Measurement.query.filter_by(
-                            customer_id=id, 
-                            category_id=cat_id, 
-                            is_active=True,
-                            user_id=current_user.id
-                        ).order_by(Measurement.date.desc()).first()
-
-                        # Only save if different
-                        if not last_meas or last_meas.measurements_json != m_json or (remarks and last_meas.remarks != remarks):
-                            new_meas = Measurement(
-                                customer_id=id,
-                                category_id=cat_id,
-                                measurements_json=m_json,
-                                remarks=remarks,
-                                user_id=current_user.id
-                            )
-                            db.session.add(new_meas)
-                            db.session.flush() # Get ID
-                            app.logger.info(f"Measurement ID {new_meas.id} created/flushed.")
-                        else:
-                             app.logger.info("Duplicate measurement detected. Skipping save.")
-                    else:
-                        app.logger.info("Empty measurement data. Skipping save.")
-                    
-                    # ALWAYS Create Order
-                    start_date_str = request.form.get('start_date')
-                    delivery_date_str = request.form.get('delivery_date')
-                    work_status = request.form.get('order_status') or 'Processing'
-                    order_notes = request.form.get('order_notes')
-                    
-                    total = round(float(request.form.get('total_amt') or 0.0), 2)
-                    advance = round(float(request.form.get('advance') or 0.0), 2)
-                    payment_mode = request.form.get('payment_mode')
-                    
-                    # Determine Payment Status
-                    balance = round(total - advance, 2)
-                    pay_status = 'Pending'
-                    
-                    if total > 0:
-                        if balance <= 0: 
-                            pay_status = 'Paid'
-                        elif advance > 0: 
-                            pay_status = 'Partial'
-                    
-                    from datetime import datetime
-                    
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
-                    delivery_date = datetime.strptime(delivery_date_str, '%Y-%m-%d').date() if delivery_date_str else None
-                    
-                    # Fetch Category Name for Item Description
-                    category = Category.query.get(cat_id)
-                    item_name = category.name if category else "Custom Tailoring"
-
-                    new_order = Order(
-                        customer_id=id,
-                        user_id=current_user.id,
-                        items=[{"name": item_name, "qty": 1}], # Dynamic item name
-                        work_status=work_status,
-                        payment_status=pay_status,
-                        start_date=start_date,
-                        delivery_date=delivery_date,
-                        notes=order_notes,
-                        total_amt=total, 
-                        advance=advance,
-                        balance=total - advance, 
-                        payment_mode=payment_mode,
-                        bill_created_by=request.form.get('created_by') or 'System'
-                    )
-                    
-                    db.session.add(new_order)
-                    db.session.commit()
-                    
-                    
-                    # Log History
-                    # History removed
-                    db.session.commit()
-
-                    flash('Measurement saved and Order created successfully!', 'success')
-                    # Redirect to customers instead of invoice as per user request
-                    return redirect(url_for('customers'))
-
-                except Exception as e:
-                    print(e)
-                    db.session.rollback()
-            
+            # Save Measurement + ALWAYS Create Order (see measurement_service.py)
+            try:
+                garment = parse_garment(request.form, current_user.id)
+                save_garments(customer, current_user.id, [garment])
+            except MeasurementInputError as e:
+                flash(str(e), 'error')
+                return redirect(url_for('measurement', id=customer.id))
+            except Exception as e:
+                app.logger.exception("Measurement save failed")
+                flash(f'Error saving measurement: {str(e)}', 'error')
+                return redirect(url_for('measurement', id=customer.id))
+
+            flash('Measurement saved and Order created successfully!', 'success')
+            # Redirect to customers instead of invoice as per user request
             return redirect(url_for('customers'))
 
         return render_template('measurement.html', customer=customer, categories=categories, active_page='customers', reuse_measurement=reuse_measurement)
 
+    @app.route('/api/customer/<int:id>/measurements', methods=['POST'])
+    @login_required
+    def api_save_measurements(id):
+        """Batch save: {"garments": [{category_id, measurements_json, total_amt, ...}, ...]}, one order each."""
+        customer = Customer.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+        data = request.get_json(silent=True) or {}
+        items = data.get('garments')
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'message': 'garments must be a non-empty list'}), 400
+        if len(items) > MAX_BATCH:
+            return jsonify({'success': False, 'message': f'At most {MAX_BATCH} garments per request'}), 400
+
+        garments, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise MeasurementInputError('Each garment must be an object.')
+                garments.append(parse_garment(item, current_user.id))
+            except MeasurementInputError as e:
+                errors.append({'index': index, 'message': str(e)})
+        if errors:
+            return jsonify({'success': False, 'errors': errors}), 400
+
+        try:
+            saved = save_garments(customer, current_user.id, garments)
+        except Exception as e:
+            app.logger.exception("Batch measurement save failed")
+            return jsonify({'success': False, 'message': str(e)}), 500
+
+        return jsonify({
+            'success': True,
+            'results': [{'measurement_id': m.id if m else None, 'order_id': o.id} for m, o in saved]
+        })
+
     @app.route('/measurements')
     @login_required
+    @conditional_page
     def measurements():
         from sqlalchemy.orm import joinedload
-        from sqlalchemy import tuple_
-        import calendar
 
         # 1. Month Filter (Consistency)
-        try:
-            current_month = int(request.args.get('month', datetime.now().month))
-            current_year = int(request.args.get('year', datetime.now().year))
-        except ValueError:
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            
-        _, last_day = calendar.monthrange(current_year, current_month)
-        start_date = datetime(current_year, current_month, 1)
-        end_date = datetime(current_year, current_month, last_day, 23, 59, 59)
+        current_month, current_year = month_from_args(request.args)
+        start_date, end_date = month_range(current_year, current_month)
 
-        # 2. Keyset Params
-        cursor_date_str = request.args.get('cursor_date')
-        cursor_id = request.args.get('cursor_id', type=int)
+        # 2. Keyset Params (opaque cursor over (date, id))
+        cursor = request.args.get('cursor')
         direction = request.args.get('dir', 'next')
         limit = 50
 
-        cursor_date = None
-        if cursor_date_str and cursor_date_str != 'None':
-             try:
-                 cursor_date = datetime.fromisoformat(cursor_date_str)
-             except:
-                 cursor_date = None
-
         # 3. Build Query
         # Filter by User FIRST
         query = Measurement.query.filter_by(user_id=current_user.id).options(
@@ -1013,14 +816,11 @@ def register_routes(app):
         )
 
         # Filter by Month (Default)
-        query = query.filter(Measurement.date >= start_date, Measurement.date <= end_date)
+        query = query.filter(in_range(Measurement.date, start_date, end_date))
 
-        # 4. Standard Pagination
-        page = request.args.get('page', 1, type=int)
-        
-        query = query.order_by(Measurement.date.desc(), Measurement.id.desc())
-        
-        pagination = query.paginate(page=page, per_page=limit, error_out=False)
+        # 4. Keyset Pagination
+        pagination = keyset_paginate(query, [Measurement.date, Measurement.id], cursor, direction, per_page=limit,
+                                     with_total=bool(request.args.get('count'))).with_links('measurements')
         measurements_list = pagination.items
 
         # Month Navigation Links
@@ -1036,7 +836,7 @@ def register_routes(app):
             next_y += 1
             
         month_nav = {
-            'current': f"{calendar.month_name[current_month]} {current_year}",
+            'current': month_label(current_year, current_month),
             'prev_url': url_for('measurements', month=prev_m, year=prev_y),
             'next_url': url_for('measurements', month=next_m, year=next_y)
         }
@@ -1053,8 +853,8 @@ def register_routes(app):
 
     @app.route('/orders', methods=['GET'])
     @login_required
+    @conditional_page
     def orders():
-        import calendar
         from sqlalchemy import func
 
         # Filters
@@ -1062,20 +862,12 @@ def register_routes(app):
         status_filter = request.args.get('status')
         
         # Month Filter (Logic: One Month One Page)
-        try:
-            current_month = int(request.args.get('month', datetime.now().month))
-            current_year = int(request.args.get('year', datetime.now().year))
-        except ValueError:
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            
-        # Calculate Start and End of the selected month
-        _, last_day = calendar.monthrange(current_year, current_month)
-        start_date = datetime(current_year, current_month, 1)
-        end_date = datetime(current_year, current_month, last_day, 23, 59, 59)
+        current_month, current_year = month_from_args(request.args)
+        start_date, end_date = month_range(current_year, current_month)
         
-        # Base Query scoped to User
-        query = Order.query.filter_by(user_id=current_user.id)
+        # Base Query scoped to User, each row's customer loaded by the same statement
+        query = Order.query.filter_by(user_id=current_user.id)\
+            .join(Order.customer).options(db.contains_eager(Order.customer))
         
         # New: Delivery Date Filter (Overrides month filter)
         delivery_date_param = request.args.get('delivery_date')
@@ -1090,14 +882,13 @@ def register_routes(app):
                     query = query.filter(Order.delivery_date == filter_date)
                 except:
                     # Fallback to month filter if invalid
-                    query = query.filter(Order.created_at >= start_date, Order.created_at <= end_date)
+                    query = query.filter(in_range(Order.created_at, start_date, end_date))
         else:
-             query = query.filter(Order.created_at >= start_date, Order.created_at <= end_date)
+             query = query.filter(in_range(Order.created_at, start_date, end_date))
         
         if search_query:
-            search = f"%{search_query}%"
-            # Join with Customer to search by name/mobile
-            query = query.join(Customer).filter((Customer.name.ilike(search)) | (Customer.mobile.ilike(search)))
+            # Search by customer name/mobile (Customer is already joined)
+            query = query.filter(customer_match(search_query))
             
         if status_filter:
             if status_filter == 'pending':
@@ -1105,10 +896,10 @@ def register_routes(app):
             elif status_filter == 'paid':
                  query = query.filter(Order.balance <= 0)
 
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = 50
-        pagination = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        # Keyset Pagination over (created_at, id)
+        pagination = keyset_paginate(query, [Order.created_at, Order.id], request.args.get('cursor'),
+                                     request.args.get('dir', 'next'), per_page=50,
+                                     with_total=bool(request.args.get('count'))).with_links('orders')
         orders_list = pagination.items
         
         # Navigation Links
@@ -1125,7 +916,7 @@ def register_routes(app):
             next_y += 1
             
         month_nav = {
-            'current': f"{calendar.month_name[current_month]} {current_year}",
+            'current': month_label(current_year, current_month),
             'prev_url': url_for('orders', month=prev_m, year=prev_y, status=status_filter, q=search_query),
             'next_url': url_for('orders', month=next_m, year=next_y, status=status_filter, q=search_query)
         }
@@ -1149,6 +940,7 @@ def register_routes(app):
             
             # Check ownership
             order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
+            before = rollups.snapshot_order(order)
             
             # Update fields
             if status:
@@ -1178,7 +970,9 @@ def register_routes(app):
             else:
                  order.payment_status = 'Pending'
     
+            rollups.record_order_change(order, before)
             db.session.commit()
+            invoices.discard(app, order)
             flash('Order details updated successfully!', 'success')
         except Exception as e:
             db.session.rollback()
@@ -1191,10 +985,12 @@ def register_routes(app):
     def delete_customer(id):
         customer = Customer.query.filter_by(id=id, user_id=current_user.id).first_or_404()
         try:
+            rollups.remove_customer(customer)
+            
             # Delete related records
+            Reminder.query.filter_by(customer_id=id).delete() # before the orders they point at
             Measurement.query.filter_by(customer_id=id).delete() # Cascade technically handles this but ok
             Order.query.filter_by(customer_id=id).delete()
-            Reminder.query.filter_by(customer_id=id).delete()
             
             db.session.delete(customer)
             db.session.commit()
@@ -1210,6 +1006,7 @@ def register_routes(app):
     def delete_order(id):
         order = Order.query.filter_by(id=id, user_id=current_user.id).first_or_404()
         try:
+            rollups.record_order(order, sign=-1)
             db.session.delete(order)
             db.session.commit()
             flash('Order deleted successfully.', 'success')
@@ -1221,9 +1018,9 @@ def register_routes(app):
 
     @app.route('/bills')
     @login_required
+    @conditional_page
     def bills():
         from datetime import datetime
-        import calendar
 
         # Logic for Bills is same as Orders but simplified view
         search_query = request.args.get('q')
@@ -1231,25 +1028,15 @@ def register_routes(app):
         date_filter = request.args.get('date')
         
         # Month Filter (Logic: One Month One Page)
-        try:
-            current_month = int(request.args.get('month', datetime.now().month))
-            current_year = int(request.args.get('year', datetime.now().year))
-        except ValueError:
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            
-        # Calculate Start and End of the selected month
-        _, last_day = calendar.monthrange(current_year, current_month)
-        start_date = datetime(current_year, current_month, 1)
-        end_date = datetime(current_year, current_month, last_day, 23, 59, 59)
+        current_month, current_year = month_from_args(request.args)
+        start_date, end_date = month_range(current_year, current_month)
         
-        from sqlalchemy import func
-        # Filter by User
-        query = Order.query.filter_by(user_id=current_user.id).filter(Order.created_at >= start_date, Order.created_at <= end_date)
+        # Filter by User; each bill's customer comes from the same statement
+        query = Order.query.filter_by(user_id=current_user.id).filter(in_range(Order.created_at, start_date, end_date))\
+            .join(Order.customer).options(db.contains_eager(Order.customer))
         
         if search_query:
-             search = f"%{search_query}%"
-             query = query.join(Customer).filter((Customer.name.ilike(search)) | (Customer.mobile.ilike(search)))
+             query = query.filter(customer_match(search_query))
              
         if status_filter:
             if status_filter == 'pending':
@@ -1257,14 +1044,14 @@ def register_routes(app):
             elif status_filter == 'paid':
                  query = query.filter(Order.balance <= 0)
 
-        if date_filter:
-            from sqlalchemy import func
-            query = query.filter(func.date(Order.created_at) == date_filter)
+        filter_day = parse_day(date_filter)
+        if filter_day:
+            query = query.filter(on_day(Order.created_at, filter_day))
 
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = 50
-        pagination = query.order_by(Order.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        # Keyset Pagination over (created_at, id)
+        pagination = keyset_paginate(query, [Order.created_at, Order.id], request.args.get('cursor'),
+                                     request.args.get('dir', 'next'), per_page=50,
+                                     with_total=bool(request.args.get('count'))).with_links('bills')
         bills_list = pagination.items
         
         # Navigation Links
@@ -1281,9 +1068,10 @@ def register_routes(app):
             next_y += 1
             
         month_nav = {
-            'current': f"{calendar.month_name[current_month]} {current_year}",
+            'current': month_label(current_year, current_month),
             'prev_url': url_for('bills', month=prev_m, year=prev_y, status=status_filter, q=search_query),
-            'next_url': url_for('bills', month=next_m, year=next_y, status=status_filter, q=search_query)
+            'next_url': url_for('bills', month=next_m, year=next_y, status=status_filter, q=search_query),
+            'bulk_url': url_for('bulk_invoices', month=current_month, year=current_year)
         }
 
         return render_template('bills.html', bills=bills_list, pagination=pagination, month_nav=month_nav, active_page='bills')
@@ -1299,6 +1087,7 @@ def register_routes(app):
         
         # Check ownership
         order = Order.query.filter_by(id=order_id, user_id=current_user.id).first_or_404()
+        before = rollups.snapshot_order(order)
         
         order.total_amt = total
         order.advance = advance
@@ -1321,7 +1110,9 @@ def register_routes(app):
 
         order.payment_mode = mode
         
+        rollups.record_order_change(order, before)
         db.session.commit()
+        invoices.discard(app, order)
         return redirect(url_for('bills'))
 
     # --- Additional Features (Reminders, Search, Invoices) ---
@@ -1332,12 +1123,14 @@ def register_routes(app):
             # 1. Clear Database Tables (Scoped to User)
             
             # Delete Reminders
-            db.session.query(Reminder).filter(Reminder.customer.has(user_id=current_user.id)).delete(synchronize_session=False)
+            db.session.query(Reminder).filter_by(user_id=current_user.id).delete(synchronize_session=False)
 
             # Delete Transactional Data
             db.session.query(Order).filter_by(user_id=current_user.id).delete()
             db.session.query(Measurement).filter_by(user_id=current_user.id).delete()
             db.session.query(Customer).filter_by(user_id=current_user.id).delete()
+            rollups.clear_user(current_user.id)
+            data_versions.bump_user(current_user.id) # bulk deletes skip the flush hook
             
             db.session.commit()
             
@@ -1355,53 +1148,57 @@ def register_routes(app):
 
     @app.route('/reminders')
     @login_required
+    @conditional_page
     def reminders():
         from datetime import date, timedelta
         
         today = date.today()
         tomorrow = today + timedelta(days=1)
         
+        # Reads of the precomputed queue (see reminder_queue.py)
+        reminder_queue.refresh(current_user.id, today)
+        
         # 1. Urgent / Overdue Deliveries (Due <= Today AND Not Delivered)
-        urgent_orders = Order.query.filter_by(user_id=current_user.id).filter(
-            Order.delivery_date <= today, 
-            Order.work_status != 'Delivered'
-        ).order_by(Order.delivery_date.asc()).all()
+        urgent_orders = [r.order_rel for r in reminder_queue.dated(current_user.id, today, types=('delivery',), today=today)]
         
         # 2. Upcoming Deliveries (Tomorrow)
-        upcoming_orders = Order.query.filter_by(user_id=current_user.id).filter(
-            Order.delivery_date == tomorrow,
-            Order.work_status != 'Delivered'
-        ).all()
+        upcoming_orders = [r.order_rel for r in reminder_queue.dated(
+            current_user.id, tomorrow, types=('delivery',), after=today, today=today)]
         
         # 3. Pending Payments (Orders with Balance > 0)
-        pending_payments = Order.query.filter_by(user_id=current_user.id).filter(Order.balance > 0).order_by(Order.balance.desc()).limit(10).all()
+        pending_payments = [r.order_rel for r in reminder_queue.payments(current_user.id, limit=10)]
+        
+        # 4. Trials and Birthdays (next 7 days)
+        queued = reminder_queue.dated(current_user.id, today + timedelta(days=reminder_queue.HORIZON_DAYS),
+                                      types=('trial', 'birthday'), today=today)
+        trials = [r for r in queued if r.type == 'trial']
+        birthdays = [r for r in queued if r.type == 'birthday']
         
         return render_template('reminders.html', 
                              urgent_orders=urgent_orders, 
                              upcoming_orders=upcoming_orders,
                              pending_payments=pending_payments,
+                             trials=trials,
+                             birthdays=birthdays,
+                             today=today,
                              active_page='reminders')
         
 
     @app.route('/search')
+    @login_required
     def search():
         query = request.args.get('q', '').strip()
         if not query:
             return redirect(url_for('dashboard'))
+        page = request.args.get('page', 1, type=int)
             
-        # Search Customers (Name or Mobile)
-        customers = Customer.query.filter(
-            (Customer.name.ilike(f'%{query}%')) | 
-            (Customer.mobile.ilike(f'%{query}%'))
-        ).all()
-        
-        # Search Orders
-        if query.isdigit():
-             orders = Order.query.filter(Order.id == int(query)).all()
-        else:
-             orders = Order.query.join(Customer).filter(Customer.name.ilike(f'%{query}%')).all()
+        # Search Customers (Name or Mobile) - ranked, scoped to this shop, one page at a time
+        customers, has_next = search_customers(current_user.id, query, page=page)
+        
+        # Search Orders (first page only)
+        orders = search_orders(current_user.id, query) if page == 1 else []
 
-        return render_template('search_results.html', query=query, customers=customers, orders=orders, active_page='dashboard')
+        return render_template('search_results.html', query=query, customers=customers, orders=orders, page=page, has_next=has_next, active_page='dashboard')
 
     # Helper for Secure Public Links
     def generate_bill_token(order_id):
@@ -1428,8 +1225,7 @@ def register_routes(app):
         order = Order.query.filter_by(id=id, user_id=current_user.id).first_or_404()
         
         # Determine Shop Profile
-        from models import ShopProfile
-        shop = ShopProfile.query.filter_by(user_id=current_user.id).first()
+        shop = get_shop_profile(current_user.id)
         if not shop:
              shop = ShopProfile(user_id=current_user.id) # Should exist by now usually
         
@@ -1446,38 +1242,49 @@ def register_routes(app):
     @app.route('/invoice/<int:id>/download')
     @login_required
     def download_invoice(id):
-        import os
-        from flask import send_file
-        from datetime import datetime
+        from flask import send_file, session
         
         order = Order.query.filter_by(id=id, user_id=current_user.id).first_or_404()
-        from models import ShopProfile
-        shop = ShopProfile.query.filter_by(user_id=current_user.id).first()
+        shop = get_shop_profile(current_user.id)
         if not shop: shop = ShopProfile(user_id=current_user.id)
-        
-        # Render HTML
-        html_content = render_template('invoice.html', order=order, shop=shop, download_mode=True)
-        
-        # 1. Determine Folder Path: saved_bills / user_id / YYYY / Month
-        # ISOLATION: Add user_id to path
-        year_str = order.created_at.strftime('%Y')
-        month_str = order.created_at.strftime('%B') 
-        
-        folder = os.path.join(app.root_path, 'saved_bills', str(current_user.id), year_str, month_str)
-        if not os.path.exists(folder):
-            os.makedirs(folder)
-            
-        # 2. Determine Filename: Customer_Date_ID
-        date_str = order.created_at.strftime('%d-%m-%Y')
-        sanitized_name = order.customer.name.replace(' ', '_').replace('/', '-')
-        filename = f"Bill_{sanitized_name}_{date_str}_{order.id}.html"
-        
-        filepath = os.path.join(folder, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-            
-        return send_file(filepath, as_attachment=True)
+        lang = request.args.get('lang', session.get('lang', 'en'))
+        
+        # Same bill content -> same key: answer revalidation before touching the renderer or disk
+        key = invoices.invoice_key(order, shop, lang, app)
+        if key in request.if_none_match:
+            response = make_response('', 304)
+            response.set_etag(key)
+            return response
+        
+        # Stored under saved_bills / user_id / YYYY / Month, rendered only on a cache miss
+        path, key = invoices.get_or_render(app, order, shop, lang)
+        response = send_file(path, as_attachment=True, etag=key, conditional=True,
+                             download_name=f"{invoices.bill_basename(order)}.{invoices.extension()}")
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    @app.route('/invoices/bulk')
+    @login_required
+    def bulk_invoices():
+        from flask import Response, stream_with_context
+        from datetime import timedelta
+
+        # ?start=&end= (inclusive days) or ?month=&year= (defaults to the current month)
+        start_day = parse_day(request.args.get('start'))
+        end_day = parse_day(request.args.get('end'))
+        if start_day and end_day and start_day <= end_day:
+            from date_ranges import day_start
+            start, end_before = day_start(start_day), day_start(end_day + timedelta(days=1))
+            label = f"{start_day.strftime('%d-%m-%Y')}_to_{end_day.strftime('%d-%m-%Y')}"
+        else:
+            month, year = month_from_args(request.args)
+            start, end_before = month_range(year, month)
+            label = start.strftime('%B_%Y')
+
+        entries = invoices.iter_bills(app, current_user.id, start, end_before)
+        response = Response(stream_with_context(invoices.iter_zip(entries)), mimetype='application/zip')
+        response.headers["Content-Disposition"] = f"attachment; filename=Bills_{label}.zip"
+        return response
 
     @app.route('/invoice/<int:id>/save_pdf_copy', methods=['POST'])
     @login_required
@@ -1526,48 +1333,20 @@ def register_routes(app):
     @app.route('/export_csv')
     @login_required
     def export_csv():
-        import csv
-        import io
-        from flask import make_response
-        
-        # Export Orders Data for Current User
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Headers
-        writer.writerow(['Order ID', 'Date', 'Customer Name', 'Mobile', 'Items', 'Total Amount', 'Advance', 'Balance', 'Status', 'Payment Mode'])
-        
-        orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.created_at.desc()).all()
+        from flask import Response, stream_with_context
+        import exports
         
-        for order in orders:
-            items_str = ", ".join([item.get('name', '') for item in order.items]) if order.items else ""
-            
-            writer.writerow([
-                order.id,
-                order.created_at.strftime('%Y-%m-%d'),
-                order.customer.name,
-                order.customer.mobile,
-                items_str,
-                order.total_amt,
-                order.advance,
-                order.balance,
-                order.work_status,
-                order.payment_status,
-                order.payment_mode
-            ])
-            
-        output.seek(0)
-        
-        response = make_response(output.getvalue())
+        # Export Orders Data for Current User (streamed, constant memory)
+        rows = exports.all_orders_rows(current_user.id)
+        response = Response(stream_with_context(exports.iter_csv(exports.ALL_ORDERS_HEADER, rows)), mimetype='text/csv')
         response.headers["Content-Disposition"] = "attachment; filename=taivex_orders_export.csv"
-        response.headers["Content-type"] = "text/csv"
         return response
 
     @app.route('/settings/export_data', methods=['POST'])
     @login_required
     def export_custom_data():
-        import csv
-        import io
+        from flask import Response, stream_with_context
+        import exports
         from datetime import datetime
         
         start_date_str = request.form.get('start_date')
@@ -1577,49 +1356,72 @@ def register_routes(app):
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            end_date = end_date.replace(hour=23, minute=59, second=59)
-        except ValueError:
+            end_before = end_date + timedelta(days=1) # half-open range, end date inclusive
+        except (TypeError, ValueError):
             flash('Invalid date format.', 'error')
             return redirect(url_for('settings'))
 
-        si = io.StringIO()
-        writer = csv.writer(si)
-        
+        if data_type not in exports.CUSTOM_EXPORTS:
+            flash('Invalid export type.', 'error')
+            return redirect(url_for('settings'))
+
         filename = f"{data_type.capitalize()}_{start_date.strftime('%d-%m-%Y')}_to_{end_date.strftime('%d-%m-%Y')}.csv"
         
-        if data_type == 'orders':
-            orders = Order.query.filter(Order.created_at >= start_date, Order.created_at <= end_date, Order.user_id==current_user.id).all()
-            writer.writerow(['Order ID', 'Customer Name', 'Mobile', 'Items', 'Total Amount', 'Advance', 'Balance', 'Status', 'Date'])
-            for o in orders:
-                items_str = ", ".join([f"{i['name']} (x{i['qty']})" for i in (o.items or [])])
-                writer.writerow([o.id, o.customer.name, o.customer.mobile, items_str, o.total_amt, o.advance, o.balance, o.work_status, o.created_at.strftime('%Y-%m-%d')])
-                
-        elif data_type == 'customers':
-            customers = Customer.query.filter(Customer.created_date >= start_date, Customer.created_date <= end_date, Customer.user_id==current_user.id).all()
-            writer.writerow(['ID', 'Name', 'Mobile', 'City', 'Total Orders', 'Pending Balance', 'Joined Date'])
-            for c in customers:
-                writer.writerow([c.id, c.name, c.mobile, c.city, len(c.orders), c.total_pending, c.created_date.strftime('%Y-%m-%d')])
-
-        elif data_type == 'measurements':
-            measurements = Measurement.query.filter(Measurement.date >= start_date, Measurement.date <= end_date, Measurement.user_id==current_user.id).all()
-            writer.writerow(['ID', 'Customer', 'Mobile', 'Category', 'Date', 'Details'])
-            for m in measurements:
-                details = str(m.measurements_json)
-                writer.writerow([m.id, m.customer.name, m.customer.mobile, m.category.name, m.date.strftime('%Y-%m-%d'), details])
-        
-        elif data_type == 'bills':
-            orders = Order.query.filter(Order.created_at >= start_date, Order.created_at <= end_date, Order.user_id==current_user.id).all()
-            writer.writerow(['Bill No', 'Date', 'Customer', 'Mobile', 'Total Amount', 'Received', 'Balance', 'Payment Mode'])
-            for o in orders:
-                writer.writerow([o.id, o.created_at.strftime('%d-%m-%Y'), o.customer.name, o.customer.mobile, o.total_amt, o.advance, o.balance, o.payment_mode])
-
-        csv_content = si.getvalue()
-        
-        output = make_response(csv_content)
+        header, row_fn = exports.CUSTOM_EXPORTS[data_type]
+        rows = row_fn(current_user.id, start_date, end_before)
+        
+        output = Response(stream_with_context(exports.iter_csv(header, rows)), mimetype='text/csv')
         output.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        output.headers["Content-type"] = "text/csv"
         return output
 
+    @app.route('/settings/export_jobs', methods=['POST'])
+    @login_required
+    def submit_export_job():
+        import exports
+        import export_jobs
+        from date_ranges import parse_day
+
+        start_date = parse_day(request.form.get('start_date'))
+        end_date = parse_day(request.form.get('end_date'))
+        data_type = request.form.get('data_type')
+
+        if not start_date or not end_date or end_date < start_date:
+            flash('Invalid date format.', 'error')
+            return redirect(url_for('settings'))
+        if data_type not in exports.CUSTOM_EXPORTS:
+            flash('Invalid export type.', 'error')
+            return redirect(url_for('settings'))
+
+        job = export_jobs.create_job(app, current_user.id, data_type, start_date, end_date)
+        if app.config.get('EXPORT_WORKERS', 2) > 0:
+            export_jobs.enqueue(app, job.id)
+        flash('Export started. It will appear under Recent Exports when ready.', 'success')
+        return redirect(url_for('settings'))
+
+    @app.route('/settings/export_jobs/<int:job_id>')
+    @login_required
+    def export_job_status(job_id):
+        import export_jobs
+        from models import ExportJob
+        job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+        export_jobs.recover(app, job)
+        data = export_jobs.job_status(job)
+        if job.status == 'Done':
+            data['download_url'] = url_for('download_export_job', job_id=job.id)
+        return jsonify(data)
+
+    @app.route('/settings/export_jobs/<int:job_id>/download')
+    @login_required
+    def download_export_job(job_id):
+        from flask import send_file, abort
+        from models import ExportJob
+        job = ExportJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+        if job.status != 'Done' or not job.file_path or not os.path.exists(job.file_path):
+            abort(404)
+        # conditional=True answers Range / If-Range requests, so interrupted downloads resume
+        return send_file(job.file_path, mimetype='application/gzip', as_attachment=True,
+                         download_name=job.filename, conditional=True)
+
     # Duplicate get_customer_details removed
     
     @app.route('/delete/measurement/<int:id>', methods=['POST'])
@@ -0,0 +1,137 @@
+"""
+Customer search by name or mobile number, behind the customers / orders /
+bills search boxes and /search.
+
+Mobile numbers are matched as a substring of the digits-only
+Customer.mobile_digits (normalize_mobile), so the last digits of a number
+find the customer as they did with the old ILIKE on Customer.mobile. A
+leading country code or trunk 0 in the query is dropped the way the stored
+numbers drop it, so '+91 987' matches stored '987...' numbers.
+
+Names are matched per backend:
+    trgm / like  substring (ILIKE '%q%'), as before
+    fts5         word prefixes: 'pat' finds 'Ram Patel', 'tel' does not.
+                 Infix matches are traded for the FTS5 index.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import text, func, or_, false, select, table, column, literal_column
+
+from models import db, Customer, Order, normalize_mobile
+
+# Backend chosen at startup by detect_search_backend():
+#   'trgm'  - Postgres, ILIKE served by pg_trgm GIN index
+#   'fts5'  - SQLite, customer_fts external content table kept in sync by triggers
+#   'like'  - anything else, plain ILIKE
+EXTENSION_KEY = 'search_backend'
+
+MIN_MOBILE_DIGITS = 3
+PHONE_LIKE_RE = re.compile(r'[\d\s+\-()]+')
+COUNTRY_CODE = '91'
+
+_customer_fts = table('customer_fts', column('rowid'))
+
+def detect_search_backend(app):
+    """Picks the backend from the search indexes the migrations created (5b8e1f0c3d27). Call once at startup."""
+    backend = 'like'
+    with db.engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == 'sqlite':
+            found = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'customer_fts'")).first()
+            backend = 'fts5' if found else 'like'
+        elif dialect == 'postgresql':
+            found = conn.execute(text("SELECT 1 FROM pg_indexes WHERE indexname = 'ix_customer_name_trgm'")).first()
+            backend = 'trgm' if found else 'like'
+        if backend == 'like' and dialect in ('sqlite', 'postgresql'):
+            print("Customer search index missing, using ILIKE: run `flask --app app db upgrade` to create it.")
+    app.extensions[EXTENSION_KEY] = backend
+    return backend
+
+
+def _backend():
+    return current_app.extensions.get(EXTENSION_KEY, 'like')
+
+
+def _fts_query(q):
+    """Turns free text into an FTS5 prefix query: 'ram pat' -> '"ram"* "pat"*'."""
+    tokens = re.findall(r'\w+', q, flags=re.UNICODE)
+    return ' '.join(f'"{tok}"*' for tok in tokens)
+
+
+def mobile_query_digits(q):
+    """
+    Digits of a (possibly partial) mobile number typed in a search box, in the
+    form normalize_mobile() stores: no '+91' / '0091' country code, no trunk 0.
+    """
+    digits = re.sub(r'\D', '', q)
+    if q.lstrip().startswith('+') and digits.startswith(COUNTRY_CODE):
+        digits = digits[len(COUNTRY_CODE):]
+    elif digits.startswith('00' + COUNTRY_CODE):
+        digits = digits[2 + len(COUNTRY_CODE):]
+    elif digits.startswith('0'):
+        digits = digits.lstrip('0')
+    return normalize_mobile(digits)
+
+
+def _mobile_match(digits):
+    """Substring of the digits-only column (pg_trgm indexed on Postgres, a per-shop scan elsewhere)."""
+    return Customer.mobile_digits.contains(digits)
+
+
+def customer_match(q):
+    """
+    SQL predicate matching customers by name or mobile number for `q`.
+    Usable in any Customer query (also via a join from Order).
+    """
+    q = (q or '').strip()
+    if not q:
+        return false()
+
+    clauses = []
+    if PHONE_LIKE_RE.fullmatch(q):
+        digits = mobile_query_digits(q)
+        if len(digits) >= MIN_MOBILE_DIGITS:
+            clauses.append(_mobile_match(digits))
+
+    backend = _backend()
+    if backend == 'fts5':
+        fts_q = _fts_query(q)
+        if fts_q:
+            clauses.append(Customer.id.in_(
+                select(_customer_fts.c.rowid).where(literal_column('customer_fts').op('MATCH')(fts_q))
+            ))
+    else:
+        # On Postgres this ILIKE is answered by the pg_trgm GIN index
+        clauses.append(Customer.name.ilike(f'%{q}%'))
+
+    return or_(*clauses) if clauses else false()
+
+
+def _rank(q):
+    if _backend() == 'trgm':
+        return func.similarity(Customer.name, q).desc()
+    # Exact/prefix name hits first, then the most recently seen customers
+    return func.lower(Customer.name).like(f'{q.lower()}%').desc()
+
+
+def search_customers(user_id, q, page=1, per_page=20):
+    """Ranked, bounded customer search scoped to one shop. Returns (customers, has_next)."""
+    page = max(page, 1)
+    rows = Customer.query.filter(Customer.user_id == user_id, customer_match(q))\
+        .order_by(_rank(q), Customer.last_visit.desc(), Customer.id.desc())\
+        .offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+def search_orders(user_id, q, limit=20):
+    """Orders by exact id (numeric query) or by matching customer, newest first."""
+    q = (q or '').strip()
+    query = Order.query.filter(Order.user_id == user_id)
+    if q.isdigit():
+        by_id = query.filter(Order.id == int(q)).all()
+        if by_id:
+            return by_id
+    return query.join(Customer, Order.customer_id == Customer.id)\
+        .filter(customer_match(q))\
+        .order_by(Order.created_at.desc()).limit(limit).all()
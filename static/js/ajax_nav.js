@@ -107,7 +107,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // Main Update Function
     async function fetchAndUpdate(url, pushState = true) {
         // 1. Check Cache (Instant Load)
-        const cachedDoc = pageCache.get(url);
+        const cached = pageCache.get(url);
+        const cachedDoc = cached && cached.doc;
         if (cachedDoc) {
             updateContent(cachedDoc, url);
             if (pushState) window.history.pushState({}, '', url);
@@ -118,12 +119,17 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         try {
-            const response = await fetch(url, {
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
-                }
-            });
+            // List pages answer X-Partial with just the .content-wrapper markup
+            const headers = {
+                'X-Requested-With': 'XMLHttpRequest',
+                'X-Partial': 'content'
+            };
+            // Revalidate: 304 means the cached copy shown above is still current
+            if (cached && cached.etag) headers['If-None-Match'] = cached.etag;
+
+            const response = await fetch(url, { headers: headers, cache: 'no-store' });
 
+            if (response.status === 304) return;
             if (!response.ok) throw new Error('Network response was not ok');
 
             const html = await response.text();
@@ -133,7 +139,7 @@ document.addEventListener('DOMContentLoaded', () => {
             const doc = parser.parseFromString(html, 'text/html');
 
             // Save to Cache
-            pageCache.set(url, doc);
+            pageCache.set(url, { doc: doc, etag: response.headers.get('ETag') });
 
             // Update DOM (if new data differs)
             updateContent(doc, url);
@@ -78,7 +78,7 @@ function openProfile(id) {
 
                 if (imgEl && placeholderEl) {
                     if (data.photo) {
-                        imgEl.src = "/static/" + data.photo;
+                        imgEl.src = data.photo_thumb || ("/static/" + data.photo);
                         imgEl.style.display = 'block';
                         placeholderEl.style.display = 'none';
                     } else {
@@ -363,7 +363,7 @@ function editCurrentCustomer() {
     const preview = document.getElementById('imagePreview');
     if (preview) {
         if (data.photo) {
-            preview.style.backgroundImage = 'url(/static/' + data.photo + ')';
+            preview.style.backgroundImage = 'url(' + (data.photo_thumb || '/static/' + data.photo) + ')';
             preview.style.backgroundSize = 'cover';
             preview.innerHTML = '';
         } else {
@@ -407,13 +407,3 @@ function openManageOrder(btn) {
     openManageModal(d.id, d.status, d.total, d.advance, d.mode, d.start, d.delivery, d.creator, d.customer, d.items);
 }
 
-function navigateToPage(input) {
-    const d = input.dataset;
-    let url = `${d.baseUrl}?page=${input.value}`;
-    if (d.month) url += `&month=${d.month}`;
-    if (d.year) url += `&year=${d.year}`;
-    if (d.q) url += `&q=${d.q}`;
-    if (d.status) url += `&status=${d.status}`;
-    if (d.deliveryDate) url += `&delivery_date=${d.deliveryDate}`; // dash-case to camelCase
-    window.location.href = url;
-}
@@ -1,11 +1,6 @@
-const CACHE_NAME = 'talvex-v2';
-const ASSETS_TO_CACHE = [
-    '/',
-    '/static/css/style.css',
-    '/static/js/custom_scripts.js',
-    '/static/js/ajax_nav.js',
-    '/static/manifest.json'
-];
+// Generated by assets.service_worker() from static/dist/assets.json (flask build-assets)
+const CACHE_NAME = {{ cache_name|tojson }};
+const ASSETS_TO_CACHE = {{ precache|tojson }};
 
 // Install Event - Cache Static Assets
 self.addEventListener('install', (event) => {
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads the environment at import time
+_workdir = tempfile.mkdtemp(prefix='talvex-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['REMINDER_SCHEDULER'] = '0'
+os.environ['OUTBOX_SENDER'] = '0'
+os.environ['EXPORT_WORKERS'] = '0'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app()
+    # https: Talisman redirects plain http requests
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, RATELIMIT_ENABLED=False, PREFERRED_URL_SCHEME='https')
+    return app
+
+
+@pytest.fixture
+def db(app):
+    """Database session inside an app context; rows written by a test are deleted afterwards."""
+    from models import db
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+
+
+@pytest.fixture
+def user(db):
+    from models import User
+    user = User(username='Test Shop', email='shop@example.com', is_verified=True)
+    user.set_password('secret')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    """Test client logged in as `user`."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return session.get('_flashes', [])
+
+
+@pytest.fixture
+def category(db, user):
+    from models import Category
+    category = Category(name='Shirt', gender='male', fields_json=['Length', 'Chest'], user_id=user.id)
+    db.session.add(category)
+    db.session.commit()
+    return category
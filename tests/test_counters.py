@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+
+import pytest
+from limits.storage import storage_from_string
+
+import counters
+
+
+class Clock:
+    """Stands in for time.time() inside counters.py."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(counters.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return storage_from_string(f"sqlite:///{tmp_path / 'counters.db'}")
+
+
+def test_sqlite_scheme_is_registered(storage):
+    assert isinstance(storage, counters.SQLiteStorage)
+    assert storage.check()
+
+
+def test_storage_contract(storage, clock):
+    assert storage.get('k') == 0
+    assert storage.get_expiry('k') == clock.now # no window: expires now
+    assert storage.incr('k', 60) == 1
+    assert storage.incr('k', 60, amount=2) == 3
+    assert storage.get('k') == 3
+    assert storage.get_expiry('k') == clock.now + 60
+
+    # The window is fixed: later increments do not extend it
+    clock.now += 30
+    assert storage.incr('k', 60) == 4
+    assert storage.get_expiry('k') == clock.now + 30
+
+    storage.clear('k')
+    assert storage.get('k') == 0
+    storage.incr('a', 60)
+    storage.incr('b', 60)
+    assert storage.reset() == 2
+    assert storage.get('a') == storage.get('b') == 0
+
+
+def test_window_expiry_starts_a_new_window(storage, clock):
+    storage.incr('k', 60, amount=5)
+    clock.now += 60
+    assert storage.get('k') == 0
+    assert storage.incr('k', 60) == 1
+    assert storage.get_expiry('k') == clock.now + 60
+
+
+def test_workers_share_counters(tmp_path, clock):
+    uri = f"sqlite:///{tmp_path / 'counters.db'}"
+    first, second = storage_from_string(uri), storage_from_string(uri)
+    first.incr('k', 60)
+    assert second.incr('k', 60) == 2
+    assert first.get('k') == 2
+
+
+def test_lockout_threshold_and_expiry(storage, clock):
+    lockout = counters.LoginLockout(storage, threshold=3, lock_seconds=600)
+    assert not lockout.record_failure(7)
+    assert not lockout.record_failure(7)
+    assert lockout.locked_for(7) == 0
+    assert lockout.record_failure(7) # third failure locks
+    assert lockout.locked_for(7) == 600
+    assert lockout.locked_for(8) == 0 # per account
+
+    clock.now += 599
+    assert lockout.locked_for(7) == 1
+    clock.now += 1
+    assert lockout.locked_for(7) == 0
+    # The failure count restarted with the lock
+    assert not lockout.record_failure(7)
+
+
+def test_failures_outside_the_window_do_not_add_up(storage, clock):
+    lockout = counters.LoginLockout(storage, threshold=3, lock_seconds=600)
+    lockout.record_failure(7)
+    lockout.record_failure(7)
+    clock.now += 600
+    assert not lockout.record_failure(7)
+    assert lockout.locked_for(7) == 0
+
+
+def test_reset_clears_failures(storage, clock):
+    lockout = counters.LoginLockout(storage, threshold=3, lock_seconds=600)
+    lockout.record_failure(7)
+    lockout.record_failure(7)
+    lockout.reset(7)
+    assert not lockout.record_failure(7)
+    assert not lockout.record_failure(7)
+
+
+# --- /login ---
+
+@pytest.fixture
+def login(app, db, user, monkeypatch):
+    """Posts to /login as a logged out browser; the per-minute rate limit is off."""
+    from app import limiter
+    monkeypatch.setattr(limiter, 'enabled', False)
+    app.extensions['login_lockout'].storage.reset()
+    browser = app.test_client()
+
+    def post(password):
+        """Returns (logged in, page shown after the attempt)."""
+        page = browser.post('/login', data={'email': user.email, 'password': password},
+                            follow_redirects=True).get_data(as_text=True)
+        with browser.session_transaction() as session:
+            logged_in = session.pop('auth_user_id', None) is not None
+        return logged_in, page
+    return post
+
+
+def test_login_locks_after_threshold(app, login):
+    threshold = app.extensions['login_lockout'].threshold
+    for _ in range(threshold - 1):
+        logged_in, page = login('wrong')
+        assert not logged_in and 'Invalid email or password.' in page
+    logged_in, page = login('wrong')
+    assert not logged_in and 'Too many failed attempts' in page
+
+    # Even the right password is refused while locked
+    logged_in, page = login('secret')
+    assert not logged_in and 'Account locked' in page
+
+
+def test_successful_login_resets_failures(app, login):
+    threshold = app.extensions['login_lockout'].threshold
+    for _ in range(threshold - 1):
+        login('wrong')
+    assert login('secret')[0]
+    for _ in range(threshold - 1):
+        logged_in, page = login('wrong')
+        assert not logged_in and 'Invalid email or password.' in page
+
+
+def test_legacy_locked_until_is_honoured(login, db, user):
+    user.locked_until = datetime.utcnow() + timedelta(hours=1)
+    db.session.commit()
+    logged_in, page = login('secret')
+    assert not logged_in and 'Account locked' in page
+
+    user.locked_until = datetime.utcnow() - timedelta(minutes=1)
+    db.session.commit()
+    assert login('secret')[0]
@@ -0,0 +1,106 @@
+import pytest
+from flask import g
+
+import data_versions
+
+
+def _version(db, user_id):
+    from models import User
+    db.session.expire_all()
+    return db.session.get(User, user_id).data_version
+
+
+def _get(client, url, **headers):
+    # Requests share the db fixture's app context, so g outlives them; a real request starts with a fresh g
+    g.pop('data_version', None)
+    return client.get(url, headers={name.replace('_', '-'): value for name, value in headers.items()})
+
+
+@pytest.fixture
+def customer(db, user):
+    from models import Customer
+    customer = Customer(user_id=user.id, name='Ram Patel', mobile='9876543210')
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def test_etag_round_trip(client):
+    first = _get(client, '/customers')
+    assert first.status_code == 200
+    etag, weak = first.get_etag()
+    assert etag and weak
+    assert 'X-Partial' in first.vary
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = _get(client, '/customers', If_None_Match=first.headers['ETag'])
+    assert again.status_code == 304 and again.data == b''
+    assert again.get_etag() == (etag, True)
+
+    # Another page, or other arguments, is another validator
+    assert _get(client, '/orders', If_None_Match=first.headers['ETag']).status_code == 200
+    assert _get(client, '/customers?page=2', If_None_Match=first.headers['ETag']).status_code == 200
+
+
+def test_write_invalidates(client, db, user, customer):
+    etag = _get(client, '/customers').headers['ETag']
+    client.post('/customers', data={'name': 'Sita', 'mobile': '9123456789', 'gender': 'female'})
+    assert _get(client, '/customers', If_None_Match=etag).status_code == 200 # shows the flash
+    response = _get(client, '/customers', If_None_Match=etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    # A write that only touches an order changes the shop's pages too
+    etag = response.headers['ETag']
+    from models import Order
+    db.session.add(Order(user_id=user.id, customer_id=customer.id, items=[], total_amt=0.0))
+    db.session.commit()
+    assert _get(client, '/customers', If_None_Match=etag).status_code == 200
+
+
+def test_x_partial_is_a_separate_variant(client):
+    full = _get(client, '/customers').headers['ETag']
+    partial = _get(client, '/customers', X_Partial='1')
+    assert partial.status_code == 200 and partial.headers['ETag'] != full
+    assert _get(client, '/customers', X_Partial='1', If_None_Match=full).status_code == 200
+    assert _get(client, '/customers', X_Partial='1', If_None_Match=partial.headers['ETag']) \
+        .status_code == 304
+
+
+def test_pending_flash_skips_the_etag(client):
+    etag = _get(client, '/customers').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Customer added')]
+    response = _get(client, '/customers', If_None_Match=etag)
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert b'Customer added' in response.data
+
+
+def test_one_bump_per_transaction(db, user, customer, category):
+    from models import Measurement, Order
+    before = _version(db, user.id)
+    customer_version = customer.version
+    for amount in (100.0, 200.0, 300.0):
+        db.session.add(Order(user_id=user.id, customer_id=customer.id, items=[], total_amt=amount))
+        db.session.flush()
+    db.session.add(Measurement(user_id=user.id, customer_id=customer.id, category_id=category.id, measurements_json={}))
+    db.session.commit()
+    assert _version(db, user.id) == before + 1
+    assert customer.version == customer_version + 1
+
+    # Rolled back writes bump nothing, and are not carried into the next commit
+    db.session.add(Order(user_id=user.id, customer_id=customer.id, items=[], total_amt=1.0))
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert _version(db, user.id) == before + 1
+
+
+def test_bump_user_for_bulk_writes(db, user):
+    before = _version(db, user.id)
+    data_versions.bump_user(user.id)
+    data_versions.bump_user(user.id)
+    assert _version(db, user.id) == before # applied with the commit
+    db.session.commit()
+    assert _version(db, user.id) == before + 1
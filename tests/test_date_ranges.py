@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from date_ranges import month_from_args, month_label, month_range
+
+TODAY = datetime(2024, 3, 15)
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({}, (3, 2024)),
+    ({'month': '12', 'year': '2023'}, (12, 2023)),
+    ({'month': '11', 'year': '9999'}, (11, 9999)),
+    ({'month': '12', 'year': '9999'}, (3, 2024)), # no month after it
+    ({'month': '13', 'year': '2024'}, (3, 2024)),
+    ({'month': '0', 'year': '2024'}, (3, 2024)),
+    ({'month': '1', 'year': '0'}, (3, 2024)),
+    ({'month': 'x', 'year': '2024'}, (3, 2024)),
+])
+def test_month_from_args(args, expected):
+    assert month_from_args(args, today=TODAY) == expected
+
+
+def test_every_accepted_month_has_a_range():
+    month, year = month_from_args({'month': '11', 'year': '9999'}, today=TODAY)
+    start, end = month_range(year, month)
+    assert (start, end) == (datetime(9999, 11, 1), datetime(9999, 12, 1))
+
+
+def test_month_label():
+    assert month_label(2024, 3) == 'March 2024'
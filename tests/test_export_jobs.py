@@ -0,0 +1,83 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import export_jobs
+
+
+@pytest.fixture
+def exports_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_jobs, 'export_dir', lambda app, user_id: str(tmp_path / str(user_id)))
+    return tmp_path
+
+
+def _job(db, user, **kwargs):
+    from models import ExportJob
+    job = ExportJob(user_id=user.id, data_type='customers', start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+                    **kwargs)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def _get(db, job_id):
+    from models import ExportJob
+    db.session.expire_all()
+    return db.session.get(ExportJob, job_id)
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, app, job_id):
+        self.submitted.append(job_id)
+
+
+def test_enqueue_skips_jobs_already_in_flight(app, monkeypatch):
+    executor = FakeExecutor()
+    monkeypatch.setattr(export_jobs, '_get_executor', lambda app: executor)
+    monkeypatch.setattr(export_jobs, '_in_flight', set())
+    for _ in range(3):
+        export_jobs.enqueue(app, 7) # a status poll every 3 seconds while the pool is busy
+    assert executor.submitted == [7]
+
+
+def test_run_job_writes_file(app, db, user, exports_dir):
+    job_id = _job(db, user)
+    export_jobs.run_job(app, job_id)
+    job = _get(db, job_id)
+    assert (job.status, job.attempts, job.lease_until) == ('Done', 1, None)
+    assert os.path.exists(job.file_path)
+
+
+def test_lost_lease_cannot_overwrite_the_takeover(app, db, user, exports_dir):
+    job_id = _job(db, user)
+    first = export_jobs._claim(job_id)
+    # The first worker stalls past its lease; another takes the job over and finishes it
+    _get(db, job_id).lease_until = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    export_jobs.run_job(app, job_id)
+    done = _get(db, job_id)
+    assert (done.status, done.attempts) == ('Done', first + 1)
+
+    # The stalled worker's outcome is dropped
+    assert not export_jobs._finish(job_id, first, status='Failed', error='late')
+    job = _get(db, job_id)
+    assert (job.status, job.file_path, job.error) == ('Done', done.file_path, None)
+
+
+def test_purge_deletes_old_jobs_and_files(app, db, user, exports_dir):
+    old = _job(db, user)
+    export_jobs.run_job(app, old)
+    path = _get(db, old).file_path
+    _get(db, old).created_at = datetime.utcnow() - timedelta(days=app.config['EXPORT_RETENTION_DAYS'] + 1)
+    recent = _job(db, user, status='Done')
+    pending = _job(db, user, created_at=datetime.utcnow() - timedelta(days=30))
+    db.session.commit()
+
+    assert export_jobs.purge(app) == 1
+    assert not os.path.exists(path)
+    assert _get(db, old) is None
+    assert _get(db, recent) is not None and _get(db, pending) is not None
@@ -0,0 +1,100 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import invoices
+from models import Customer, Order, ShopProfile
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', invoices.TEMPLATE_NAME)
+
+
+def _bill():
+    customer = Customer(id=7, name='Ram Patel', mobile='9876543210', city='Surat')
+    order = Order(id=42, user_id=1, customer=customer, items=[{'name': 'Shirt', 'qty': 1, 'cost': 650}],
+                  total_amt=650.0, advance=300.0, balance=350.0, bill_created_by='Owner',
+                  work_status='Working', created_at=datetime(2024, 3, 1, 10, 30))
+    shop = ShopProfile(shop_name='Talvex Tailors', address='1 Market Road', mobile='9800000000',
+                       gst_no='24ABCDE1234F1Z5', logo='uploads/logo.png', upi_id='shop@upi',
+                       terms='No refunds after stitching.')
+    return order, customer, shop
+
+
+def _rendered_fields():
+    """('shop' | 'order' | 'customer', attribute) for every field invoice.html prints."""
+    with open(TEMPLATE, encoding='utf-8') as f:
+        source = f.read()
+    fields = set()
+    for expression in re.findall(r'{[{%](.*?)[}%]}', source, flags=re.S):
+        for path in re.findall(r'\b(order\.customer|order|shop)\.(\w+)', expression):
+            owner, attribute = path
+            if (owner, attribute) != ('order', 'customer'):
+                fields.add(('customer' if owner == 'order.customer' else owner, attribute))
+    return sorted(fields)
+
+
+def _changed(value):
+    if isinstance(value, bool) or value is None:
+        return 'changed'
+    if isinstance(value, (int, float)):
+        return value + 1
+    if isinstance(value, datetime):
+        return value + timedelta(days=1)
+    if isinstance(value, list):
+        return value + [{'name': 'Pant', 'qty': 2, 'cost': 750}]
+    return value + ' (edited)'
+
+
+def test_template_fields_are_found():
+    fields = _rendered_fields()
+    assert ('shop', 'terms') in fields
+    assert ('customer', 'name') in fields
+    assert ('order', 'total_amt') in fields
+
+
+@pytest.mark.parametrize('owner, attribute', _rendered_fields())
+def test_every_rendered_field_changes_the_key(app, owner, attribute):
+    order, customer, shop = _bill()
+    with app.app_context():
+        before = invoices.invoice_key(order, shop, 'en', app)
+        target = {'order': order, 'customer': customer, 'shop': shop}[owner]
+        if (owner, attribute) == ('order', 'work_status'):
+            target.work_status = 'Delivered' # the template only tests for Ready / Delivered
+        else:
+            setattr(target, attribute, _changed(getattr(target, attribute)))
+        assert invoices.invoice_key(order, shop, 'en', app) != before
+
+
+def test_language_changes_the_key(app):
+    order, _, shop = _bill()
+    with app.app_context():
+        assert invoices.invoice_key(order, shop, 'en', app) != invoices.invoice_key(order, shop, 'gu', app)
+
+
+def test_unchanged_bill_keeps_its_key(app):
+    with app.app_context():
+        first, _, first_shop = _bill()
+        second, _, second_shop = _bill()
+        assert invoices.invoice_key(first, first_shop, 'en', app) == invoices.invoice_key(second, second_shop, 'en', app)
+
+
+def test_translation_update_changes_the_key(app, tmp_path, monkeypatch):
+    from i18n import TranslationCatalog, read_catalog, write_language
+    source = os.path.join(os.path.dirname(TEMPLATE), os.pardir, 'translations')
+    for lang, entries in read_catalog(source).items():
+        write_language(str(tmp_path), lang, entries)
+    order, _, shop = _bill()
+    with app.app_context():
+        monkeypatch.setitem(app.extensions, 'i18n', TranslationCatalog.load(str(tmp_path)))
+        before = {lang: invoices.invoice_key(order, shop, lang, app) for lang in ('en', 'hi', 'gu')}
+
+        # `flask translate-missing --lang hi` adds a text, then the workers restart
+        hindi = read_catalog(str(tmp_path))['hi']
+        hindi['Balance'] = hindi.get('Balance', 'Balance') + ' (बाकी)'
+        write_language(str(tmp_path), 'hi', hindi)
+        monkeypatch.setitem(app.extensions, 'i18n', TranslationCatalog.load(str(tmp_path)))
+        after = {lang: invoices.invoice_key(order, shop, lang, app) for lang in ('en', 'hi', 'gu')}
+
+    assert after['hi'] != before['hi']
+    assert (after['en'], after['gu']) == (before['en'], before['gu'])
@@ -0,0 +1,144 @@
+import pytest
+
+import measurement_service
+import rollups
+from measurement_service import MAX_BATCH
+
+
+@pytest.fixture
+def customer(db, user):
+    from models import Customer
+    customer = Customer(user_id=user.id, name='Ram Patel', mobile='9876543210')
+    db.session.add(customer)
+    db.session.commit()
+    return customer
+
+
+def _garment(category, **kwargs):
+    data = {'category_id': category.id, 'measurements_json': {'Length': '30'}, 'total_amt': 1000, 'advance': 400}
+    data.update(kwargs)
+    return data
+
+
+def _post(client, customer, garments):
+    return client.post(f'/api/customer/{customer.id}/measurements', json={'garments': garments})
+
+
+def _counts(db):
+    from models import Measurement, Order
+    db.session.expire_all()
+    return Measurement.query.count(), Order.query.count()
+
+
+def test_batch_saves_one_order_per_garment(db, client, customer, category):
+    from models import Order
+    response = _post(client, customer, [
+        _garment(category, delivery_date='2024-04-01'),
+        _garment(category, measurements_json={'Length': '31'}, total_amt='500.5', advance=''),
+    ])
+    assert response.status_code == 200, response.json
+    results = response.json['results']
+    assert all(r['measurement_id'] and r['order_id'] for r in results)
+    orders = [db.session.get(Order, r['order_id']) for r in results]
+    assert [(o.total_amt, o.advance, o.balance, o.payment_status) for o in orders] == \
+        [(1000.0, 400.0, 600.0, 'Partial'), (500.5, 0.0, 500.5, 'Pending')]
+    assert str(orders[0].delivery_date) == '2024-04-01'
+
+
+def test_repeated_measurement_is_skipped_but_ordered(db, client, customer, category):
+    response = _post(client, customer, [_garment(category), _garment(category), _garment(category, remarks='Loose')])
+    assert response.status_code == 200
+    ids = [r['measurement_id'] for r in response.json['results']]
+    assert ids[0] and ids[1] is None and ids[2] # a new remark is a new measurement
+    assert _counts(db) == (2, 3)
+
+    # Also against what is already stored
+    response = _post(client, customer, [_garment(category, remarks='Loose')])
+    assert response.json['results'][0]['measurement_id'] is None
+    assert _counts(db) == (2, 4)
+
+
+@pytest.mark.parametrize('changes, message', [
+    ({'category_id': None}, 'Please choose a category.'),
+    ({'category_id': 'abc'}, 'Please choose a category.'),
+    ({'category_id': 999999}, 'Unknown category.'),
+    ({'measurements_json': '{not json'}, 'Measurements could not be read.'),
+    ({'measurements_json': ['30']}, 'Measurements could not be read.'),
+    ({'total_amt': 'ten'}, 'Total amount must be a number.'),
+    ({'total_amt': -1}, 'Total amount cannot be negative.'),
+    ({'advance': [100]}, 'Advance must be a number.'),
+    ({'advance': '-0.5'}, 'Advance cannot be negative.'),
+    ({'delivery_date': '01/04/2024'}, 'Delivery date must be a date (YYYY-MM-DD).'),
+    ({'start_date': '2024-02-30'}, 'Start date must be a date (YYYY-MM-DD).'),
+    ({'start_date': 20240401}, 'Start date must be a date (YYYY-MM-DD).'),
+])
+def test_invalid_garment_is_reported(db, client, customer, category, changes, message):
+    response = _post(client, customer, [_garment(category), _garment(category, **changes)])
+    assert response.status_code == 400
+    assert response.json['errors'] == [{'index': 1, 'message': message}]
+    assert _counts(db) == (0, 0) # the valid garment is not saved either
+
+
+def test_other_shops_category_is_unknown(db, client, customer, category):
+    from models import Category, User
+    other = User(username='Other', email='other@example.com')
+    other.set_password('x')
+    db.session.add(other)
+    db.session.flush()
+    theirs = Category(name='Kurta', gender='male', fields_json=['Length'], user_id=other.id)
+    db.session.add(theirs)
+    db.session.commit()
+    response = _post(client, customer, [{'category_id': theirs.id, 'measurements_json': {'Length': '30'}}])
+    assert response.status_code == 400
+    assert response.json['errors'] == [{'index': 0, 'message': 'Unknown category.'}]
+
+
+def test_other_shops_customer_is_not_found(db, client, category):
+    from models import Customer, User
+    other = User(username='Other', email='other@example.com')
+    other.set_password('x')
+    db.session.add(other)
+    db.session.flush()
+    theirs = Customer(user_id=other.id, name='Sita', mobile='9123456789')
+    db.session.add(theirs)
+    db.session.commit()
+    assert _post(client, theirs, [_garment(category)]).status_code == 404
+    assert _counts(db) == (0, 0)
+
+
+@pytest.mark.parametrize('garments', [[], {'category_id': 1}, None, ['not an object']])
+def test_malformed_batch(db, client, customer, garments):
+    assert _post(client, customer, garments).status_code == 400
+    assert _counts(db) == (0, 0)
+
+
+def test_batch_limit(db, client, customer, category):
+    too_many = [_garment(category, measurements_json={'Length': str(i)}) for i in range(MAX_BATCH + 1)]
+    response = _post(client, customer, too_many)
+    assert response.status_code == 400
+    assert response.json['message'] == f'At most {MAX_BATCH} garments per request'
+    assert _counts(db) == (0, 0)
+    assert _post(client, customer, too_many[:MAX_BATCH]).status_code == 200
+    assert _counts(db) == (MAX_BATCH, MAX_BATCH)
+
+
+def test_failed_save_writes_nothing(db, client, customer, category, monkeypatch):
+    calls = []
+
+    def record_order(order):
+        calls.append(order)
+        if len(calls) == 2:
+            raise RuntimeError('disk full')
+    monkeypatch.setattr(rollups, 'record_order', record_order)
+    response = _post(client, customer, [_garment(category), _garment(category, measurements_json={'Length': '31'})])
+    assert response.status_code == 500
+    assert _counts(db) == (0, 0)
+
+
+def test_parse_garment_accepts_form_fields(app, db, user, category):
+    with app.test_request_context():
+        garment = measurement_service.parse_garment({
+            'category_id': str(category.id), 'measurements_json': '{"Length": "30"}', 'total_amt': '1000',
+            'advance': '1000', 'order_status': 'Ready', 'delivery_date': ''}, user.id)
+    assert (garment.measurements, garment.work_status, garment.delivery_date, garment.payment_status) == \
+        ({'Length': '30'}, 'Ready', None, 'Paid')
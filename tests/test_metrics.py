@@ -0,0 +1,32 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_config(app):
+    saved = {key: app.config.get(key) for key in ('METRICS_TOKEN', 'METRICS_ALLOW_LOCAL')}
+    yield app.config
+    app.config.update(saved)
+
+
+def _scrape(app, headers=None):
+    client = app.test_client()
+    return client.get('/metrics', base_url='https://localhost', headers=headers or {},
+                      environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code
+
+
+def test_local_request_needs_a_token_by_default(app, metrics_config):
+    metrics_config.update(METRICS_TOKEN=None, METRICS_ALLOW_LOCAL=False)
+    assert _scrape(app) == 404
+
+
+def test_token(app, metrics_config):
+    metrics_config.update(METRICS_TOKEN='s3cret', METRICS_ALLOW_LOCAL=False)
+    assert _scrape(app) == 404
+    assert _scrape(app, {'Authorization': 'Bearer wrong'}) == 404
+    assert _scrape(app, {'Authorization': 'Bearer s3cret'}) == 200
+
+
+def test_allow_local(app, metrics_config):
+    metrics_config.update(METRICS_TOKEN=None, METRICS_ALLOW_LOCAL=True)
+    assert _scrape(app) == 200
+    assert _scrape(app, {'X-Forwarded-For': '203.0.113.7'}) == 404
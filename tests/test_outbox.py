@@ -0,0 +1,78 @@
+import smtplib
+from datetime import datetime, timedelta
+
+import outbox
+
+
+class FakePool:
+    """Stands in for SMTPPool: records messages, or raises `error` on send."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send(self, message):
+        if self.error:
+            raise self.error
+        self.sent.append(message)
+
+    def close(self):
+        pass
+
+
+def _queue(db, **kwargs):
+    email = outbox.enqueue('a@example.com', 'Your code', 'Your verification code is 123456.', **kwargs)
+    db.session.commit()
+    return email.id
+
+
+def _row(db, email_id):
+    from models import OutboxEmail
+    db.session.expire_all()
+    return db.session.get(OutboxEmail, email_id)
+
+
+def test_sent_row_drops_its_body(app, db):
+    email_id = _queue(db, expires_at=datetime.utcnow() + timedelta(minutes=10))
+    pool = FakePool()
+    assert outbox.send_batch(app, pool) == 1
+    assert pool.sent[0].body == 'Your verification code is 123456.'
+    row = _row(db, email_id)
+    assert (row.status, row.body) == ('Sent', '')
+
+
+def test_expired_row_is_not_sent(app, db):
+    email_id = _queue(db, expires_at=datetime.utcnow() - timedelta(seconds=1))
+    pool = FakePool()
+    assert outbox.send_batch(app, pool) == 1
+    assert pool.sent == []
+    row = _row(db, email_id)
+    assert (row.status, row.body, row.attempts) == ('Expired', '', 0)
+
+
+def test_retry_keeps_body_until_it_gives_up(app, db):
+    email_id = _queue(db)
+    outbox.send_batch(app, FakePool(smtplib.SMTPServerDisconnected('gone')))
+    row = _row(db, email_id)
+    assert (row.status, row.body) == ('Pending', 'Your verification code is 123456.')
+
+    row.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    outbox.send_batch(app, FakePool(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'no such user')})))
+    row = _row(db, email_id)
+    assert (row.status, row.body) == ('Failed', '')
+
+
+def test_purge_removes_only_old_finished_rows(app, db):
+    from models import OutboxEmail
+    old = datetime.utcnow() - timedelta(days=app.config['OUTBOX_RETENTION_DAYS'] + 1)
+    db.session.add_all([
+        OutboxEmail(recipient='a@example.com', subject='s', body='', status='Sent', created_at=old),
+        OutboxEmail(recipient='a@example.com', subject='s', body='', status='Expired', created_at=old),
+        OutboxEmail(recipient='a@example.com', subject='s', body='b', status='Pending', created_at=old,
+                    next_attempt_at=datetime.utcnow() + timedelta(hours=1)),
+        OutboxEmail(recipient='a@example.com', subject='s', body='', status='Sent'),
+    ])
+    db.session.commit()
+    assert outbox.purge(app) == 2
+    assert sorted(e.status for e in OutboxEmail.query.all()) == ['Pending', 'Sent']
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import decode_cursor, encode_cursor, keyset_paginate
+
+PER_PAGE = 3
+
+
+@pytest.fixture
+def customers(db, user):
+    """Four customers with a last visit and three legacy rows without one, in list order."""
+    from models import Customer
+    start = datetime(2024, 3, 1, 10, 30)
+    rows = []
+    for i in range(7):
+        visit = start + timedelta(days=i) if i < 4 else None
+        rows.append(Customer(user_id=user.id, name=f'Customer {i}', mobile=f'90000000{i:02d}', last_visit=visit))
+    db.session.add_all(rows)
+    db.session.commit()
+    valued = sorted((c for c in rows if c.last_visit), key=lambda c: (c.last_visit, c.id), reverse=True)
+    nulls = sorted((c for c in rows if not c.last_visit), key=lambda c: c.id, reverse=True)
+    return [c.id for c in valued + nulls]
+
+
+def _page(user, cursor=None, direction='next'):
+    from models import Customer
+    query = Customer.query.filter_by(user_id=user.id)
+    return keyset_paginate(query, [Customer.last_visit, Customer.id], cursor, direction, per_page=PER_PAGE)
+
+
+def _ids(page):
+    return [c.id for c in page.items]
+
+
+def test_next_walks_every_row_once_with_nulls_last(user, customers):
+    page = _page(user)
+    assert not page.has_prev
+    seen = _ids(page)
+    while page.has_next:
+        page = _page(user, page.next_cursor, 'next')
+        assert page.first_index == len(seen) + 1
+        seen += _ids(page)
+    assert seen == customers
+    assert page.last_index == len(customers)
+
+
+def test_prev_returns_the_same_pages(user, customers):
+    pages = [_page(user)]
+    while pages[-1].has_next:
+        pages.append(_page(user, pages[-1].next_cursor, 'next'))
+    assert len(pages) == 3
+
+    page = pages[-1]
+    for expected in reversed(pages[:-1]):
+        page = _page(user, page.prev_cursor, 'prev')
+        assert _ids(page) == _ids(expected)
+        assert page.offset == expected.offset
+        assert page.has_next
+    assert not page.has_prev
+
+
+def test_page_boundary_inside_the_null_rows(user, customers):
+    # Second page starts on the last valued row and crosses into the NULL rows
+    second = _page(user, _page(user).next_cursor, 'next')
+    assert _ids(second) == customers[3:6]
+    # Its last row has a NULL key: the next page must continue after it, not restart
+    third = _page(user, second.next_cursor, 'next')
+    assert _ids(third) == customers[6:]
+    assert not third.has_next
+    # And going back from a NULL key reaches the valued rows again
+    back = _page(user, third.prev_cursor, 'prev')
+    assert _ids(back) == customers[3:6]
+
+
+def test_empty_and_exact_pages(db, user):
+    from models import Customer
+    assert _ids(_page(user)) == [] and not _page(user).has_next
+    db.session.add_all([Customer(user_id=user.id, name=f'C{i}', mobile=f'91000000{i:02d}') for i in range(PER_PAGE)])
+    db.session.commit()
+    page = _page(user)
+    assert len(page.items) == PER_PAGE
+    assert not page.has_next and not page.has_prev
+
+
+def test_cursor_round_trip(app):
+    from models import Customer
+    columns = [Customer.last_visit, Customer.id]
+    visit = datetime(2024, 3, 1, 10, 30, 15, 123456)
+    assert decode_cursor(encode_cursor([visit, 42], 7), columns) == ([visit, 42], 7)
+    assert decode_cursor(encode_cursor([None, 42], 7), columns) == ([None, 42], 7)
+
+
+@pytest.mark.parametrize('cursor', [None, '', 'not-base64!', encode_cursor([1], 0), encode_cursor(['x', 1], 0)])
+def test_bad_cursor_means_first_page(app, cursor):
+    from models import Customer
+    assert decode_cursor(cursor, [Customer.last_visit, Customer.id]) == (None, 0)
+
+
+def test_cursor_without_unique_key_means_first_page(user, customers):
+    page = _page(user, encode_cursor([None, None], 4), 'next')
+    assert _ids(page) == customers[:PER_PAGE]
+    assert page.offset == 0
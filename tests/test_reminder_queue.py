@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+
+import pytest
+
+import reminder_queue
+
+TODAY = date(2024, 3, 15)
+
+
+@pytest.fixture
+def queue(db, user):
+    """An order due for delivery with a balance and a customer with a birthday this week."""
+    from models import Customer, Order
+    customer = Customer(user_id=user.id, name='Ram Patel', mobile='9876543210', birthday=date(1990, 3, 18))
+    db.session.add(customer)
+    db.session.flush()
+    db.session.add(Order(user_id=user.id, customer_id=customer.id, items=[{'name': 'Shirt', 'qty': 1, 'cost': 650}],
+                         total_amt=650.0, advance=300.0, balance=350.0, work_status='Working',
+                         delivery_date=TODAY + timedelta(days=2)))
+    db.session.commit()
+    return user.id
+
+
+def _rows(db):
+    from models import Reminder
+    return sorted((r.type, r.order_id, r.customer_id, r.due_date) for r in Reminder.query.all())
+
+
+def test_build_is_idempotent(db, queue):
+    assert reminder_queue.build(queue, today=TODAY) == 3
+    db.session.commit()
+    first = _rows(db)
+    reminder_queue.build(queue, today=TODAY)
+    db.session.commit()
+    assert _rows(db) == first
+    assert [r[0] for r in first] == ['birthday', 'delivery', 'payment']
+
+
+def test_overlapping_build_inserts_nothing_twice(db, queue):
+    reminder_queue.build(queue, today=TODAY)
+    db.session.commit()
+    first = _rows(db)
+    # A second worker whose DELETE ran before these rows were committed inserts the same rows again
+    from models import Customer, Order
+    rows = [row for o in Order.query.all() for row in reminder_queue.order_rows(o, TODAY)]
+    rows += [row for c in Customer.query.all() for row in reminder_queue.customer_rows(c, TODAY)]
+    assert reminder_queue._insert_pending(db.session.connection(), rows, []) == 0
+    db.session.commit()
+    assert _rows(db) == first
+
+
+def test_handled_reminder_is_not_queued_again(db, queue):
+    from models import Reminder
+    reminder_queue.build(queue, today=TODAY)
+    Reminder.query.filter_by(type='payment').one().status = 'Sent'
+    db.session.commit()
+    reminder_queue.build(queue, today=TODAY)
+    db.session.commit()
+    assert [(r.type, r.status) for r in Reminder.query.order_by(Reminder.type)] == \
+        [('birthday', 'Pending'), ('delivery', 'Pending'), ('payment', 'Sent')]
+
+
+def _order(db, user_id, customer_id, **kwargs):
+    from models import Order
+    order = Order(user_id=user_id, customer_id=customer_id, items=[{'name': 'Shirt', 'qty': 1, 'cost': 100}],
+                  total_amt=100.0, advance=100.0, balance=0.0, work_status='Working', **kwargs)
+    db.session.add(order)
+    db.session.commit()
+    return order.id
+
+
+def test_far_delivery_is_queued_and_becomes_due(db, queue):
+    from models import Customer
+    customer_id = Customer.query.first().id
+    reminder_queue.build(queue, today=TODAY)
+    db.session.commit()
+    # Created after the build, due beyond the horizon: the after_flush hook queues it anyway
+    far = _order(db, queue, customer_id, delivery_date=TODAY + timedelta(days=10))
+    assert far not in [r.order_id for r in reminder_queue.dated(queue, TODAY + timedelta(days=7), today=TODAY)]
+    # Ten days later, with no rebuild in between, it is due
+    later = TODAY + timedelta(days=10)
+    due = reminder_queue.dated(queue, later, types=('delivery',), limit=50, today=later)
+    assert far in [r.order_id for r in due]
+    assert far in [r.order_id for r in reminder_queue.dated(queue, later + timedelta(days=5), types=('delivery',), today=later + timedelta(days=5))]
+
+
+def test_dated_limit_after_and_past_events(db, queue):
+    from models import Customer
+    customer_id = Customer.query.first().id
+    for days in (-9, -8, -7):
+        _order(db, queue, customer_id, delivery_date=TODAY + timedelta(days=days))
+    _order(db, queue, customer_id, trial_date=TODAY + timedelta(days=1))
+    reminder_queue.build(queue, today=TODAY)
+    db.session.commit()
+
+    overdue = reminder_queue.dated(queue, TODAY, types=('delivery',), limit=2, today=TODAY)
+    assert [r.due_date for r in overdue] == [TODAY - timedelta(days=9), TODAY - timedelta(days=8)]
+    upcoming = reminder_queue.dated(queue, TODAY + timedelta(days=7), types=('delivery',), after=TODAY, today=TODAY)
+    assert [r.due_date for r in upcoming] == [TODAY + timedelta(days=2)]
+
+    # Without a rebuild, the trial (day 1) and birthday (day 3) drop out once their day has passed
+    later = TODAY + timedelta(days=4)
+    events = reminder_queue.dated(queue, later + timedelta(days=7), types=('trial', 'birthday'), today=later)
+    assert events == []
+    assert len(reminder_queue.dated(queue, TODAY + timedelta(days=7), types=('trial', 'birthday'), today=TODAY)) == 2
+
+
+def test_refresh_rebuilds_once_a_day(db, queue):
+    from models import Customer, User
+    reminder_queue.refresh(queue, TODAY)
+    assert db.session.get(User, queue).reminders_built_on == TODAY
+    built = _rows(db)
+    assert [r[0] for r in built] == ['birthday', 'delivery', 'payment']
+
+    # A birthday moved into the window by a direct table write is only picked up by the next day's refresh
+    Customer.query.update({'birthday': date(1990, 3, 17)})
+    db.session.commit()
+    reminder_queue.refresh(queue, TODAY)
+    assert _rows(db) == built
+    reminder_queue.refresh(queue, TODAY + timedelta(days=1))
+    assert date(2024, 3, 17) in [r[3] for r in _rows(db)]
@@ -0,0 +1,125 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+import rollups
+from dashboard_stats import compute_dashboard_stats
+from date_ranges import month_range, year_range
+
+FIGURES = ('monthly_customers', 'yearly_customers', 'monthly_pending', 'monthly_revenue', 'yearly_revenue')
+
+
+def _raw_figures(user_id, today):
+    """The month / year figures aggregated straight from Order and Customer, as before the rollups."""
+    from models import db, Customer, Order
+    month_start, next_month = month_range(today.year, today.month)
+    year_start, next_year = year_range(today.year)
+
+    def count_customers(start, end):
+        return db.session.query(func.count(Customer.id)).filter(
+            Customer.user_id == user_id, Customer.created_date >= start, Customer.created_date < end).scalar()
+
+    def sum_orders(column, start, end):
+        return db.session.query(func.coalesce(func.sum(column), 0)).filter(
+            Order.user_id == user_id, Order.created_at >= start, Order.created_at < end).scalar()
+
+    return {
+        'monthly_customers': count_customers(month_start, next_month),
+        'yearly_customers': count_customers(year_start, next_year),
+        'monthly_pending': sum_orders(Order.balance, month_start, next_month),
+        'monthly_revenue': sum_orders(Order.total_amt, month_start, next_month),
+        'yearly_revenue': sum_orders(Order.total_amt, year_start, next_year),
+    }
+
+
+def _rollup_rows(user_id):
+    from models import DailyRollup
+    rows = {}
+    for r in DailyRollup.query.filter_by(user_id=user_id):
+        values = tuple(round(getattr(r, f), 2) for f in rollups.ROLLUP_FIELDS)
+        if any(values): # deletes leave all-zero rows behind; a rebuild does not write them
+            rows[r.day] = values
+    return rows
+
+
+def assert_matches_rebuild(db, user_id):
+    today = date.today()
+    stats = compute_dashboard_stats(user_id, today)
+    raw = _raw_figures(user_id, today)
+    assert {f: getattr(stats, f) for f in FIGURES} == pytest.approx(raw)
+
+    incremental = _rollup_rows(user_id)
+    rollups.rebuild(user_id)
+    db.session.flush()
+    rebuilt = _rollup_rows(user_id)
+    db.session.rollback() # keep the incrementally maintained rows for the next step
+    assert incremental == rebuilt
+
+
+def _garment(category, **kwargs):
+    data = {'category_id': category.id, 'measurements_json': {'Length': '30'}, 'total_amt': 1000, 'advance': 400}
+    data.update(kwargs)
+    return data
+
+
+def _add_customer(client, name, mobile):
+    from models import Customer
+    client.post('/customers', data={'name': name, 'mobile': mobile, 'gender': 'male'})
+    return Customer.query.filter_by(mobile=mobile).one().id
+
+
+def _add_orders(client, customer_id, *garments):
+    response = client.post(f'/api/customer/{customer_id}/measurements', json={'garments': list(garments)})
+    assert response.status_code == 200, response.json
+    return [r['order_id'] for r in response.json['results']]
+
+
+def _move_order(db, order_id, created_at):
+    """Changes an order's day the way a route would: snapshot, edit, record the change."""
+    from models import Order
+    order = db.session.get(Order, order_id)
+    before = rollups.snapshot_order(order)
+    order.created_at = created_at
+    rollups.record_order_change(order, before)
+    db.session.commit()
+
+
+def test_rollups_follow_every_write(client, db, user, category):
+    uid = user.id
+    assert_matches_rebuild(db, uid)
+
+    # Create: customers, then orders through the batch endpoint
+    ram = _add_customer(client, 'Ram Patel', '9876500001')
+    sita = _add_customer(client, 'Sita Sharma', '9876500002')
+    assert_matches_rebuild(db, uid)
+    ram_orders = _add_orders(client, ram, _garment(category), _garment(category, total_amt=250.5, advance=0))
+    sita_orders = _add_orders(client, sita, _garment(category, total_amt=800, advance=800))
+    assert_matches_rebuild(db, uid)
+
+    # Edit: amount, status and delivery date from the orders page, amount from the bills page
+    client.post('/orders/update_details', data={'order_id': ram_orders[0], 'status': 'Delivered',
+                                                'total_amt': 1200, 'advance': 1200, 'delivery_date': '2024-05-01'})
+    assert_matches_rebuild(db, uid)
+    client.post('/bills/update', data={'order_id': ram_orders[1], 'total_amt': 300, 'advance': 100})
+    assert_matches_rebuild(db, uid)
+
+    # Date: an order moved into last month and one into last year leave this month's / year's figures
+    now = datetime.utcnow()
+    _move_order(db, sita_orders[0], now - timedelta(days=40))
+    assert_matches_rebuild(db, uid)
+    _move_order(db, ram_orders[1], now.replace(year=now.year - 1))
+    assert_matches_rebuild(db, uid)
+    _move_order(db, ram_orders[1], now)
+    assert_matches_rebuild(db, uid)
+
+    # Delete: one order, then a customer with the rest of their orders
+    client.post(f'/delete/order/{ram_orders[0]}')
+    assert_matches_rebuild(db, uid)
+    client.post(f'/delete-customer/{ram}')
+    assert_matches_rebuild(db, uid)
+
+    # Reset
+    client.post('/settings/reset_data')
+    assert_matches_rebuild(db, uid)
+    assert compute_dashboard_stats(uid).yearly_revenue == 0
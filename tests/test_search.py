@@ -0,0 +1,98 @@
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy import text
+
+import search
+from conftest import ROOT
+
+MIGRATION = os.path.join(ROOT, 'migrations', 'versions', '5b8e1f0c3d27_customer_search_and_versions.py')
+
+
+@pytest.fixture(params=['like', 'fts5'])
+def backend(request, app, db, monkeypatch):
+    """Runs a test against the ILIKE path and the SQLite FTS5 path (table and triggers from the migration)."""
+    if request.param == 'fts5':
+        spec = importlib.util.spec_from_file_location('search_migration', MIGRATION)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+        for stmt in migration.SQLITE_FTS:
+            db.session.execute(text(stmt))
+        db.session.commit()
+    monkeypatch.setitem(app.extensions, search.EXTENSION_KEY, request.param)
+    return request.param
+
+
+@pytest.fixture
+def shop(db, user):
+    from models import Customer
+    db.session.add_all([
+        Customer(user_id=user.id, name='Ram Patel', mobile='+91 98765 43210'),
+        Customer(user_id=user.id, name='Sita Sharma', mobile='09123456789'),
+        Customer(user_id=user.id, name='Mohan Das', mobile='8000012345'),
+    ])
+    db.session.commit()
+    return user.id
+
+
+def _names(user_id, q):
+    customers, _ = search.search_customers(user_id, q)
+    return sorted(c.name for c in customers)
+
+
+@pytest.mark.parametrize('q, expected', [
+    ('98765', ['Ram Patel']),            # start of the number
+    ('43210', ['Ram Patel']),            # last digits
+    ('765 432', ['Ram Patel']),          # middle, typed with a space
+    ('+91 987', ['Ram Patel']),          # country code dropped like the stored numbers
+    ('+91 9876543210', ['Ram Patel']),
+    ('0091 91234', ['Sita Sharma']),
+    ('09123', ['Sita Sharma']),          # trunk 0
+    ('12345', ['Mohan Das', 'Sita Sharma']),
+    ('12', []),                          # too short for a number, not a name either
+])
+def test_mobile_substring(backend, shop, q, expected):
+    assert _names(shop, q) == expected
+
+
+@pytest.mark.parametrize('q, expected', [
+    ('ram', ['Ram Patel']),
+    ('pat', ['Ram Patel']),
+    ('ram pat', ['Ram Patel']),
+    ('SHARMA', ['Sita Sharma']),
+    ('nobody', []),
+])
+def test_name_word_prefix(backend, shop, q, expected):
+    assert _names(shop, q) == expected
+
+
+def test_name_infix(backend, shop):
+    # Substring on ILIKE; FTS5 only matches word prefixes
+    expected = ['Ram Patel'] if backend == 'like' else []
+    assert _names(shop, 'tel') == expected
+
+
+def test_other_shops_are_not_searched(backend, shop):
+    from models import Customer, User
+    from models import db
+    other = User(username='Other', email='other@example.com')
+    other.set_password('x')
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Customer(user_id=other.id, name='Ram Other', mobile='9876500000'))
+    db.session.commit()
+    assert _names(shop, 'ram') == ['Ram Patel']
+    assert _names(other.id, '98765') == ['Ram Other']
+
+
+@pytest.mark.parametrize('q, digits', [
+    ('+91 98765 43210', '9876543210'),
+    ('+91 98', '98'),
+    ('0091-98765', '98765'),
+    ('098765', '98765'),
+    ('91 98765 43210', '9876543210'), # 12 digits: last 10, as stored
+    ('(987) 654', '987654'),
+])
+def test_mobile_query_digits(q, digits):
+    assert search.mobile_query_digits(q) == digits
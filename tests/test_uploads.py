@@ -0,0 +1,21 @@
+import io
+
+from conftest import flashes
+
+
+def test_bad_logo_saves_nothing_and_only_reports_the_error(client, db, user):
+    from models import ShopProfile
+    response = client.post('/settings/update_profile', data={
+        'shop_name': 'New Name',
+        'logo': (io.BytesIO(b'not an image'), 'logo.png'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert [category for category, _ in flashes(client)] == ['error']
+    assert ShopProfile.query.filter_by(user_id=user.id).first() is None
+
+
+def test_profile_update_without_logo(client, db, user):
+    from models import ShopProfile
+    client.post('/settings/update_profile', data={'shop_name': 'New Name', 'terms': 'No refunds.'})
+    assert flashes(client) == [('success', 'Shop profile updated!')]
+    assert ShopProfile.query.filter_by(user_id=user.id).one().terms == 'No refunds.'
@@ -0,0 +1,161 @@
+"""
+Image uploads (customer photos, shop logos).
+
+Uploads are read from the request stream in fixed-size chunks up to
+IMAGE_UPLOAD_MAX_BYTES, hashed while they are written, and stored as
+static/uploads/<kind>/<sha256>.<ext>, so the same image uploaded twice is
+kept once. A fixed-size WebP thumbnail is produced on a background thread;
+templates use thumb_url(), which serves the original until the thumbnail
+exists.
+
+Pillow is optional: without it uploads are still stored and deduplicated,
+only the thumbnails are skipped.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, url_for
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+
+# kind -> (thumbnail box, crop to fill the box)
+THUMBNAILS = {
+    'customers': ((96, 96), True), # round 40px avatars, 2x for high-DPI screens
+    'logos': ((160, 160), False), # sidebar / settings preview, keep the whole logo
+}
+
+# Pillow format -> file extension; anything else is rejected
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp', 'gif'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """Raised for uploads that are too large or not an image; the message is shown to the user."""
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnail')
+    return _executor
+
+
+def _upload_folder(kind):
+    return os.path.join(current_app.static_folder, 'uploads', kind)
+
+
+def _read_bounded(stream, dest, max_bytes):
+    """Copies stream -> dest in chunks, returning the sha256 hex digest. Stops at max_bytes."""
+    digest = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadError(f'Image is too large (max {max_bytes // (1024 * 1024)} MB).')
+        digest.update(chunk)
+        dest.write(chunk)
+    if total == 0:
+        raise UploadError('Uploaded file is empty.')
+    return digest.hexdigest()
+
+
+def _detect_extension(path, filename):
+    if Image is None:
+        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if ext not in EXTENSIONS:
+            raise UploadError('Please upload a JPG, PNG, WebP or GIF image.')
+        return 'jpg' if ext == 'jpeg' else ext
+    try:
+        with Image.open(path) as img:
+            img.verify()
+            image_format = img.format
+    except Exception:
+        raise UploadError('Please upload a JPG, PNG, WebP or GIF image.')
+    if image_format not in FORMATS:
+        raise UploadError('Please upload a JPG, PNG, WebP or GIF image.')
+    return FORMATS[image_format]
+
+
+def thumbnail_path(relative_path):
+    """uploads/<kind>/<hash>.<ext> -> uploads/<kind>/thumbs/<hash>.webp"""
+    folder, name = os.path.split(relative_path)
+    return f"{folder}/thumbs/{os.path.splitext(name)[0]}.webp"
+
+
+def make_thumbnail(source, dest, box, crop):
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        if crop:
+            img = ImageOps.fit(img, box, Image.LANCZOS)
+        else:
+            img.thumbnail(box, Image.LANCZOS)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = f"{dest}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, 'WEBP', quality=80, method=4)
+    os.replace(tmp_path, dest)
+
+
+def _make_thumbnail_quietly(source, dest, box, crop):
+    try:
+        make_thumbnail(source, dest, box, crop)
+    except Exception as e:
+        print(f"Thumbnail Error ({source}): {e}")
+
+
+def save_image(file, kind):
+    """
+    Stores an uploaded image and returns its path relative to static/, e.g.
+    'uploads/customers/<sha256>.jpg'. Raises UploadError for bad uploads.
+    """
+    max_bytes = current_app.config.get('IMAGE_UPLOAD_MAX_BYTES', 5 * 1024 * 1024)
+    folder = _upload_folder(kind)
+    os.makedirs(folder, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            digest = _read_bounded(file.stream, tmp, max_bytes)
+        ext = _detect_extension(tmp_path, file.filename or '')
+        final_path = os.path.join(folder, f"{digest}.{ext}")
+        if os.path.exists(final_path):
+            os.remove(tmp_path) # already stored, reuse it
+        else:
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    relative_path = f"uploads/{kind}/{digest}.{ext}"
+    thumb_file = os.path.join(current_app.static_folder, thumbnail_path(relative_path))
+    if Image is not None and kind in THUMBNAILS and not os.path.exists(thumb_file):
+        box, crop = THUMBNAILS[kind]
+        _get_executor().submit(_make_thumbnail_quietly, final_path, thumb_file, box, crop)
+    return relative_path
+
+
+def thumb_url(relative_path):
+    """Template helper: URL of the WebP thumbnail if it has been generated, else of the original."""
+    if not relative_path:
+        return ''
+    thumb = thumbnail_path(relative_path)
+    if os.path.exists(os.path.join(current_app.static_folder, thumb)):
+        return url_for('static', filename=thumb)
+    return url_for('static', filename=relative_path)